@@ -0,0 +1,7 @@
+"""
+Benchmarks and the synthetic estate they scan.
+
+Run a benchmark as a module from the repository root, e.g.
+`python -m benchmarks.bench_pipeline`. The tests import the EC2 stand-in
+and the topology generator from here as well.
+"""
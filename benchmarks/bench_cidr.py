@@ -0,0 +1,56 @@
+"""
+Micro-benchmark of the CIDR overlap index against the linear ipaddr scan.
+
+Usage:
+  python -m benchmarks.bench_cidr [--blocks 5000] [--queries 500]
+"""
+from argparse import ArgumentParser
+import random
+import timeit
+import ipaddr
+from eazyvizy.aws._cidr import CidrIndex
+
+
+def random_cidrs(count, seed=0):
+    rnd = random.Random(seed)
+    cidrs = []
+    for _ in range(count):
+        prefixlen = rnd.choice([8, 12, 16, 16, 20, 24, 24, 28, 32])
+        address = rnd.getrandbits(32) & (((1 << prefixlen) - 1) << (32 - prefixlen))
+        cidrs.append(f"{ipaddr.IPv4Address(address)}/{prefixlen}")
+    return cidrs
+
+
+def linear_scan(blocks, target):
+    return [i for i, block in enumerate(blocks) if ipaddr.IPNetwork(target).overlaps(ipaddr.IPNetwork(block))]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    blocks = random_cidrs(args.blocks, seed=1)
+    queries = random_cidrs(args.queries, seed=2)
+
+    build_time = timeit.default_timer()
+    index = CidrIndex()
+    for i, block in enumerate(blocks):
+        index.add(block, i)
+    index.build()
+    build_time = timeit.default_timer() - build_time
+
+    for target in queries:
+        assert sorted(index.overlapping(target)) == linear_scan(blocks, target), target
+
+    linear = timeit.timeit(lambda: [linear_scan(blocks, target) for target in queries], number=1)
+    indexed = timeit.timeit(lambda: [index.overlapping(target) for target in queries], number=1)
+    print(f"blocks={args.blocks} queries={args.queries}")
+    print(f"ipaddr linear scan: {linear * 1000:10.2f} ms")
+    print(f"index build:        {build_time * 1000:10.2f} ms")
+    print(f"index queries:      {indexed * 1000:10.2f} ms  ({linear / indexed:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of the batched reachability matrix against the per-pair loop.
+
+Usage:
+  python -m benchmarks.bench_matrix [--vpcs 500]
+"""
+from argparse import ArgumentParser
+import random
+import timeit
+from eazyvizy.aws import EazyVizyAWS
+from eazyvizy.aws._collector import RegionSnapshot
+from eazyvizy.aws._matrix import ReachabilityMatrix
+
+
+def synthetic_region(count, seed=0):
+    rnd = random.Random(seed)
+    vpcs, tables, groups = [], [], []
+    for i in range(count):
+        vpc_id = f"vpc-{i:08x}"
+        vpcs.append({"VpcId": vpc_id, "CidrBlock": f"10.{i // 256}.{i % 256}.0/24"})
+        peers = rnd.sample(range(count), min(count, 5))
+        routes = [{"DestinationCidrBlock": f"10.{i // 256}.{i % 256}.0/24", "GatewayId": "local"}]
+        routes += [
+            {"DestinationCidrBlock": f"10.{j // 256}.{j % 256}.0/24", "TransitGatewayId": "tgw-00000001"}
+            for j in peers
+        ]
+        tables.append({"RouteTableId": f"rtb-{i:08x}", "VpcId": vpc_id, "Routes": routes})
+        permissions = [
+            {
+                "IpProtocol": "tcp",
+                "FromPort": port,
+                "ToPort": port,
+                "IpRanges": [
+                    {"CidrIp": f"10.{j // 256}.{j % 256}.0/24"} for j in rnd.sample(range(count), min(count, 3))
+                ],
+            }
+            for port in (22, 443, 5432)
+        ]
+        groups.append({"GroupId": f"sg-{i:08x}", "VpcId": vpc_id, "IpPermissions": permissions})
+    return RegionSnapshot("us-east-1", vpcs, tables, groups)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--vpcs", type=int, default=500)
+    args = parser.parse_args()
+
+    snapshot = synthetic_region(args.vpcs)
+    analyzer = EazyVizyAWS.__new__(EazyVizyAWS)
+
+    start = timeit.default_timer()
+    looped = {vpc["VpcId"]: analyzer.connections_of(snapshot, vpc) for vpc in snapshot}
+    loop_time = timeit.default_timer() - start
+
+    snapshot = synthetic_region(args.vpcs)
+    start = timeit.default_timer()
+    batched = ReachabilityMatrix(snapshot).connections()
+    matrix_time = timeit.default_timer() - start
+
+    assert looped == batched
+    print(f"vpcs={args.vpcs} connections={sum(len(c) for c in batched.values())}")
+    print(f"per-pair loop:  {loop_time * 1000:10.2f} ms")
+    print(f"numpy matrix:   {matrix_time * 1000:10.2f} ms  ({loop_time / matrix_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
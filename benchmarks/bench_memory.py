@@ -0,0 +1,71 @@
+"""
+Memory benchmark of region snapshots.
+
+Builds the `RegionSnapshot`s of a synthetic estate from freshly decoded
+Describe* responses, as the collector does, drops the responses and then
+reports the memory the snapshots keep, the number of objects the garbage
+collector tracks and the time of a full collection, before and after the
+connections are analyzed (requires numpy).
+
+Usage:
+  python -m benchmarks.bench_memory [--vpcs 10000] [--regions 4]
+"""
+from argparse import ArgumentParser
+import gc
+import json
+import timeit
+import tracemalloc
+from benchmarks.topology import synthetic_topology
+from eazyvizy.aws._collector import RegionSnapshot
+from eazyvizy.aws._matrix import ReachabilityMatrix
+
+OPERATIONS = {
+    "vpcs": "describe_vpcs",
+    "route_tables": "describe_route_tables",
+    "security_groups": "describe_security_groups",
+    "peerings": "describe_vpc_peering_connections",
+    "tgw_attachments": "describe_transit_gateway_attachments",
+    "transit_gateways": "describe_transit_gateways",
+    "tgw_peerings": "describe_transit_gateway_peering_attachments",
+}
+
+
+def encoded_responses(vpcs, regions):
+    return {
+        region: {name: json.dumps(data[operation]) for name, operation in OPERATIONS.items()}
+        for region, data in synthetic_topology(vpcs, regions).items()
+    }
+
+
+def report(name, start):
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - start
+    collection = timeit.timeit(gc.collect, number=3) / 3
+    print(f"{name:<10} {retained / 2**20:9.1f} MiB {len(gc.get_objects()):>12,d} {collection * 1000:9.1f} ms")
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--vpcs", type=int, default=10000)
+    parser.add_argument("--regions", type=int, default=4)
+    args = parser.parse_args()
+
+    responses = encoded_responses(args.vpcs, args.regions)
+    print(f"vpcs={args.vpcs} regions={args.regions}")
+    print(f"{'stage':<10} {'retained':>13} {'gc objects':>12} {'gc time':>12}")
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    snapshots = [
+        RegionSnapshot(region, **{name: json.loads(encoded) for name, encoded in items.items()})
+        for region, items in responses.items()
+    ]
+    report("collected", start)
+    for snapshot in snapshots:
+        snapshot.connections = ReachabilityMatrix(snapshot).connections()
+    report("analyzed", start)
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+End-to-end benchmark of a scan against a synthetic topology.
+
+A synthetic account is served by the in-process `StubEC2` stand-in and
+every stage of a run is timed separately: discovery (Describe* calls),
+analysis (reachability), graph build, layout and HTML export. For each
+stage the wall time and the peak of traced Python memory are reported,
+along with the number of API calls per operation.
+
+Usage:
+  python -m benchmarks.bench_pipeline [--vpcs 10 100 1000] [--regions 4]
+    [--latency 0.05] [--concurrency 8] [--json results.json]
+"""
+from argparse import ArgumentParser
+import json
+import os
+import tempfile
+import timeit
+import tracemalloc
+from benchmarks.ec2_stub import StubEC2
+from benchmarks.topology import synthetic_topology
+from eazyvizy.aws import EazyVizyAWS
+from eazyvizy.aws._collector import collect_region
+from eazyvizy.aws._scheduler import RegionScheduler
+
+
+class Stages:
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def run(self, name, function, *args):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = timeit.default_timer()
+        result = function(*args)
+        elapsed = timeit.default_timer() - start
+        peak = None
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.results[name] = {"seconds": round(elapsed, 4), "peak_bytes": peak}
+        return result
+
+
+def bench(vpcs, regions, latency, concurrency, output_dir, trace_memory=True):
+    stub = StubEC2(synthetic_topology(vpcs, regions), latency=latency)
+    session = stub.session()
+    stages = Stages(trace_memory)
+    graph = EazyVizyAWS(session, concurrency=concurrency)
+
+    def discover():
+        scheduler = RegionScheduler(concurrency)
+        names = [region["RegionName"] for region in session.client("ec2").describe_regions()["Regions"]]
+        results = scheduler.run(names, lambda region: collect_region(session, region), lambda snapshot, _: snapshot)
+        return [results[region] for region in sorted(results)]
+
+    def analyze(snapshots):
+        for snapshot in snapshots:
+            graph.analyze(snapshot)
+
+    def build(snapshots):
+        partials = {("", snapshot.region): graph.draw_region(snapshot, snapshot.region) for snapshot in snapshots}
+        graph.merge_partials(partials)
+
+    snapshots = stages.run("discovery", discover)
+    stages.run("analysis", analyze, snapshots)
+    stages.run("build", build, snapshots)
+    stages.run("layout", graph.apply_layout, "static")
+    stages.run("export", graph.generate_html, os.path.join(output_dir, f"bench-{vpcs}.html"), "physics")
+    return {
+        "vpcs": vpcs,
+        "regions": len(snapshots),
+        "nodes": graph.graph.node_count,
+        "edges": graph.graph.edge_count,
+        "connections": sum(len(c) for snapshot in snapshots for c in snapshot.connections.values()),
+        "api_calls": stub.total(),
+        "api_calls_by_operation": stub.per_operation(),
+        "stages": stages.results,
+    }
+
+
+def report(result):
+    print(
+        f"vpcs={result['vpcs']} regions={result['regions']} nodes={result['nodes']} "
+        f"edges={result['edges']} connections={result['connections']} api_calls={result['api_calls']}"
+    )
+    for name, stage in result["stages"].items():
+        peak = "" if stage["peak_bytes"] is None else f"  {stage['peak_bytes'] / 2**20:8.1f} MiB peak"
+        print(f"  {name:<10} {stage['seconds'] * 1000:10.1f} ms{peak}")
+    print("  calls: " + ", ".join(f"{name}={count}" for name, count in result["api_calls_by_operation"].items()))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--vpcs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--regions", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every API call.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc, which slows the stages down.")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Keep the layout and Describe* caches of the benchmark away from the user's.
+        os.environ["XDG_CACHE_HOME"] = output_dir
+        for vpcs in args.vpcs:
+            result = bench(vpcs, args.regions, args.latency, args.concurrency, output_dir, not args.no_memory)
+            report(result)
+            results.append(result)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Startup time benchmark of the CLI.
+
+Reports the median wall time of `eazyvizy --version` and `eazyvizy --help`
+in fresh interpreters and fails if importing eazyvizy itself takes longer
+than the budget. That these commands import none of the modules only scans
+need is checked by `tests/test_startup.py`.
+
+Usage:
+  python -m benchmarks.bench_startup [--runs 10] [--budget-ms 50]
+"""
+from argparse import ArgumentParser
+import statistics
+import subprocess
+import sys
+import timeit
+
+COMMANDS = (["--version"], ["--help"])
+
+
+def import_time_ms():
+    """Returns the cumulative import time of the `eazyvizy` package in milliseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import eazyvizy"], capture_output=True, text=True, check=True
+    )
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == "eazyvizy":
+            return int(fields[1]) / 1000
+    raise RuntimeError("eazyvizy missing from -X importtime output")
+
+
+def wall_time_ms(arguments, runs):
+    times = []
+    for _ in range(runs):
+        start = timeit.default_timer()
+        subprocess.run([sys.executable, "-m", "eazyvizy", *arguments], capture_output=True, check=True)
+        times.append((timeit.default_timer() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Maximum import time of the package.")
+    args = parser.parse_args()
+
+    for arguments in COMMANDS:
+        wall = wall_time_ms(arguments, args.runs)
+        print(f"eazyvizy {' '.join(arguments):<10} {wall:8.1f} ms")
+    elapsed = import_time_ms()
+    print(f"import eazyvizy    {elapsed:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    if elapsed > args.budget_ms:
+        print("FAILED: startup regressed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
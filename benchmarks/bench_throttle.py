@@ -0,0 +1,118 @@
+"""
+Throttling benchmark of the client-side rate limiter.
+
+Simulates EC2's request throttling: a token bucket per region answers
+calls beyond its rate with `RequestLimitExceeded`, at botocore's
+`before-send` event, so botocore's retry handling runs as against AWS.
+Several threads per region then issue DescribeVpcs calls as fast as they
+can, once without and once with eazyvizy's `RateLimiter`, which starts at
+a higher rate than the simulated account allows. Reports the wall time,
+the calls that failed after exhausting their retries and the throttled
+attempts of each run.
+
+Usage:
+  python -m benchmarks.bench_throttle [--regions 4] [--calls 200] [--threads 8]
+    [--server-rate 20] [--server-burst 20] [--client-rate 40]
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import time
+import boto3
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from eazyvizy.aws import RateLimiter
+from eazyvizy.aws._collector import make_client
+from eazyvizy.aws._throttle import TokenBucket
+from eazyvizy.utils.metrics import Metrics
+
+EMPTY = b'<DescribeVpcsResponse xmlns="http://ec2.amazonaws.com/doc/2016-11-15/"><vpcSet/></DescribeVpcsResponse>'
+THROTTLED = (
+    b"<Response><Errors><Error><Code>RequestLimitExceeded</Code><Message>Request limit exceeded.</Message>"
+    b"</Error></Errors><RequestID>bench</RequestID></Response>"
+)
+
+
+class _Raw:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+class ThrottlingEC2:
+    """Answers DescribeVpcs, throttling each region beyond `rate` calls per second."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self._lock = Lock()
+
+    def session(self):
+        session = boto3.session.Session(aws_access_key_id="bench", aws_secret_access_key="bench")
+        session.events.register("before-send.ec2.*", self._answer)
+        return session
+
+    def _answer(self, request, **kwargs):
+        region = request.url.split("//", 1)[1].split(".")[1]
+        with self._lock:
+            bucket = self.buckets.setdefault(region, TokenBucket(self.rate, self.burst))
+        if not bucket.try_acquire():
+            return AWSResponse(request.url, 200, {}, _Raw(EMPTY))
+        return AWSResponse(request.url, 503, {}, _Raw(THROTTLED))
+
+
+def run(server, regions, calls, threads, limiter):
+    session = server.session()
+    metrics = Metrics()
+    metrics.instrument(session)
+    if limiter is not None:
+        limiter.instrument(session, metrics=metrics)
+    clients = {region: make_client(session, region) for region in regions}
+
+    def call(region):
+        try:
+            clients[region].describe_vpcs()
+            return True
+        except ClientError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads * len(regions)) as pool:
+        results = list(pool.map(call, [region for _ in range(calls) for region in regions]))
+    elapsed = time.perf_counter() - start
+    report = metrics.report()
+    return elapsed, results.count(False), report["calls"]["throttled"], report["waited_seconds"]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--regions", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=200, help="Calls per region.")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent callers per region.")
+    parser.add_argument(
+        "--server-rate", type=float, default=20.0, help="Calls per second the simulated account allows."
+    )
+    parser.add_argument("--server-burst", type=int, default=20)
+    parser.add_argument("--client-rate", type=float, default=40.0, help="Starting and maximum rate of the limiter.")
+    args = parser.parse_args()
+
+    regions = ["us-east-1", "us-west-2", "eu-west-1", "eu-central-1", "ap-south-1", "sa-east-1"][: args.regions]
+    print(
+        f"{args.regions} regions x {args.calls} calls, {args.threads} threads per region, "
+        f"server {args.server_rate:g}/s burst {args.server_burst}"
+    )
+    print(f"{'run':<28} {'seconds':>8} {'failed':>7} {'throttled':>10} {'waited s':>9}")
+    for name, limiter in (
+        ("botocore legacy retries", None),
+        ("limiter + standard retries", RateLimiter(rate=args.client_rate, burst=args.server_burst)),
+    ):
+        server = ThrottlingEC2(args.server_rate, args.server_burst)
+        elapsed, failed, throttled, waited = run(server, regions, args.calls, args.threads, limiter)
+        print(f"{name:<28} {elapsed:8.2f} {failed:7d} {throttled:10d} {waited:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
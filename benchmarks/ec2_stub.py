@@ -0,0 +1,147 @@
+"""
+In-process EC2 stand-in for benchmarks.
+
+`StubEC2` answers the EC2 and STS calls eazyvizy makes from a topology
+built by `benchmarks.topology.synthetic_topology`. Like
+`botocore.stub.Stubber` it hooks the client's `before-call` event, so
+requests never leave the process, but responses are looked up by
+operation instead of queued in order, so concurrent region scans and
+pagination work. The `Filters` eazyvizy uses to scope scans are honored. Every call is counted, its
+parameters are kept, and it can be delayed by a fixed latency to mimic
+the network.
+"""
+from collections import Counter
+import threading
+import time
+import boto3
+from botocore.awsrequest import AWSResponse
+from benchmarks.topology import ACCOUNT
+
+RESULT_KEYS = {
+    "DescribeVpcs": ("describe_vpcs", "Vpcs"),
+    "DescribeRouteTables": ("describe_route_tables", "RouteTables"),
+    "DescribeSecurityGroups": ("describe_security_groups", "SecurityGroups"),
+    "DescribeVpcPeeringConnections": ("describe_vpc_peering_connections", "VpcPeeringConnections"),
+    "DescribeTransitGatewayAttachments": ("describe_transit_gateway_attachments", "TransitGatewayAttachments"),
+    "DescribeTransitGateways": ("describe_transit_gateways", "TransitGateways"),
+    "DescribeTransitGatewayPeeringAttachments": (
+        "describe_transit_gateway_peering_attachments",
+        "TransitGatewayPeeringAttachments",
+    ),
+    "DescribeTransitGatewayRouteTables": ("describe_transit_gateway_route_tables", "TransitGatewayRouteTables"),
+    "GetTransitGatewayRouteTablePropagations": (
+        "get_transit_gateway_route_table_propagations",
+        "TransitGatewayRouteTablePropagations",
+    ),
+    "DescribeManagedPrefixLists": ("describe_managed_prefix_lists", "PrefixLists"),
+    "GetManagedPrefixListEntries": ("get_managed_prefix_list_entries", "Entries"),
+}
+
+
+def _filter_values(item, name):
+    """Returns the values an EC2 filter `name` compares against for an item."""
+    if name.startswith("tag:"):
+        return [tag["Value"] for tag in item.get("Tags", []) if tag["Key"] == name[4:]]
+    if name == "tag-key":
+        return [tag["Key"] for tag in item.get("Tags", [])]
+    path = {
+        "vpc-id": ("VpcId",),
+        "resource-id": ("ResourceId",),
+        "prefix-list-id": ("PrefixListId",),
+        "state": ("State",),
+        "requester-vpc-info.vpc-id": ("RequesterVpcInfo", "VpcId"),
+        "accepter-vpc-info.vpc-id": ("AccepterVpcInfo", "VpcId"),
+    }.get(name)
+    if path is None:
+        return None
+    value = item
+    for key in path:
+        value = (value or {}).get(key)
+    return [value]
+
+
+def _matches(item, filters):
+    for entry in filters:
+        values = _filter_values(item, entry["Name"])
+        # Filters the stub does not know match everything.
+        if values is not None and not set(values) & set(entry["Values"]):
+            return False
+    return True
+
+
+class StubEC2:
+    """
+    Serves a synthetic topology to boto3 sessions.
+
+    Args:
+      topology (dict): `{region: {operation: [item]}}`, see `synthetic_topology`.
+      latency (float): Seconds every call is delayed by.
+      page_size (int): Items per page when the caller passes no `MaxResults`.
+    """
+
+    def __init__(self, topology, latency=0.0, page_size=1000):
+        self.topology = topology
+        self.latency = latency
+        self.page_size = page_size
+        self.calls = Counter()
+        # `(region, operation, params)` of every call, in order.
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def session(self):
+        """Returns a boto3 session whose EC2 and STS clients are answered by this stub."""
+        session = boto3.session.Session(
+            aws_access_key_id="stub", aws_secret_access_key="stub", region_name="us-east-1"
+        )
+        session.events.register("before-parameter-build.*.*", self._remember_params)
+        session.events.register("before-call.ec2.*", self._answer)
+        session.events.register("before-call.sts.*", self._answer)
+        return session
+
+    @staticmethod
+    def _remember_params(params, context, **kwargs):
+        context["stub_params"] = dict(params)
+
+    def _answer(self, model, context, **kwargs):
+        operation = model.name
+        region = context["client_region"]
+        params = context.get("stub_params", {})
+        with self._lock:
+            self.calls[(region, operation)] += 1
+            self.requests.append((region, operation, params))
+        if self.latency:
+            time.sleep(self.latency)
+        return AWSResponse(None, 200, {}, None), self._respond(operation, region, params)
+
+    def _respond(self, operation, region, params):
+        if operation == "GetCallerIdentity":
+            return {"Account": ACCOUNT, "Arn": f"arn:aws:iam::{ACCOUNT}:user/stub", "UserId": "stub"}
+        if operation == "DescribeRegions":
+            return {"Regions": [{"RegionName": name} for name in self.topology]}
+        if operation == "SearchTransitGatewayRoutes":
+            routes = self.topology.get(region, {}).get("search_transit_gateway_routes", {})
+            routes = routes.get(params["TransitGatewayRouteTableId"], [])
+            limit = params.get("MaxResults") or len(routes)
+            return {"Routes": routes[:limit], "AdditionalRoutesAvailable": len(routes) > limit}
+        name, key = RESULT_KEYS[operation]
+        items = self.topology.get(region, {}).get(name, [])
+        if isinstance(items, dict):
+            # Per route table or per prefix list results.
+            items = items.get(params.get("TransitGatewayRouteTableId") or params.get("PrefixListId"), [])
+        if params.get("Filters"):
+            items = [item for item in items if _matches(item, params["Filters"])]
+        start = int(params.get("NextToken") or 0)
+        end = start + (params.get("MaxResults") or self.page_size)
+        response = {key: items[start:end]}
+        if end < len(items):
+            response["NextToken"] = str(end)
+        return response
+
+    def total(self):
+        return sum(self.calls.values())
+
+    def per_operation(self):
+        counts = Counter()
+        for (_, operation), count in self.calls.items():
+            counts[operation] += count
+        return dict(sorted(counts.items()))
@@ -0,0 +1,290 @@
+"""
+Synthetic AWS networking topologies for benchmarks.
+
+`synthetic_topology` builds Describe* responses for any number of VPCs
+spread over a few regions: every VPC gets a main and two subnet route
+tables, a default, an application and a database security group, some
+get a secondary CIDR block, most are attached to their region's transit
+gateway and each peers with one or two neighbours. Application groups admit
+the application group of a peer by reference, database groups admit a
+customer-managed prefix list of the region's first VPCs, and application
+egress names the AWS-managed S3 prefix list. Each transit gateway
+has one route table with a propagated route per attached VPC (a few of
+them blackholed) and is peered with the gateway of the next region. The
+same seed always produces the same topology. Items carry the bookkeeping
+fields real responses have (association ids, descriptions, tags) besides
+the ones eazyvizy reads.
+
+Main route tables also hold a default route to the VPC's internet
+gateway, which leads out of the VPC and must not connect it to the rest
+of the region.
+"""
+import random
+import zlib
+
+ACCOUNT = "123456789012"
+S3_PREFIX_LIST = "pl-63a5400a"
+REGIONS = (
+    "us-east-1",
+    "us-west-2",
+    "eu-west-1",
+    "eu-central-1",
+    "ap-southeast-1",
+    "ap-northeast-1",
+    "sa-east-1",
+    "ca-central-1",
+)
+
+
+def vpc_cidr(i):
+    """Returns the unique /22 block of the i-th VPC (up to 16384 VPCs)."""
+    return f"10.{i >> 6}.{(i & 63) << 2}.0/22"
+
+
+def _tgw_id(region):
+    return f"tgw-{zlib.crc32(region.encode()):08x}"
+
+
+def _permission(protocol, cidrs, low=None, high=None, groups=(), prefix_lists=()):
+    permission = {
+        "IpProtocol": protocol,
+        "IpRanges": [{"CidrIp": cidr, "Description": "managed by terraform"} for cidr in cidrs],
+        "Ipv6Ranges": [],
+        "UserIdGroupPairs": list(groups),
+        "PrefixListIds": [{"PrefixListId": prefix_list_id} for prefix_list_id in prefix_lists],
+    }
+    if low is not None:
+        permission["FromPort"], permission["ToPort"] = low, high
+    return permission
+
+
+def synthetic_topology(vpcs, regions=4, seed=0):
+    """
+    Builds the Describe* results of a synthetic account.
+
+    Args:
+      vpcs (int): Total number of VPCs.
+      regions (int): Number of regions the VPCs are spread over.
+      seed (int): Random seed.
+
+    Returns:
+      dict: `{region: {operation: [item]}}` with the items of every
+      Describe* call the collector makes. Per route table calls are keyed
+      by route table id: `{"search_transit_gateway_routes": {table_id: [route]}}`.
+    """
+    rnd = random.Random(seed)
+    names = REGIONS[: max(1, min(regions, len(REGIONS)))]
+    members = {region: [] for region in names}
+    for i in range(vpcs):
+        members[names[i % len(names)]].append(i)
+
+    topology = {}
+    for n, (region, indexes) in enumerate(members.items()):
+        tgw_id = _tgw_id(region)
+        table_id = f"tgw-rtb-{zlib.crc32(region.encode()):08x}"
+        prefix_list_id = f"pl-{zlib.crc32(region.encode()):08x}"
+        attached = [i for i in indexes if rnd.random() < 0.7]
+        is_attached = set(attached)
+        data = {
+            "describe_vpcs": [],
+            "describe_route_tables": [],
+            "describe_security_groups": [],
+            "describe_vpc_peering_connections": [],
+            "describe_transit_gateways": [
+                {
+                    "TransitGatewayId": tgw_id,
+                    "OwnerId": ACCOUNT,
+                    "State": "available",
+                    "Tags": [{"Key": "Name", "Value": f"{region}-hub"}],
+                }
+            ],
+            "describe_transit_gateway_attachments": [],
+            "describe_transit_gateway_peering_attachments": [],
+            "describe_transit_gateway_route_tables": [
+                {"TransitGatewayRouteTableId": table_id, "TransitGatewayId": tgw_id, "State": "available"}
+            ],
+            "search_transit_gateway_routes": {table_id: []},
+            "get_transit_gateway_route_table_propagations": {table_id: []},
+            "describe_managed_prefix_lists": [
+                {"PrefixListId": prefix_list_id, "PrefixListName": "corp-services", "OwnerId": ACCOUNT},
+                {"PrefixListId": S3_PREFIX_LIST, "PrefixListName": f"com.amazonaws.{region}.s3", "OwnerId": "AWS"},
+            ],
+            "get_managed_prefix_list_entries": {
+                prefix_list_id: [{"Cidr": vpc_cidr(i), "Description": "corp"} for i in indexes[:3]],
+            },
+        }
+        # Every region's gateway peers with the next region's.
+        for other in sorted({names[(n + 1) % len(names)], names[(n - 1) % len(names)]} - {region}):
+            requester, accepter = sorted([region, other])
+            peering = {
+                "TransitGatewayAttachmentId": f"tgw-attach-{zlib.crc32((requester + accepter).encode()):08x}",
+                "RequesterTgwInfo": {"TransitGatewayId": _tgw_id(requester), "OwnerId": ACCOUNT, "Region": requester},
+                "AccepterTgwInfo": {"TransitGatewayId": _tgw_id(accepter), "OwnerId": ACCOUNT, "Region": accepter},
+                "State": "available",
+            }
+            data["describe_transit_gateway_peering_attachments"].append(peering)
+            data["describe_transit_gateway_attachments"].append(
+                {
+                    "TransitGatewayAttachmentId": peering["TransitGatewayAttachmentId"],
+                    "TransitGatewayId": tgw_id,
+                    "ResourceType": "peering",
+                    "ResourceId": _tgw_id(other),
+                    "State": "available",
+                }
+            )
+        peers = {i: [] for i in indexes}
+        for n, i in enumerate(indexes):
+            for j in {indexes[(n + 1) % len(indexes)], rnd.choice(indexes)}:
+                if j != i and j not in peers[i]:
+                    pcx_id = f"pcx-{i:08x}{j:08x}"
+                    peers[i].append((j, pcx_id))
+                    peers[j].append((i, pcx_id))
+                    data["describe_vpc_peering_connections"].append(
+                        {
+                            "VpcPeeringConnectionId": pcx_id,
+                            "RequesterVpcInfo": {"VpcId": f"vpc-{i:08x}", "CidrBlock": vpc_cidr(i), "OwnerId": ACCOUNT},
+                            "AccepterVpcInfo": {"VpcId": f"vpc-{j:08x}", "CidrBlock": vpc_cidr(j), "OwnerId": ACCOUNT},
+                            "Status": {"Code": "active"},
+                        }
+                    )
+
+        for i in indexes:
+            vpc_id = f"vpc-{i:08x}"
+            vpc = {
+                "VpcId": vpc_id,
+                "CidrBlock": vpc_cidr(i),
+                "OwnerId": ACCOUNT,
+                "State": "available",
+                "DhcpOptionsId": f"dopt-{zlib.crc32(region.encode()):08x}",
+                "InstanceTenancy": "default",
+                "IsDefault": False,
+                "CidrBlockAssociationSet": [
+                    {
+                        "AssociationId": f"vpc-cidr-assoc-{i:08x}",
+                        "CidrBlock": vpc_cidr(i),
+                        "CidrBlockState": {"State": "associated"},
+                    },
+                ],
+                "Tags": [
+                    {"Key": "Name", "Value": f"{region}-vpc-{i}"},
+                    {"Key": "team", "Value": rnd.choice(["payments", "search", "platform", "data"])},
+                ],
+            }
+            if rnd.random() < 0.1:
+                vpc["CidrBlockAssociationSet"].append(
+                    {"CidrBlock": f"100.{64 + (i >> 8) % 64}.{i & 255}.0/24", "CidrBlockState": {"State": "associated"}}
+                )
+            data["describe_vpcs"].append(vpc)
+
+            local = [{"DestinationCidrBlock": vpc_cidr(i), "GatewayId": "local", "State": "active"}]
+            internet = [{"DestinationCidrBlock": "0.0.0.0/0", "GatewayId": f"igw-{i:08x}", "State": "active"}]
+            peering_routes = [
+                {"DestinationCidrBlock": vpc_cidr(j), "VpcPeeringConnectionId": pcx_id, "State": "active"}
+                for j, pcx_id in peers[i]
+            ]
+            tgw_routes = []
+            if i in is_attached:
+                tgw_routes = [
+                    {"DestinationCidrBlock": vpc_cidr(j), "TransitGatewayId": tgw_id, "State": "active"}
+                    for j in rnd.sample(attached, min(len(attached), 4))
+                    if j != i
+                ]
+                data["describe_transit_gateway_attachments"].append(
+                    {
+                        "TransitGatewayAttachmentId": f"tgw-attach-{i:08x}",
+                        "TransitGatewayId": tgw_id,
+                        "ResourceType": "vpc",
+                        "ResourceId": vpc_id,
+                        "ResourceOwnerId": ACCOUNT,
+                        "State": "available",
+                        "Association": {"TransitGatewayRouteTableId": table_id, "State": "associated"},
+                    }
+                )
+                data["get_transit_gateway_route_table_propagations"][table_id].append(
+                    {
+                        "TransitGatewayAttachmentId": f"tgw-attach-{i:08x}",
+                        "ResourceId": vpc_id,
+                        "ResourceType": "vpc",
+                        "State": "enabled",
+                    }
+                )
+                data["search_transit_gateway_routes"][table_id].append(
+                    {
+                        "DestinationCidrBlock": vpc_cidr(i),
+                        "TransitGatewayAttachments": [
+                            {
+                                "ResourceId": vpc_id,
+                                "TransitGatewayAttachmentId": f"tgw-attach-{i:08x}",
+                                "ResourceType": "vpc",
+                            }
+                        ],
+                        "Type": "propagated",
+                        "State": "blackhole" if rnd.random() < 0.05 else "active",
+                    }
+                )
+            for k, routes in enumerate([local + internet, local + peering_routes, local + tgw_routes]):
+                data["describe_route_tables"].append(
+                    {
+                        "RouteTableId": f"rtb-{i:08x}{k}",
+                        "VpcId": vpc_id,
+                        "OwnerId": ACCOUNT,
+                        "Routes": [dict(route, Origin="CreateRoute") for route in routes],
+                        "Associations": [
+                            {
+                                "Main": k == 0,
+                                "RouteTableAssociationId": f"rtbassoc-{i:08x}{k}",
+                                "RouteTableId": f"rtb-{i:08x}{k}",
+                                "AssociationState": {"State": "associated"},
+                            }
+                        ],
+                        "PropagatingVgws": [],
+                        "Tags": [{"Key": "Name", "Value": f"{region}-vpc-{i}-rtb-{k}"}],
+                    }
+                )
+
+            sampled = rnd.sample(indexes, min(len(indexes), 2))
+            neighbours = [vpc_cidr(j) for j, _ in peers[i]] + [vpc_cidr(j) for j in sampled]
+            everywhere = [_permission("-1", ["0.0.0.0/0"])]
+            database = [_permission("tcp", neighbours[-1:], 5432, 5432, prefix_lists=[prefix_list_id])]
+            if i == indexes[0]:
+                # The first VPC of a region acts as shared services, reachable from the whole private range.
+                database.append(_permission("tcp", ["10.0.0.0/8"], 22, 22))
+            app = [_permission("tcp", neighbours, 443, 443), _permission("tcp", neighbours[:1], 8000, 8080)]
+            if peers[i]:
+                j, pcx_id = peers[i][0]
+                app.append(
+                    _permission(
+                        "tcp",
+                        [],
+                        9090,
+                        9090,
+                        groups=[
+                            {
+                                "GroupId": f"sg-{j:08x}1",
+                                "UserId": ACCOUNT,
+                                "VpcId": f"vpc-{j:08x}",
+                                "VpcPeeringConnectionId": pcx_id,
+                            }
+                        ],
+                    )
+                )
+            groups = [
+                ("default", [], everywhere),
+                ("app", app, everywhere + [_permission("tcp", [], 443, 443, prefix_lists=[S3_PREFIX_LIST])]),
+                ("db", database, everywhere),
+            ]
+            for k, (name, ingress, egress) in enumerate(groups):
+                data["describe_security_groups"].append(
+                    {
+                        "GroupId": f"sg-{i:08x}{k}",
+                        "GroupName": name,
+                        "Description": f"{name} security group of {region}-vpc-{i}",
+                        "VpcId": vpc_id,
+                        "OwnerId": ACCOUNT,
+                        "IpPermissions": ingress,
+                        "IpPermissionsEgress": egress,
+                    }
+                )
+        topology[region] = data
+    return topology
+
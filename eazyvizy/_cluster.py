@@ -0,0 +1,197 @@
+"""
+Graph aggregation into clusters.
+
+`Clustering` assigns every node to a cluster by region, account, transit
+gateway hub or VPC tag, and collapses the graph into one node per
+cluster, so the rendered element count grows with the number of clusters
+rather than with the number of resources. Route tables and peering
+connections follow the VPC they were found in; transit gateways
+are placed by their own attributes, except in hub clustering where every
+transit gateway anchors the cluster of the VPCs routed through it.
+
+Edges between clusters are aggregated into one edge per direction that
+carries the number of edges it stands for and the most common port
+summaries. `expansion` returns the members of one cluster with the edges
+that connect them, so a renderer can replace the cluster node on demand.
+"""
+from collections import Counter
+import math
+from ._graph import Graph
+
+CLUSTER_PREFIX = "cluster:"
+STRATEGIES = ("region", "account", "tgw", "tag:KEY")
+UNKNOWN = "unknown"
+# Port summaries listed on an aggregated edge, most common first.
+PORT_SUMMARIES = 5
+
+
+def check_strategy(by):
+    """Returns `by` if it is a clustering strategy, raising ValueError otherwise."""
+    if by in ("region", "account", "tgw") or (by.startswith("tag:") and len(by) > 4):
+        return by
+    raise ValueError(f"Unknown clustering {by!r}, expected one of {', '.join(STRATEGIES)}.")
+
+
+class Clustering:
+    """
+    Assigns the nodes of a graph to clusters.
+
+    Args:
+      graph (Graph): The graph to cluster.
+      by (str): "region", "account", "tgw" for transit gateway hubs, or
+        "tag:KEY" for the value of a VPC tag.
+    """
+
+    def __init__(self, graph, by="region"):
+        self.graph = graph
+        self.by = check_strategy(by)
+        self._hubs = self._tgw_hubs() if by == "tgw" else {}
+        self.cluster_of = [self.cluster_id(self._key(index)) for index in range(graph.node_count)]
+        self.members = {}
+        for index, cluster_id in enumerate(self.cluster_of):
+            self.members.setdefault(cluster_id, []).append(index)
+
+    def cluster_id(self, key):
+        return f"{CLUSTER_PREFIX}{self.by}:{key}"
+
+    def _owner(self, index):
+        # Route tables and peering connections take the region, account and tags of their VPC.
+        attrs = self.graph.node_attrs[index]
+        vpc_id = attrs.get("vpcId")
+        if vpc_id and vpc_id in self.graph:
+            return self.graph.node(vpc_id)
+        return attrs
+
+    def _tgw_hubs(self):
+        """Returns the transit gateway of every VPC routing through one, the lowest id if several."""
+        kinds = [attrs.get("kind") for attrs in self.graph.node_attrs]
+        hubs = {}
+        for source, target in zip(self.graph.edge_sources, self.graph.edge_targets):
+            for tgw, other in ((source, target), (target, source)):
+                vpc_id = self.graph.node_attrs[other].get("vpcId")
+                if kinds[tgw] == "transit_gateway" and vpc_id:
+                    tgw_id = self.graph.node_ids[tgw]
+                    hubs[vpc_id] = min(hubs.get(vpc_id, tgw_id), tgw_id)
+        return hubs
+
+    def _key(self, index):
+        attrs = self.graph.node_attrs[index]
+        owner = self._owner(index)
+        if self.by == "tgw":
+            if attrs.get("kind") == "transit_gateway":
+                return self.graph.node_ids[index]
+            return self._hubs.get(owner.get("vpcId")) or f"{owner.get('region') or UNKNOWN}/no-tgw"
+        if self.by.startswith("tag:"):
+            return (owner.get("tags") or {}).get(self.by[4:]) or "untagged"
+        return owner.get(self.by) or UNKNOWN
+
+    def _cluster_attrs(self, cluster_id):
+        members = self.members[cluster_id]
+        kinds = Counter(self.graph.node_attrs[index].get("kind") or "other" for index in members)
+        key = cluster_id[len(CLUSTER_PREFIX) + len(self.by) + 1 :]
+        return {
+            "kind": "cluster",
+            "label": f"{key}\n{kinds.get('vpc', 0)} VPCs",
+            "title": ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items())),
+            "shape": "box",
+            "clusterBy": self.by,
+            "members": len(members),
+        }
+
+    @staticmethod
+    def _aggregate_attrs(count, ports):
+        summaries = [summary for summary, _ in ports.most_common(PORT_SUMMARIES)]
+        title = f"{count} edge{'s' if count != 1 else ''}"
+        if summaries:
+            title += "\n" + "\n".join(f"{summary} ({ports[summary]})" for summary in summaries)
+        return {
+            "kind": "cluster",
+            "count": count,
+            "label": str(count),
+            "title": title,
+            "ports": "; ".join(summaries) or None,
+            "width": min(1 + math.log2(count), 8),
+        }
+
+    def collapsed(self, expanded=()):
+        """
+        Returns a graph with one node per cluster, except the clusters in
+        `expanded`, whose members are kept. Edges inside a collapsed
+        cluster are dropped, edges leaving one are aggregated.
+        """
+        expanded = set(expanded)
+        graph = Graph()
+        ends = []
+        for index, (node_id, attrs) in enumerate(self.graph.nodes()):
+            cluster_id = self.cluster_of[index]
+            if cluster_id in expanded:
+                graph.add_node(node_id, **attrs, cluster=cluster_id)
+                ends.append(node_id)
+            else:
+                if cluster_id not in graph:
+                    graph.add_node(cluster_id, **self._cluster_attrs(cluster_id))
+                ends.append(cluster_id)
+        aggregated = {}
+        for source, target, attrs in zip(self.graph.edge_sources, self.graph.edge_targets, self.graph.edge_attrs):
+            source_end, target_end = ends[source], ends[target]
+            if source_end == self.cluster_of[source] or target_end == self.cluster_of[target]:
+                if source_end == target_end:
+                    continue
+                entry = aggregated.setdefault((source_end, target_end), [0, Counter()])
+                entry[0] += 1
+                if attrs.get("ports"):
+                    entry[1][attrs["ports"]] += 1
+            else:
+                graph.add_edge(source_end, target_end, **attrs)
+        for (source, target), (count, ports) in aggregated.items():
+            graph.add_edge(source, target, **self._aggregate_attrs(count, ports))
+        return graph
+
+    def _members(self, cluster_id):
+        return [
+            (self.graph.node_ids[index], dict(self.graph.node_attrs[index], cluster=cluster_id))
+            for index in self.members[cluster_id]
+        ]
+
+    def _link(self, edge):
+        source, target = self.graph.edge_sources[edge], self.graph.edge_targets[edge]
+        return (
+            self.graph.node_ids[source],
+            self.graph.node_ids[target],
+            self.graph.edge_attrs[edge],
+            self.cluster_of[source],
+            self.cluster_of[target],
+        )
+
+    def expansion(self, cluster_id):
+        """
+        Returns the members of a cluster and every edge touching them.
+
+        Returns:
+          tuple: `(nodes, edges)` where `nodes` lists `(id, attrs)` and
+          `edges` lists `(source, target, attrs, source_cluster,
+          target_cluster)`, the clusters standing in for the endpoints
+          while those are collapsed.
+
+        Raises:
+          KeyError: If there is no such cluster.
+        """
+        nodes = self._members(cluster_id)
+        sources, targets = self.graph.edge_sources, self.graph.edge_targets
+        edges = [
+            self._link(edge)
+            for edge in range(self.graph.edge_count)
+            if cluster_id in (self.cluster_of[sources[edge]], self.cluster_of[targets[edge]])
+        ]
+        return nodes, edges
+
+    def expansions(self):
+        """Yields `(cluster_id, nodes, edges)` like `expansion` for every cluster, in one pass over the edges."""
+        edges = {cluster_id: [] for cluster_id in self.members}
+        for edge in range(self.graph.edge_count):
+            link = self._link(edge)
+            edges[link[3]].append(link)
+            if link[4] != link[3]:
+                edges[link[4]].append(link)
+        for cluster_id in self.members:
+            yield cluster_id, self._members(cluster_id), edges[cluster_id]
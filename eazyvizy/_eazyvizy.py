@@ -1,14 +1,20 @@
-from pyvis.network import Network
 import json
-import boto3
+from ._cluster import Clustering
+from ._export import export_graph
+from ._graph import Graph
+from ._layout import apply_layout
+from ._writer import write_html
 from .logger import ConsoleLogger
+from .utils.deps import has_numpy
+from .utils.metrics import Metrics
 
 
 class EazyVizy:
     logger = ConsoleLogger()
-    graph = Network(directed=True, filter_menu=True)
 
     def __init__(self):
+        self.graph = Graph()
+        self.metrics = Metrics()
         self.options = {
             "configure": {
                 "enabled": True,
@@ -30,16 +36,16 @@ class EazyVizy:
             },
         }
 
-    def add_node(self, **kwargs):
+    def add_node(self, graph=None, **kwargs):
         id = kwargs.pop("id")
-        self.graph.add_node(id, **kwargs)
+        (self.graph if graph is None else graph).add_node(id, **kwargs)
 
-    def add_edge(self, **kwargs):
-        self.graph.add_edge(**kwargs)
+    def add_edge(self, graph=None, **kwargs):
+        (self.graph if graph is None else graph).add_edge(kwargs.pop("source"), kwargs.pop("to"), **kwargs)
 
     def add_edges(self, edges):
         for edge in edges:
-            self.graph.add_edge(**edge)
+            self.add_edge(**edge)
 
     def get_options(self):
         return json.dumps(self.options)
@@ -50,6 +56,77 @@ class EazyVizy:
     def convert_options_to_dict(self):
         return self.options
 
-    def generate_html(self, name="example.html"):
-        self.graph.set_options(self.get_options())
-        self.graph.show(name)
+    def apply_layout(self, layout="auto", graph=None):
+        """
+        Precomputes node positions and disables browser physics.
+
+        Args:
+          layout (str): "static" to precompute, "physics" to leave the layout
+            to the browser, or "auto" to precompute when NumPy is installed.
+          graph (Graph, optional): The graph to lay out, `self.graph` by default.
+        """
+        if layout == "physics" or (layout == "auto" and not has_numpy()):
+            return
+        with self.metrics.stage("layout"):
+            apply_layout(self.graph if graph is None else graph)
+        self.options["physics"] = {"enabled": False}
+
+    def generate_html(self, name="example.html", layout="auto", split=False, cluster_by=None):
+        """
+        Writes the graph to a vis.js HTML page.
+
+        Args:
+          name (str): The HTML file to write.
+          layout (str): See `apply_layout`.
+          split (bool): Load the nodes and edges from separate files.
+          cluster_by (str, optional): Collapse the graph into clusters by
+            "region", "account", "tgw" or "tag:KEY". Double-clicking a
+            cluster expands it.
+        """
+        graph, expansions = self.graph, None
+        if cluster_by:
+            with self.metrics.stage("cluster"):
+                clustering = Clustering(self.graph, cluster_by)
+                graph = clustering.collapsed()
+            expansions = clustering.expansions()
+        self.apply_layout(layout, graph)
+        with self.metrics.stage("render"):
+            write_html(name, graph, self.options, split=split, expansions=expansions)
+
+    def export(self, path, format=None):  # pylint: disable=redefined-builtin
+        """
+        Streams the graph to a JSONL, GraphML or DOT file.
+
+        Args:
+          path (str): The file to write.
+          format (str, optional): "jsonl", "graphml" or "dot". Inferred from
+            the file extension when omitted.
+        """
+        with self.metrics.stage("export"):
+            export_graph(path, self.graph, format)
+
+    def serve(self, host="127.0.0.1", port=8000, limit=None):
+        """
+        Serves the graph on a local web server until interrupted. The page
+        starts from a region and transit gateway summary and loads node
+        neighborhoods and VPC ego-graphs on demand.
+
+        Args:
+          host (str): The address to listen on.
+          port (int): The port to listen on, 0 for any free port.
+          limit (int, optional): Maximum number of nodes per response.
+        """
+        # http.server is only needed here, not on every CLI start.
+        from ._server import DEFAULT_LIMIT, GraphServer  # pylint: disable=import-outside-toplevel
+
+        server = GraphServer(self.graph, self.options, limit=limit or DEFAULT_LIMIT).make_server(host, port)
+        print(
+            f"Serving {self.graph.node_count} nodes and {self.graph.edge_count} edges "
+            f"on http://{host}:{server.server_port}/ (Ctrl+C to stop)"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,161 @@
+"""
+Streaming machine-readable graph exports.
+
+The built graph is written to JSONL, GraphML or DOT one node and one edge
+at a time, straight from the graph's columns, so exporting a large estate
+never holds a second copy of it. Exports carry the semantic attributes the
+AWS drawing attaches (`kind`, `region`, `vpcId`, `ports`, `dashed`, layout
+coordinates) and leave out presentation-only vis.js settings.
+"""
+import json
+import os
+
+# vis.js styling that means nothing outside the HTML page.
+PRESENTATION_KEYS = frozenset(
+    ["shape", "image", "size", "scaling", "imagePadding", "arrows", "color", "width", "group", "title"]
+)
+# xml.sax.saxutils would pull urllib into every CLI start.
+_XML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".graphml": "graphml", ".dot": "dot", ".gv": "dot"}
+
+
+def _escape(value):
+    return str(value).translate(_XML_ESCAPES)
+
+
+def _quoteattr(value):
+    return f'"{_escape(value)}"'
+
+
+def _data(attrs):
+    return {key: value for key, value in attrs.items() if key not in PRESENTATION_KEYS and value is not None}
+
+
+def _scalar(value):
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def write_jsonl(file, graph):
+    """Writes a header line, then one line per node and one per edge."""
+    file.write(json.dumps({"type": "graph", "nodes": graph.node_count, "edges": graph.edge_count}) + "\n")
+    for node_id, attrs in graph.nodes():
+        file.write(json.dumps({"type": "node", "id": node_id, **_data(attrs)}, default=str) + "\n")
+    for source, target, attrs in graph.edges():
+        file.write(json.dumps({"type": "edge", "source": source, "target": target, **_data(attrs)}, default=str) + "\n")
+
+
+def _graphml_type(value):
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "double"
+    return "string"
+
+
+def _graphml_keys(items):
+    keys = {}
+    for attrs in items:
+        for key, value in _data(attrs).items():
+            kind = _graphml_type(_scalar(value))
+            # Mixed types fall back to string.
+            keys[key] = kind if keys.get(key, kind) == kind else "string"
+    return keys
+
+
+def _graphml_value(value):
+    value = _scalar(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return _escape(str(value))
+
+
+def write_graphml(file, graph):
+    """
+    Writes GraphML. Attribute keys must be declared before the graph, so
+    the attribute dicts are scanned once up front; elements are still
+    written one at a time.
+    """
+    node_keys = _graphml_keys(graph.node_attrs)
+    edge_keys = _graphml_keys(graph.edge_attrs)
+    file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    file.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    for domain, keys in (("node", node_keys), ("edge", edge_keys)):
+        for key, kind in sorted(keys.items()):
+            file.write(
+                f'  <key id={_quoteattr(f"{domain[0]}_{key}")} for="{domain}" attr.name={_quoteattr(key)}'
+                f' attr.type="{kind}"/>\n'
+            )
+    file.write('  <graph id="eazyvizy" edgedefault="directed">\n')
+    for node_id, attrs in graph.nodes():
+        file.write(f"    <node id={_quoteattr(node_id)}>")
+        for key, value in _data(attrs).items():
+            file.write(f'<data key={_quoteattr(f"n_{key}")}>{_graphml_value(value)}</data>')
+        file.write("</node>\n")
+    for source, target, attrs in graph.edges():
+        file.write(f"    <edge source={_quoteattr(source)} target={_quoteattr(target)}>")
+        for key, value in _data(attrs).items():
+            file.write(f'<data key={_quoteattr(f"e_{key}")}>{_graphml_value(value)}</data>')
+        file.write("</edge>\n")
+    file.write("  </graph>\n</graphml>\n")
+
+
+def _dot_id(value):
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def _dot_attrs(attrs):
+    data = _data(attrs)
+    if not data:
+        return ""
+    return " [" + ", ".join(f"{_dot_id(key)}={_dot_id(_scalar(value))}" for key, value in data.items()) + "]"
+
+
+def write_dot(file, graph):
+    """Writes a Graphviz digraph."""
+    file.write("digraph eazyvizy {\n")
+    for node_id, attrs in graph.nodes():
+        file.write(f"  {_dot_id(node_id)}{_dot_attrs(attrs)};\n")
+    for source, target, attrs in graph.edges():
+        file.write(f"  {_dot_id(source)} -> {_dot_id(target)}{_dot_attrs(attrs)};\n")
+    file.write("}\n")
+
+
+WRITERS = {"jsonl": write_jsonl, "graphml": write_graphml, "dot": write_dot}
+
+
+def export_format(path, format=None):  # pylint: disable=redefined-builtin
+    """
+    Returns the export format of `path`, inferred from its extension unless given.
+
+    Raises:
+      ValueError: If the format is unknown.
+    """
+    format = format or FORMATS.get(os.path.splitext(path)[1].lower())
+    if format not in WRITERS:
+        raise ValueError(
+            f"Unknown export format for {path!r}, expected one of {', '.join(sorted(WRITERS))} "
+            f"or an extension among {', '.join(sorted(FORMATS))}."
+        )
+    return format
+
+
+def export_graph(path, graph, format=None):  # pylint: disable=redefined-builtin
+    """
+    Streams a graph to a file.
+
+    Args:
+      path (str): The file to write.
+      graph (Graph): The graph to export.
+      format (str, optional): "jsonl", "graphml" or "dot". Inferred from the
+        file extension when omitted.
+
+    Raises:
+      ValueError: If the format is unknown.
+    """
+    writer = WRITERS[export_format(path, format)]
+    with open(path, "w", encoding="utf-8") as file:
+        writer(file, graph)
@@ -0,0 +1,115 @@
+"""
+Compact in-memory graph model.
+
+Nodes are stored once per resource id and edges once per (source, target)
+pair. Ids are interned and mapped to dense integer indices; edge endpoints
+live in two `array("I")` columns next to a parallel list of attribute
+dicts, and duplicate detection is a dict lookup instead of a list scan.
+Renderers only see the graph in a final export step.
+
+Workers build partial graphs independently, which `Graph.merged` combines
+in a caller-defined order, so the result does not depend on which worker
+finished first.
+"""
+from array import array
+import sys
+
+
+class Graph:
+    """
+    A directed multi-attribute graph with at most one node per id and one
+    edge per (source, target) pair. The first definition of a node or edge
+    wins, later duplicates are ignored. Nodes created implicitly by
+    `add_edge` are placeholders that the first real definition fills in.
+    """
+
+    __slots__ = ("_node_index", "node_ids", "node_attrs", "_edge_index", "edge_sources", "edge_targets", "edge_attrs")
+
+    def __init__(self):
+        self._node_index = {}
+        self.node_ids = []
+        self.node_attrs = []
+        self._edge_index = {}
+        self.edge_sources = array("I")
+        self.edge_targets = array("I")
+        self.edge_attrs = []
+
+    def __contains__(self, node_id):
+        return node_id in self._node_index
+
+    @property
+    def node_count(self):
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_attrs)
+
+    def add_node(self, node_id, **attrs):
+        """Adds a node and returns its index. Existing nodes are left untouched."""
+        return self._add_node(node_id, attrs)
+
+    def _add_node(self, node_id, attrs):
+        index = self._node_index.get(node_id)
+        if index is None:
+            node_id = sys.intern(node_id)
+            index = len(self.node_ids)
+            self._node_index[node_id] = index
+            self.node_ids.append(node_id)
+            self.node_attrs.append(attrs)
+        elif attrs and not self.node_attrs[index]:
+            self.node_attrs[index] = attrs
+        return index
+
+    def add_edge(self, source, to, **attrs):
+        """
+        Adds an edge between two nodes, creating bare nodes for unknown ids.
+
+        Returns:
+          bool: True if the edge was added, False if it already existed.
+        """
+        return self._add_edge(self._add_node(source, {}), self._add_node(to, {}), attrs)
+
+    def _add_edge(self, source, target, attrs):
+        key = (source, target)
+        if key in self._edge_index:
+            return False
+        self._edge_index[key] = len(self.edge_attrs)
+        self.edge_sources.append(source)
+        self.edge_targets.append(target)
+        self.edge_attrs.append(attrs)
+        return True
+
+    def update(self, other):
+        """
+        Adds the nodes and edges of `other` that are not in this graph yet,
+        keeping the existing definitions of shared nodes and edges.
+        """
+        index = [self._add_node(node_id, attrs) for node_id, attrs in zip(other.node_ids, other.node_attrs)]
+        for source, target, attrs in zip(other.edge_sources, other.edge_targets, other.edge_attrs):
+            self._add_edge(index[source], index[target], attrs)
+        return self
+
+    @classmethod
+    def merged(cls, graphs):
+        """Returns a new graph holding the union of `graphs`, earlier graphs winning on duplicates."""
+        graph = cls()
+        for part in graphs:
+            graph.update(part)
+        return graph
+
+    def index(self, node_id):
+        """Returns the dense index of a node. Raises KeyError for unknown ids."""
+        return self._node_index[node_id]
+
+    def node(self, node_id):
+        return self.node_attrs[self._node_index[node_id]]
+
+    def nodes(self):
+        """Yields `(id, attrs)` for every node."""
+        return zip(self.node_ids, self.node_attrs)
+
+    def edges(self):
+        """Yields `(source_id, target_id, attrs)` for every edge."""
+        for source, target, attrs in zip(self.edge_sources, self.edge_targets, self.edge_attrs):
+            yield self.node_ids[source], self.node_ids[target], attrs
@@ -0,0 +1,181 @@
+"""
+Server-side graph layout.
+
+Browser physics does not settle for graphs with more than a few hundred
+nodes, so positions are computed in Python before export. Nodes are seeded
+from the region/VPC hierarchy (regions on an outer ring, VPCs on a ring
+around their region, other resources next to their VPC) and then refined
+with a vectorized Fruchterman-Reingold force simulation. Seeding is
+deterministic, so the same topology always gets the same picture, and
+finished layouts are cached on disk keyed by the graph's structure.
+
+The simulation repels every pair of nodes, so its cost grows with the
+square of the node count. Graphs with more than `FORCE_LIMIT` nodes keep
+their seed positions, which already separate regions and VPCs, instead of
+stalling the export for minutes. The cache keeps the `CACHE_ENTRIES` most
+recently used layouts.
+
+NumPy is an optional dependency, see `eazyvizy.utils.deps.has_numpy`.
+"""
+import hashlib
+import json
+import os
+import zlib
+from .utils import paths
+
+LAYOUT_CACHE_VERSION = 1
+EDGE_LENGTH = 120.0
+ITERATIONS = 60
+CHUNK = 512
+# Largest graph refined by the force simulation, about two seconds of work.
+FORCE_LIMIT = 2000
+CACHE_ENTRIES = 64
+
+
+def graph_key(graph):
+    """Returns a digest of the graph's node ids, hierarchy and edges."""
+    digest = hashlib.sha1(str(LAYOUT_CACHE_VERSION).encode())  # nosec B324
+    for node_id, attrs in graph.nodes():
+        digest.update(f"{node_id}|{attrs.get('region', '')}|{attrs.get('vpcId', '')}\n".encode())
+    digest.update(graph.edge_sources.tobytes())
+    digest.update(graph.edge_targets.tobytes())
+    return digest.hexdigest()
+
+
+def _stable_angle(text):
+    return (zlib.crc32(text.encode()) % 3600) / 3600.0
+
+
+def _ring(np, count, radius):
+    angles = np.arange(count) * (2 * np.pi / max(count, 1))
+    return np.stack([np.cos(angles), np.sin(angles)], axis=1) * radius
+
+
+def _seed_positions(np, graph):
+    """Places regions on a ring, VPCs on rings around their region and the rest next to their VPC."""
+    regions = {}
+    for _, attrs in graph.nodes():
+        regions.setdefault(attrs.get("region", ""), {})
+        if attrs.get("vpcId"):
+            regions[attrs.get("region", "")].setdefault(attrs["vpcId"], None)
+    region_names = sorted(regions)
+    region_radius = EDGE_LENGTH * max(1.0, np.sqrt(graph.node_count / max(len(region_names), 1)))
+    outer = _ring(np, len(region_names), region_radius * 2.5 if len(region_names) > 1 else 0.0)
+    anchors = {}
+    for region, center in zip(region_names, outer):
+        vpc_ids = sorted(regions[region])
+        anchors[region] = center
+        for vpc_id, offset in zip(vpc_ids, _ring(np, len(vpc_ids), region_radius)):
+            anchors[(region, vpc_id)] = center + offset
+    positions = np.zeros((graph.node_count, 2))
+    for i, (node_id, attrs) in enumerate(graph.nodes()):
+        region = attrs.get("region", "")
+        vpc_id = attrs.get("vpcId") or (node_id if node_id.startswith("vpc-") else None)
+        anchor = anchors.get((region, vpc_id), anchors.get(region, np.zeros(2)))
+        angle = 2 * np.pi * _stable_angle(node_id)
+        spread = 0.0 if node_id == vpc_id else EDGE_LENGTH * 0.5
+        positions[i] = anchor + spread * np.array([np.cos(angle), np.sin(angle)])
+    return positions
+
+
+def compute_layout(graph, iterations=ITERATIONS):
+    """
+    Computes 2D positions for every node of a graph. Graphs with more than
+    `FORCE_LIMIT` nodes get their seed positions only.
+
+    Args:
+      graph (Graph): The graph to lay out.
+      iterations (int): Number of force simulation steps.
+
+    Returns:
+      numpy.ndarray: An `(node_count, 2)` array of positions, in node order.
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    positions = _seed_positions(np, graph)
+    anchors = positions.copy()
+    count = len(positions)
+    if count < 2 or count > FORCE_LIMIT:
+        return positions
+    sources = np.frombuffer(graph.edge_sources, dtype=np.uint32).astype(np.intp)
+    targets = np.frombuffer(graph.edge_targets, dtype=np.uint32).astype(np.intp)
+    k = EDGE_LENGTH
+    temperature = k * 2.0
+    cooling = (0.01) ** (1.0 / max(iterations, 1))
+    displacement = np.empty_like(positions)
+    for _ in range(iterations):
+        displacement[:] = 0.0
+        # Repulsion between every pair of nodes, computed in row chunks to bound memory.
+        xs, ys = positions[:, 0].astype(np.float32), positions[:, 1].astype(np.float32)
+        for start in range(0, count, CHUNK):
+            dx = xs[start : start + CHUNK, None] - xs[None, :]
+            dy = ys[start : start + CHUNK, None] - ys[None, :]
+            factor = (k * k) / np.maximum(dx * dx + dy * dy, 1e-2)
+            displacement[start : start + CHUNK, 0] += (dx * factor).sum(axis=1)
+            displacement[start : start + CHUNK, 1] += (dy * factor).sum(axis=1)
+        # Attraction along edges.
+        if len(sources):
+            delta = positions[sources] - positions[targets]
+            force = delta * (np.sqrt(np.einsum("ij,ij->i", delta, delta)) / k)[:, None]
+            np.add.at(displacement, sources, -force)
+            np.add.at(displacement, targets, force)
+        # Gravity towards the hierarchical seed keeps regions and VPCs together.
+        displacement += (anchors - positions) * 0.05 * k
+        length = np.maximum(np.sqrt(np.einsum("ij,ij->i", displacement, displacement)), 1e-9)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= cooling
+    return positions
+
+
+def _evict(cache_dir, keep):
+    """Deletes all but the `keep` most recently used layouts of a cache directory."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".json"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+    entries.sort(reverse=True)
+    for _, path in entries[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def apply_layout(graph, cache_dir=None, iterations=ITERATIONS):
+    """
+    Writes `x`/`y` coordinates into every node of the graph, using the
+    on-disk cache when the same graph was laid out before.
+
+    Args:
+      graph (Graph): The graph to lay out.
+      cache_dir (str, optional): Where layouts are cached (default: `~/.cache/eazyvizy/layout`).
+      iterations (int): Number of force simulation steps.
+    """
+    cache_dir = cache_dir or paths.cache_dir("layout")
+    cache_path = os.path.join(cache_dir, f"{graph_key(graph)}.json")
+    try:
+        with open(cache_path) as file:
+            positions = json.load(file)
+    except (OSError, ValueError):
+        positions = [[round(float(x), 1), round(float(y), 1)] for x, y in compute_layout(graph, iterations)]
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temporary = f"{cache_path}.{os.getpid()}"
+            with open(temporary, "w") as file:
+                json.dump(positions, file)
+            os.replace(temporary, cache_path)
+            _evict(cache_dir, CACHE_ENTRIES)
+        except OSError:
+            pass
+    else:
+        try:
+            # The modification time orders entries by last use for `_evict`.
+            os.utime(cache_path)
+        except OSError:
+            pass
+    for attrs, (x, y) in zip(graph.node_attrs, positions):
+        attrs["x"] = x
+        attrs["y"] = y
@@ -13,12 +13,18 @@ Functions:
   main: The main entry point for the package.
   _print_versions: Prints the versions of the package's dependencies.
 """
-# pylint: disable=broad-exception-caught, redefined-builtin
+# pylint: disable=broad-exception-caught, redefined-builtin, import-outside-toplevel
+# boto3, NumPy and the AWS modules are only imported by the code paths that
+# need them, so `--version`, `--help` and wrapper health checks start fast.
+import json
 from os import system
 import platform
+import sys
+from contextlib import nullcontext
 from traceback import print_exc
 from .utils.args import get_argparser
-from .aws import EazyVizyAWS
+from ._cluster import check_strategy
+from ._export import export_format
 from ._version import __version__
 from .logger import ConsoleLogger
 from .error import (
@@ -35,6 +41,145 @@ def _print_versions():
     print(f"{__version__}")
 
 
+def _report_diff(diff, path=None):
+    if path:
+        with open(path, "w") as file:
+            json.dump(diff, file, indent=2)
+    print(f"{len(diff['added'])} added, {len(diff['removed'])} removed, {len(diff['changed'])} changed connections")
+
+
+def _format_query(result):
+    port = f" {result['protocol']} port {result['port']}" if result["port"] is not None else ""
+    if not result["reachable"]:
+        return f"{result['source']} -> {result['target']}{port}: unreachable"
+    paths = ", ".join(f"{path['type']} {path['via'] or path['route_table']}" for path in result["paths"])
+    return f"{result['source']} -> {result['target']}{port}: reachable via {paths}"
+
+
+def _read_queries(args):
+    if not args.batch:
+        if not args.source or not args.target:
+            raise InvalidEazyVizyError("query needs SOURCE and TARGET, or --batch.")
+        yield args.source, args.target, args.port
+        return
+    with (sys.stdin if args.batch == "-" else open(args.batch)) as file:
+        for line in file:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            if len(fields) not in (2, 3) or (len(fields) == 3 and not fields[2].isdigit()):
+                raise InvalidEazyVizyError(f"Invalid query line {line.strip()!r}, expected 'SOURCE TARGET [PORT]'.")
+            yield fields[0], fields[1], int(fields[2]) if len(fields) == 3 else args.port
+
+
+def _run_query(args):
+    from .aws import EazyVizyAWS, ReachabilityIndex
+
+    index = ReachabilityIndex(EazyVizyAWS().load_snapshot(args.snapshot))
+    all_reachable = True
+    for source, target, port in _read_queries(args):
+        try:
+            result = index.query(source, target, port, protocol=args.protocol)
+        except KeyError as exc:
+            raise InvalidEazyVizyError(exc.args[0]) from exc
+        all_reachable = all_reachable and result["reachable"]
+        print(json.dumps(result) if args.json else _format_query(result))
+    return 0 if all_reachable else 1
+
+
+def _write_metrics(metrics, args):
+    summary = metrics.summary()
+    if summary:
+        print(summary)
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+
+
+def _scan_filter(args):
+    from .aws import ScanFilter
+    from .aws._filter import parse_tag
+
+    try:
+        tags = [parse_tag(text) for text in args.tag]
+        exclude = [text if text.startswith("vpc-") else parse_tag(text) for text in args.exclude]
+    except ValueError as exc:
+        raise InvalidEazyVizyError(str(exc)) from exc
+    return ScanFilter(regions=args.regions, vpc_ids=args.vpc_ids, tags=tags, exclude=exclude)
+
+
+def _new_graph(args):
+    from .aws import DescribeCache, EazyVizyAWS, RateLimiter
+
+    cache = None if args.no_cache or args.snapshot else DescribeCache(max_age=args.max_age)
+    try:
+        limiter = RateLimiter(
+            rate=args.max_rate, burst=args.burst, retry_mode=args.retry_mode, max_attempts=args.max_attempts
+        )
+    except ValueError as exc:
+        raise InvalidEazyVizyError(str(exc)) from exc
+    return EazyVizyAWS(
+        concurrency=args.concurrency, cache=cache, scan_filter=_scan_filter(args), limiter=limiter
+    )
+
+
+def _build(args, graph):
+    if args.incremental:
+        graph.load_previous(args.incremental)
+    if args.snapshot:
+        graph.initialize_from_snapshot(args.snapshot)
+    elif args.accounts:
+        graph.initialize_accounts(args.accounts, processes=args.processes)
+    else:
+        graph.initialize()
+    if args.save_snapshot:
+        graph.save_snapshot(args.save_snapshot)
+    if args.incremental:
+        _report_diff(graph.diff(), args.diff)
+
+
+def _run(args):
+    try:
+        # Checked before scanning, not after minutes of API calls.
+        exports = [(path, export_format(path)) for path in args.export]
+        if args.cluster_by:
+            check_strategy(args.cluster_by)
+    except ValueError as exc:
+        raise InvalidEazyVizyError(str(exc)) from exc
+    graph = _new_graph(args)
+    try:
+        _build(args, graph)
+        if not args.no_html:
+            graph.generate_html(
+                args.output, layout=args.layout, split=args.split_data, cluster_by=args.cluster_by
+            )
+        for path, format in exports:
+            graph.export(path, format)
+    finally:
+        # Failed runs are the ones worth looking at, so their metrics are kept too.
+        _write_metrics(graph.metrics, args)
+    return 0
+
+
+def _run_serve(args):
+    graph = _new_graph(args)
+    try:
+        _build(args, graph)
+    finally:
+        _write_metrics(graph.metrics, args)
+    graph.serve(args.host, args.port, limit=args.limit)
+    return 0
+
+
+def _profiled(path):
+    if not path:
+        return nullcontext()
+    from .utils.metrics import profiled
+
+    return profiled(path)
+
+
 def main():
     """
     Parses command line arguments, loads a requests plan file, and runs
@@ -54,9 +199,12 @@ def main():
     logger = ConsoleLogger()
 
     try:
-        graph = EazyVizyAWS()
-        graph.initialize()
-        graph.generate_html()
+        with _profiled(args.profile):
+            if args.command == "query":
+                return _run_query(args)
+            if args.command == "serve":
+                return _run_serve(args)
+            return _run(args)
     except EazyVizyError as error:
         logger.error(str(error))
         return error.exit_code
@@ -0,0 +1,382 @@
+"""
+Local graph server.
+
+`GraphServer` keeps a built graph and its adjacency indexes in memory and
+serves a vis.js page that starts from a summary: one node per region plus
+the transit gateways joining them. Double-clicking a node fetches more of
+the graph from a JSON API:
+
+- `api/summary`: regions and transit gateways, with edge counts between them.
+- `api/region?name=`: the VPCs and transit gateways of a region.
+- `api/ego?id=`: a VPC with the route tables, gateways and peerings on its
+  paths, and the VPCs at the other end of them, in both directions.
+- `api/neighborhood?id=&depth=`: every node within `depth` hops.
+- `api/search?q=`: nodes whose id or label contains the text.
+
+Every response holds at most `limit` nodes, so the browser only holds the
+part of the estate being looked at. The graph does not change while it is
+served, so encoded responses are cached in memory and carry an ETag the
+browser revalidates against.
+"""
+from collections import defaultdict, deque, namedtuple
+from functools import lru_cache
+import gzip
+import hashlib
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+from urllib.parse import parse_qs, quote, urlsplit
+from ._writer import VIS_NETWORK_JS, _dumps, edge_record, node_record
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+SEARCH_LIMIT = 50
+CACHE_SIZE = 1024
+REGION_PREFIX = "region:"
+UNKNOWN_REGION = "unknown"
+# Smaller bodies are not worth the gzip header.
+COMPRESS_MIN_BYTES = 1024
+
+Response = namedtuple("Response", ["status", "content_type", "body", "gzipped", "etag"])
+
+_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{vis}"></script>
+<style>
+html, body {{ margin: 0; height: 100%; font: 13px sans-serif; }}
+#graph {{ width: 100%; height: 100%; }}
+#bar {{ position: absolute; top: 8px; left: 8px; background: #fff; padding: 4px; border: 1px solid #ddd; }}
+#status {{ color: #666; margin-left: 8px; }}
+</style>
+</head>
+<body>
+<div id="graph"></div>
+<div id="bar">
+<input id="search" placeholder="Search VPC, route table, gateway">
+<button id="reset">Reset</button>
+<span id="status"></span>
+</div>
+<script>
+var nodes = new vis.DataSet();
+var edges = new vis.DataSet();
+var network = new vis.Network(document.getElementById("graph"), {{ nodes: nodes, edges: edges }}, {options});
+var statusBar = document.getElementById("status");
+function load(url) {{
+  statusBar.textContent = "Loading...";
+  fetch(url).then(function (response) {{ return response.json(); }}).then(function (data) {{
+    if (data.error) {{ statusBar.textContent = data.error; return; }}
+    nodes.update(data.nodes);
+    edges.update(data.edges);
+    statusBar.textContent =
+      nodes.length + " nodes, " + edges.length + " edges" + (data.truncated ? " (truncated)" : "");
+  }});
+}}
+network.on("doubleClick", function (params) {{
+  if (params.nodes.length) {{ load(nodes.get(params.nodes[0]).expand); }}
+}});
+document.getElementById("search").addEventListener("keydown", function (event) {{
+  if (event.key === "Enter" && this.value) {{ load("api/search?q=" + encodeURIComponent(this.value)); }}
+}});
+document.getElementById("reset").addEventListener("click", function () {{
+  nodes.clear();
+  edges.clear();
+  load("api/summary");
+}});
+load("api/summary");
+</script>
+</body>
+</html>
+"""
+
+
+def _int(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except ValueError:
+        raise ValueError(f"Parameter {name!r} must be an integer.") from None
+
+
+def _limit(params, default):
+    return max(1, min(_int(params, "limit", default), MAX_LIMIT))
+
+
+def _required(params, name):
+    if not params.get(name):
+        raise ValueError(f"Missing parameter {name!r}.")
+    return params[name]
+
+
+class GraphServer:
+    """
+    Serves a graph to the browser piece by piece.
+
+    Args:
+      graph (Graph): The graph to serve. It must not change while served.
+      options (dict, optional): vis.js network options of the page.
+      limit (int): Default maximum number of nodes per response.
+      cache_size (int): Number of encoded responses kept in memory.
+      title (str): The page title.
+    """
+
+    def __init__(self, graph, options=None, limit=DEFAULT_LIMIT, cache_size=CACHE_SIZE, title="eazyvizy"):
+        self.graph = graph
+        # The page has no configurator panel to attach to.
+        self.options = {key: value for key, value in (options or {}).items() if key != "configure"}
+        self.limit = limit
+        self.title = title
+        self._out = [[] for _ in range(graph.node_count)]
+        self._in = [[] for _ in range(graph.node_count)]
+        for edge, (source, target) in enumerate(zip(graph.edge_sources, graph.edge_targets)):
+            self._out[source].append(edge)
+            self._in[target].append(edge)
+        self._regions = defaultdict(list)
+        # Route tables are not joined to their VPC by an edge.
+        self._tables = defaultdict(list)
+        self._table_vpc = {}
+        for index, attrs in enumerate(graph.node_attrs):
+            self._regions[self._region(index)].append(index)
+            if attrs.get("kind") == "route_table" and attrs.get("vpcId") in graph:
+                self._table_vpc[index] = graph.index(attrs["vpcId"])
+                self._tables[self._table_vpc[index]].append(index)
+        self._routes = {
+            "/api/summary": lambda params: self.summary(),
+            "/api/region": lambda params: self.region(_required(params, "name"), _limit(params, self.limit)),
+            "/api/ego": lambda params: self.ego(_required(params, "id"), _limit(params, self.limit)),
+            "/api/neighborhood": lambda params: self.neighborhood(
+                _required(params, "id"), _int(params, "depth", 1), _limit(params, self.limit)
+            ),
+            "/api/search": lambda params: self.search(_required(params, "q"), _limit(params, SEARCH_LIMIT)),
+        }
+        self._cached_response = lru_cache(maxsize=cache_size)(self._build_response)
+
+    def _kind(self, index):
+        return self.graph.node_attrs[index].get("kind")
+
+    def _region(self, index):
+        return self.graph.node_attrs[index].get("region") or UNKNOWN_REGION
+
+    def _node(self, index):
+        node_id = self.graph.node_ids[index]
+        record = node_record(node_id, self.graph.node_attrs[index])
+        endpoint = "ego" if self._kind(index) == "vpc" else "neighborhood"
+        record["expand"] = f"api/{endpoint}?id={quote(node_id)}"
+        return record
+
+    def _edge(self, edge):
+        source = self.graph.node_ids[self.graph.edge_sources[edge]]
+        target = self.graph.node_ids[self.graph.edge_targets[edge]]
+        return {**edge_record(source, target, self.graph.edge_attrs[edge]), "id": f"{source}>{target}"}
+
+    def _subgraph(self, indices, truncated=False):
+        """Returns the nodes at `indices` and the edges between them."""
+        included = set(indices)
+        edges = [
+            self._edge(edge)
+            for index in indices
+            for edge in self._out[index]
+            if self.graph.edge_targets[edge] in included
+        ]
+        return {"nodes": [self._node(index) for index in indices], "edges": edges, "truncated": truncated}
+
+    def summary(self):
+        """Returns one node per region and per transit gateway, joined by edges counting the edges between them."""
+        groups = [
+            (
+                self.graph.node_ids[index]
+                if self._kind(index) == "transit_gateway"
+                else REGION_PREFIX + self._region(index)
+            )
+            for index in range(self.graph.node_count)
+        ]
+        counts = defaultdict(int)
+        for source, target in zip(self.graph.edge_sources, self.graph.edge_targets):
+            if groups[source] != groups[target]:
+                counts[tuple(sorted((groups[source], groups[target])))] += 1
+        nodes = []
+        for region, indices in sorted(self._regions.items()):
+            kinds = defaultdict(int)
+            for index in indices:
+                kinds[self._kind(index) or "other"] += 1
+            nodes.append(
+                {
+                    "id": REGION_PREFIX + region,
+                    "label": f"{region}\n{kinds.get('vpc', 0)} VPCs",
+                    "title": ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items())),
+                    "kind": "region",
+                    "region": region,
+                    "shape": "box",
+                    "expand": f"api/region?name={quote(region)}",
+                }
+            )
+        nodes += [self._node(index) for index in range(self.graph.node_count) if self._kind(index) == "transit_gateway"]
+        edges = [
+            {
+                "id": f"summary:{source}>{target}",
+                "from": source,
+                "to": target,
+                "label": str(count),
+                "title": f"{count} edges",
+                "width": min(1 + math.log2(count), 8),
+            }
+            for (source, target), count in sorted(counts.items())
+        ]
+        return {"nodes": nodes, "edges": edges, "truncated": False}
+
+    def region(self, name, limit=DEFAULT_LIMIT):
+        """Returns the VPCs and transit gateways of a region and the edges between them."""
+        if name not in self._regions:
+            raise KeyError(f"Unknown region {name!r}.")
+        indices = [index for index in self._regions[name] if self._kind(index) in ("vpc", "transit_gateway")]
+        return self._subgraph(indices[:limit], truncated=len(indices) > limit)
+
+    def neighborhood(self, node_id, depth=1, limit=DEFAULT_LIMIT):
+        """Returns the nodes within `depth` hops of a node, in either direction."""
+        start = self._index(node_id)
+        distance = {start: 0}
+        queue = deque([start])
+        truncated = False
+        while queue and not truncated:
+            index = queue.popleft()
+            if distance[index] >= depth:
+                continue
+            neighbors = [self.graph.edge_targets[edge] for edge in self._out[index]]
+            neighbors += [self.graph.edge_sources[edge] for edge in self._in[index]]
+            for neighbor in neighbors:
+                if neighbor in distance:
+                    continue
+                if len(distance) >= limit:
+                    truncated = True
+                    break
+                distance[neighbor] = distance[index] + 1
+                queue.append(neighbor)
+        return self._subgraph(list(distance), truncated)
+
+    def _path_neighbors(self, index, forward):
+        # Paths leave a VPC through its route tables, and followed backwards end at a route table's VPC.
+        if forward:
+            return [self.graph.edge_targets[edge] for edge in self._out[index]] + self._tables.get(index, [])
+        neighbors = [self.graph.edge_sources[edge] for edge in self._in[index]]
+        if index in self._table_vpc:
+            neighbors.append(self._table_vpc[index])
+        return neighbors
+
+    def ego(self, node_id, limit=DEFAULT_LIMIT):
+        """
+        Returns the ego-graph of a VPC: the nodes on its outgoing and
+        incoming paths, each path followed until it reaches another VPC.
+        Edges carry no path, so past a transit gateway every VPC the
+        gateway reaches is included.
+        """
+        start = self._index(node_id)
+        included = {start: None}
+        truncated = False
+        for forward in (True, False):
+            visited = {start}
+            queue = deque([start])
+            while queue and not truncated:
+                index = queue.popleft()
+                for neighbor in self._path_neighbors(index, forward):
+                    if neighbor in visited:
+                        continue
+                    visited.add(neighbor)
+                    if neighbor not in included:
+                        if len(included) >= limit:
+                            truncated = True
+                            break
+                        included[neighbor] = None
+                    if self._kind(neighbor) != "vpc":
+                        queue.append(neighbor)
+        return self._subgraph(list(included), truncated)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Returns the nodes whose id or label contains `text`, ignoring case."""
+        text = text.lower()
+        indices = []
+        for index, (node_id, attrs) in enumerate(self.graph.nodes()):
+            if text in node_id.lower() or text in str(attrs.get("label", "")).lower():
+                if len(indices) >= limit:
+                    return self._subgraph(indices, truncated=True)
+                indices.append(index)
+        return self._subgraph(indices)
+
+    def _index(self, node_id):
+        try:
+            return self.graph.index(node_id)
+        except KeyError:
+            raise KeyError(f"Unknown node {node_id!r}.") from None
+
+    def page(self):
+        return _PAGE.format(title=self.title, vis=VIS_NETWORK_JS, options=_dumps(self.options))
+
+    def response(self, path, query=""):
+        """
+        Returns the cached `Response` to a GET request.
+
+        Args:
+          path (str): The request path.
+          query (str): The query string, in any parameter order.
+        """
+        params = tuple(sorted((name, values[-1]) for name, values in parse_qs(query).items()))
+        return self._cached_response(path.rstrip("/") or "/", params)
+
+    def _build_response(self, path, params):
+        if path in ("/", "/index.html"):
+            return self._encode(HTTPStatus.OK, "text/html; charset=utf-8", self.page().encode())
+        route = self._routes.get(path)
+        if route is None:
+            return self._error(HTTPStatus.NOT_FOUND, f"Unknown path {path!r}.")
+        try:
+            data = route(dict(params))
+        except KeyError as exc:
+            return self._error(HTTPStatus.NOT_FOUND, exc.args[0])
+        except ValueError as exc:
+            return self._error(HTTPStatus.BAD_REQUEST, str(exc))
+        return self._encode(HTTPStatus.OK, "application/json", _dumps(data).encode())
+
+    def _error(self, status, message):
+        return self._encode(status, "application/json", json.dumps({"error": message}).encode())
+
+    @staticmethod
+    def _encode(status, content_type, body):
+        gzipped = gzip.compress(body, compresslevel=5) if len(body) >= COMPRESS_MIN_BYTES else None
+        return Response(status, content_type, body, gzipped, '"' + hashlib.sha1(body).hexdigest()[:20] + '"')
+
+    def make_server(self, host="127.0.0.1", port=8000):
+        """Returns a threading HTTP server answering with this graph, not started yet."""
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.app = self
+        return server
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "eazyvizy"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urlsplit(self.path)
+        response = self.server.app.response(url.path, url.query)
+        if self.headers.get("If-None-Match") == response.etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", response.etag)
+            self.end_headers()
+            return
+        body = response.body
+        self.send_response(response.status)
+        self.send_header("Content-Type", response.content_type)
+        if response.gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = response.gzipped
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", response.etag)
+        # Cached, but revalidated, since a restarted server may serve another graph.
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        # Every expansion is a request; the console stays quiet.
+        pass
@@ -0,0 +1,188 @@
+"""
+Streaming HTML output for graphs.
+
+The page is written piece by piece: a fixed head, then nodes and edges in
+chunks of `chunk_size` elements, then a short script creating the vis.js
+network. Only one chunk is serialized at a time, so memory stays flat no
+matter how large the graph is.
+
+With `split=True` the chunks go to separate files in a `<name>_data`
+directory next to the page, which loads them one by one after it is shown.
+The chunks are JSON wrapped in a function call rather than bare JSON so
+they also load from `file://` URLs, where browsers block `fetch`.
+
+A clustered graph comes with the expansion of each cluster, written to the
+data directory as well. Double-clicking a cluster node loads its file and
+replaces the node with its members; edges to clusters still collapsed are
+aggregated as in the clustered graph.
+"""
+import json
+import os
+
+CHUNK_SIZE = 2000
+VIS_NETWORK_JS = "https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js"
+
+_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{vis}"></script>
+<style>
+html, body {{ margin: 0; height: 100%; }}
+#graph {{ width: 100%; height: 100%; }}
+#config {{ position: absolute; top: 0; right: 0; max-height: 100%; overflow: auto; background: #fff; }}
+#status {{ position: absolute; bottom: 0; left: 0; padding: 4px; font: 12px sans-serif; color: #666; }}
+</style>
+</head>
+<body>
+<div id="graph"></div>
+<div id="config"></div>
+<div id="status"></div>
+<script>
+var nodes = new vis.DataSet();
+var edges = new vis.DataSet();
+var eazyvizy = {{
+  load: function (kind, items) {{ (kind === "nodes" ? nodes : edges).add(items); }},
+  expand: function (id, members, links) {{
+    var center = network.getPositions([id])[id] || {{ x: 0, y: 0 }};
+    var radius = 40 * Math.sqrt(members.length);
+    edges.remove(edges.getIds({{ filter: function (edge) {{ return edge.from === id || edge.to === id; }} }}));
+    nodes.remove(id);
+    members.forEach(function (node, i) {{
+      var angle = 2 * Math.PI * i / members.length;
+      node.x = center.x + radius * Math.cos(angle);
+      node.y = center.y + radius * Math.sin(angle);
+    }});
+    nodes.add(members);
+    links.forEach(function (link) {{
+      var from = nodes.get(link.from) ? link.from : link.fromCluster;
+      var to = nodes.get(link.to) ? link.to : link.toCluster;
+      if (from === link.from && to === link.to) {{ edges.add(link); return; }}
+      if (from === to) {{ return; }}
+      var edge = edges.get(from + ">" + to) || {{ id: from + ">" + to, from: from, to: to, arrows: "to", count: 0 }};
+      edge.count += 1;
+      edge.label = String(edge.count);
+      edge.title = edge.count + (edge.count === 1 ? " edge" : " edges");
+      edges.update(edge);
+    }});
+  }}
+}};
+</script>
+"""
+
+_NETWORK = """<script>
+var options = {options};
+if (options.configure) {{ options.configure.container = document.getElementById("config"); }}
+var network = new vis.Network(document.getElementById("graph"), {{ nodes: nodes, edges: edges }}, options);
+var chunks = {chunks};
+(function next(i) {{
+  var status = document.getElementById("status");
+  if (i >= chunks.length) {{ status.textContent = ""; return; }}
+  status.textContent = "Loading " + (i + 1) + "/" + chunks.length;
+  var script = document.createElement("script");
+  script.src = chunks[i];
+  script.onload = function () {{ next(i + 1); }};
+  document.body.appendChild(script);
+}})(0);
+network.on("doubleClick", function (params) {{
+  var node = params.nodes.length ? nodes.get(params.nodes[0]) : null;
+  if (!node || !node.expand) {{ return; }}
+  var script = document.createElement("script");
+  script.src = node.expand;
+  document.body.appendChild(script);
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def _dumps(items):
+    # "</" would end the surrounding <script> element.
+    return json.dumps(items, separators=(",", ":"), default=str).replace("</", "<\\/")
+
+
+def node_record(node_id, attrs):
+    """Returns the vis.js node of a graph node."""
+    return {"shape": "dot", **attrs, "id": node_id, "label": attrs.get("label") or node_id}
+
+
+def edge_record(source, target, attrs):
+    """Returns the vis.js edge of a graph edge."""
+    return {"arrows": "to", **attrs, "from": source, "to": target}
+
+
+def _node_records(graph, expand_urls=None):
+    for node_id, attrs in graph.nodes():
+        record = node_record(node_id, attrs)
+        if expand_urls and node_id in expand_urls:
+            record["expand"] = expand_urls[node_id]
+        yield record
+
+
+def _edge_records(graph):
+    for source, target, attrs in graph.edges():
+        yield edge_record(source, target, attrs)
+
+
+def _chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_expansions(data_dir, expansions):
+    """Writes one script per cluster expansion, returning `{cluster_id: url}`."""
+    urls = {}
+    for number, (cluster_id, members, links) in enumerate(expansions):
+        records = [node_record(node_id, attrs) for node_id, attrs in members]
+        link_records = [
+            dict(edge_record(source, target, attrs), fromCluster=source_cluster, toCluster=target_cluster)
+            for source, target, attrs, source_cluster, target_cluster in links
+        ]
+        name = f"cluster-{number:05d}.js"
+        with open(os.path.join(data_dir, name), "w", encoding="utf-8") as file:
+            file.write(f"eazyvizy.expand({_dumps(cluster_id)},{_dumps(records)},{_dumps(link_records)});\n")
+        urls[cluster_id] = f"{os.path.basename(data_dir)}/{name}"
+    return urls
+
+
+def write_html(path, graph, options, chunk_size=CHUNK_SIZE, split=False, title="eazyvizy", expansions=None):
+    """
+    Streams a graph into a standalone vis.js HTML page.
+
+    Args:
+      path (str): The HTML file to write.
+      graph (Graph): The graph to render.
+      options (dict): vis.js network options.
+      chunk_size (int): Number of nodes or edges serialized at a time.
+      split (bool): Write the chunks to a `<name>_data` directory loaded lazily by the page.
+      title (str): The page title.
+      expansions (iterable, optional): `(cluster_id, nodes, edges)` of the
+        cluster nodes of `graph`, as yielded by `Clustering.expansions`,
+        loaded when a cluster node is double-clicked.
+    """
+    data_dir = os.path.splitext(path)[0] + "_data"
+    chunk_urls = []
+    if split or expansions is not None:
+        os.makedirs(data_dir, exist_ok=True)
+    expand_urls = _write_expansions(data_dir, expansions) if expansions is not None else None
+    with open(path, "w", encoding="utf-8") as page:
+        page.write(_HEAD.format(title=title, vis=VIS_NETWORK_JS))
+        for kind, records in (("nodes", _node_records(graph, expand_urls)), ("edges", _edge_records(graph))):
+            for number, chunk in enumerate(_chunks(records, chunk_size)):
+                statement = f"eazyvizy.load({json.dumps(kind)},{_dumps(chunk)});\n"
+                if split:
+                    name = f"{kind}-{number:05d}.js"
+                    with open(os.path.join(data_dir, name), "w", encoding="utf-8") as file:
+                        file.write(statement)
+                    chunk_urls.append(f"{os.path.basename(data_dir)}/{name}")
+                else:
+                    page.write(f"<script>{statement}</script>\n")
+        page.write(_NETWORK.format(options=_dumps(options), chunks=json.dumps(chunk_urls)))
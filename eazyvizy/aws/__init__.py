@@ -1 +1,5 @@
+from ._cache import DescribeCache
 from ._conn import EazyVizyAWS
+from ._filter import ScanFilter
+from ._query import ReachabilityIndex
+from ._throttle import RateLimiter
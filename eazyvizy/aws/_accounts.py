@@ -0,0 +1,126 @@
+"""
+Multi-account discovery.
+
+Each account is scanned in its own worker process with a session built
+from either an IAM role ARN (assumed through STS) or a named profile. The
+workers return plain region snapshots, which the parent process analyzes
+into a single graph. Because node ids are AWS resource ids, peering
+connections and transit gateways shared between accounts collapse into the
+same node.
+
+The default credential chain and endpoint settings are inherited by the
+workers, so pointing `AWS_ENDPOINT_URL` at a local moto server is enough to
+run a multi-account scan offline.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from eazyvizy.utils.metrics import Metrics
+from ._collector import account_id, collect_region, list_regions, make_client
+from ._scheduler import DEFAULT_CONCURRENCY, RegionScheduler
+
+ROLE_SESSION_NAME = "eazyvizy"
+
+
+def session_for(target, base_session=None):
+    """
+    Builds a session for an account.
+
+    Args:
+      target (str): An IAM role ARN to assume, or the name of a configured profile.
+      base_session (boto3.session.Session, optional): The session used to call STS.
+
+    Returns:
+      boto3.session.Session: A session for the target account.
+    """
+    from boto3.session import Session  # pylint: disable=import-outside-toplevel
+
+    if not target.startswith("arn:"):
+        return Session(profile_name=target)
+    base_session = base_session or Session()
+    credentials = make_client(base_session, None, "sts").assume_role(
+        RoleArn=target, RoleSessionName=ROLE_SESSION_NAME
+    )["Credentials"]
+    return Session(
+        aws_access_key_id=credentials["AccessKeyId"],
+        aws_secret_access_key=credentials["SecretAccessKey"],
+        aws_session_token=credentials["SessionToken"],
+        region_name=base_session.region_name,
+    )
+
+
+def collect_account(
+    target, concurrency=DEFAULT_CONCURRENCY, session=None, cache=None, scan_filter=None, limiter=None
+):
+    """
+    Collects every region of one account. Runs inside a worker process.
+
+    Args:
+      target (str): An IAM role ARN or profile name.
+      concurrency (int): Maximum number of regions fetched at the same time.
+      session (boto3.session.Session, optional): A ready session, skipping `session_for`.
+      cache (DescribeCache, optional): Serve fresh Describe* results from this cache.
+      scan_filter (ScanFilter, optional): Only collect the regions and VPCs it covers.
+      limiter (RateLimiter, optional): Paces the account's API calls.
+
+    Returns:
+      tuple: `(snapshots, errors, metrics)` where `errors` maps region names
+      to error messages and `metrics` holds the fetch timings and API calls.
+    """
+    metrics = Metrics()
+    session = metrics.instrument(session or session_for(target))
+    if limiter is not None:
+        limiter.instrument(session, account=target, metrics=metrics)
+    with metrics.stage("fetch"):
+        account = account_id(session)
+        regions = (scan_filter and scan_filter.regions) or list_regions(session, cache=cache, account=account)
+
+    def fetch(region):
+        with metrics.stage("fetch", region):
+            return collect_region(session, region, account, cache=cache, scan_filter=scan_filter)
+
+    scheduler = RegionScheduler(concurrency)
+    snapshots = scheduler.run(regions, fetch, lambda snapshot, region: snapshot)
+    errors = {region: str(error) for region, error in scheduler.errors.items()}
+    return [snapshots[region] for region in sorted(snapshots)], errors, metrics
+
+
+def collect_accounts(
+    targets,
+    processes=None,
+    concurrency=DEFAULT_CONCURRENCY,
+    cache=None,
+    metrics=None,
+    scan_filter=None,
+    limiter=None,
+):
+    """
+    Collects many accounts in parallel worker processes.
+
+    Args:
+      targets (list): IAM role ARNs or profile names.
+      processes (int, optional): Number of worker processes (default: one per CPU).
+      concurrency (int): Maximum number of regions fetched at the same time per account.
+      cache (DescribeCache, optional): Serve fresh Describe* results from this cache.
+      metrics (Metrics, optional): Receives the timings and API calls of every worker.
+      scan_filter (ScanFilter, optional): Only collect the regions and VPCs it covers.
+      limiter (RateLimiter, optional): Its settings pace the API calls of every account.
+
+    Returns:
+      tuple: `(snapshots, errors)` where `errors` maps `target` or
+      `target/region` to error messages.
+    """
+    snapshots, errors = [], {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {target: pool.submit(
+                collect_account, target, concurrency, cache=cache, scan_filter=scan_filter, limiter=limiter
+            ) for target in targets}
+        for target, future in futures.items():
+            try:
+                account_snapshots, account_errors, account_metrics = future.result()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                errors[target] = str(exc)
+                continue
+            if metrics is not None:
+                metrics.merge(account_metrics)
+            snapshots.extend(account_snapshots)
+            errors.update({f"{target}/{region}": error for region, error in account_errors.items()})
+    return snapshots, errors
@@ -0,0 +1,132 @@
+"""
+Persistent cache for AWS Describe* results.
+
+Results of whole paginated calls are stored in a local SQLite database,
+keyed by account, region, operation and parameters. Every operation has
+its own time to live, which `max_age` can override for a run, and the
+least recently used entries are evicted once the database exceeds
+`max_bytes`. The database runs in WAL mode with a busy timeout, so several
+eazyvizy processes on the same machine can share it.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from eazyvizy.utils import paths
+
+DEFAULT_TTL = 15 * 60
+DEFAULT_TTLS = {
+    "describe_regions": 24 * 60 * 60,
+    "describe_vpcs": 60 * 60,
+}
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    operation TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    value BLOB NOT NULL
+)
+"""
+
+
+def default_path():
+    return os.path.join(paths.cache_dir(), "describe.sqlite")
+
+
+class DescribeCache:
+    """
+    A TTL and size bounded cache of Describe* results.
+
+    Args:
+      path (str, optional): The SQLite file (default: `~/.cache/eazyvizy/describe.sqlite`).
+      max_age (float, optional): Ignore entries older than this many seconds, overriding the TTLs.
+      ttls (dict, optional): Seconds to live per operation name, merged over `DEFAULT_TTLS`.
+      max_bytes (int): Size above which least recently used entries are evicted.
+    """
+
+    def __init__(self, path=None, max_age=None, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_path()
+        self.max_age = max_age
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Connections stay in the process that opened them.
+        state = dict(self.__dict__)
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def key(account, region, operation, params):
+        raw = json.dumps([account, region, operation, params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def ttl(self, operation):
+        return self.max_age if self.max_age is not None else self.ttls.get(operation, DEFAULT_TTL)
+
+    def get(self, account, region, operation, params):
+        """Returns the cached result, or None if it is missing or expired."""
+        key = self.key(account, region, operation, params)
+        connection = self._connection()
+        row = connection.execute("SELECT created, value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl(operation):
+            return None
+        connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[1]))
+
+    def put(self, account, region, operation, params, value):
+        data = zlib.compress(json.dumps(value, separators=(",", ":"), default=str).encode())
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO entries (key, operation, created, accessed, size, value) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.key(account, region, operation, params), operation, now, now, len(data), data),
+        )
+        self._evict(connection)
+
+    def _evict(self, connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if excess <= 0:
+                break
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            excess -= size
+
+    def fetch(self, account, region, operation, params, loader):
+        """
+        Returns the cached result of a call, running `loader()` and caching
+        its result on a miss.
+        """
+        value = self.get(account, region, operation, params)
+        if value is None:
+            value = loader()
+            self.put(account, region, operation, params, value)
+        return value
+
+    def clear(self):
+        self._connection().execute("DELETE FROM entries")
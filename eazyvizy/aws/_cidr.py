@@ -0,0 +1,255 @@
+"""
+CIDR overlap index for route and security group matching.
+
+CIDR blocks are aligned, so two blocks overlap only if one contains the
+other. `CidrIndex` exploits that: supernets of a query block are found with
+one hash lookup per prefix length present in the index, and subnets are
+found with a bisect over the sorted integer start addresses. Both IPv4 and
+IPv6 blocks are supported, and every CIDR string is parsed only once.
+"""
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+import ipaddr
+from ._ports import port_record
+
+ANY_CIDRS = frozenset(["0.0.0.0/0", "::/0"])
+# Route states, shared by VPC and transit gateway route tables.
+ACTIVE = "active"
+BLACKHOLE = "blackhole"
+
+
+@lru_cache(maxsize=None)
+def parse_cidr(cidr):
+    """
+    Parses a CIDR string into its integer range.
+
+    Args:
+      cidr (str): An IPv4 or IPv6 CIDR block.
+
+    Returns:
+      tuple: `(version, prefixlen, start, end)` of the block.
+    """
+    network = ipaddr.IPNetwork(cidr)
+    return network.version, network.prefixlen, int(network.network), int(network.broadcast)
+
+
+def _mask(version, prefixlen):
+    bits = 32 if version == 4 else 128
+    return ((1 << prefixlen) - 1) << (bits - prefixlen)
+
+
+def vpc_cidrs(vpc):
+    """
+    Returns every CIDR block of a VPC, including secondary IPv4 blocks and
+    associated IPv6 blocks.
+    """
+    cidrs = [vpc["CidrBlock"]] if vpc.get("CidrBlock") else []
+    for assoc in vpc.get("CidrBlockAssociationSet", []):
+        if assoc.get("CidrBlockState", {}).get("State", "associated") == "associated":
+            if assoc["CidrBlock"] not in cidrs:
+                cidrs.append(assoc["CidrBlock"])
+    for assoc in vpc.get("Ipv6CidrBlockAssociationSet", []):
+        if assoc.get("Ipv6CidrBlockState", {}).get("State", "associated") == "associated":
+            cidrs.append(assoc["Ipv6CidrBlock"])
+    return cidrs
+
+
+class CidrIndex:
+    """
+    A static index of CIDR blocks answering "which blocks overlap this one".
+
+    Entries are added with `add`, after which `build` must be called once
+    before querying.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._prefixlens = {4: set(), 6: set()}
+        self._entries = {4: [], 6: []}
+        self._starts = {4: [], 6: []}
+
+    def __len__(self):
+        return len(self._entries[4]) + len(self._entries[6])
+
+    def add(self, cidr, value):
+        version, prefixlen, start, _ = parse_cidr(cidr)
+        self._exact.setdefault((version, prefixlen, start), []).append(value)
+        self._prefixlens[version].add(prefixlen)
+        self._entries[version].append((start, prefixlen, value))
+
+    def build(self):
+        for version, entries in self._entries.items():
+            entries.sort(key=lambda entry: (entry[0], entry[1]))
+            self._starts[version] = [entry[0] for entry in entries]
+            self._prefixlens[version] = sorted(self._prefixlens[version])
+        return self
+
+    def overlapping(self, cidr):
+        """
+        Returns the values of every indexed block overlapping `cidr`.
+
+        Args:
+          cidr (str): The CIDR block to query.
+
+        Returns:
+          list: Values of supernets (including equal blocks) followed by values of subnets.
+        """
+        version, prefixlen, start, end = parse_cidr(cidr)
+        found = []
+        for length in self._prefixlens[version]:
+            if length > prefixlen:
+                break
+            found.extend(self._exact.get((version, length, start & _mask(version, length)), ()))
+        starts = self._starts[version]
+        entries = self._entries[version]
+        for i in range(bisect_left(starts, start), bisect_right(starts, end)):
+            if entries[i][1] > prefixlen:
+                found.append(entries[i][2])
+        return found
+
+
+def peer_vpc(peering, vpc_id):
+    """
+    Returns the VpcId on the other side of a peering connection from
+    `vpc_id`, or None unless the connection is active and joins `vpc_id`.
+
+    Args:
+      peering (dict): A `VpcPeeringConnections` entry, or None if unknown.
+      vpc_id (str): The VPC whose route names the peering connection.
+    """
+    if not peering or peering.get("Status", {}).get("Code") != ACTIVE:
+        return None
+    requester = peering.get("RequesterVpcInfo", {}).get("VpcId")
+    accepter = peering.get("AccepterVpcInfo", {}).get("VpcId")
+    if vpc_id == requester:
+        return accepter
+    if vpc_id == accepter:
+        return requester
+    return None
+
+
+def route_entries(snapshot):
+    """
+    Yields `(vpc_id, destination_cidr, route, target)` for every route of a
+    snapshot that can lead into another VPC.
+
+    Only peering connections and transit gateways carry traffic between
+    VPCs. Local routes and routes to internet, NAT, VPN or endpoint
+    gateways are left out, as their destinations, often `0.0.0.0/0`, would
+    otherwise overlap every VPC of the region. Blackhole routes, whose
+    target is gone, drop the traffic and are left out as well.
+
+    A peering connection only leads into the VPC on its other side, which
+    is the `target` of its routes; routes over peering connections that
+    are not active, such as deleted, pending or rejected ones, are left
+    out. Transit gateway routes have no `target`, as they lead into any
+    attached VPC their destination overlaps.
+
+    `route` is the `{"id", "type", "assoc_id"}` record attached to connections.
+    """
+    for vpc_id, tables in snapshot.route_tables.items():
+        for table in tables:
+            for route in table.get("Routes", []):
+                if route.get("State") == BLACKHOLE:
+                    continue
+                if route.get("VpcPeeringConnectionId"):
+                    type, assoc_id = "Peering", route["VpcPeeringConnectionId"]
+                    target = peer_vpc(snapshot.peerings.get(assoc_id), vpc_id)
+                    if target is None:
+                        continue
+                elif route.get("TransitGatewayId"):
+                    type, assoc_id, target = "TGW", route["TransitGatewayId"], None
+                else:
+                    continue
+                destination = route.get("DestinationCidrBlock") or route.get("DestinationIpv6CidrBlock")
+                if not destination:
+                    continue
+                yield vpc_id, destination, {"id": table["RouteTableId"], "type": type, "assoc_id": assoc_id}, target
+
+
+def ingress_entries(snapshot):
+    """
+    Yields `(vpc_id, source_cidr, port)` for every ingress range of a snapshot's
+    security groups, referenced groups and prefix lists included, leaving out
+    the catch-all ranges. `port` is the record built by `port_record`.
+    """
+    for vpc_id, cidr, port in _permission_entries(snapshot, "IpPermissions"):
+        if cidr not in ANY_CIDRS:
+            yield vpc_id, cidr, port
+
+
+def egress_entries(snapshot):
+    """Yields `(vpc_id, destination_cidr, port)` for every egress range, catch-all ranges included."""
+    return _permission_entries(snapshot, "IpPermissionsEgress")
+
+
+def _permission_entries(snapshot, key):
+    # Security group and prefix list references are resolved to the blocks they stand for.
+    refs = snapshot.refs
+    for vpc_id, groups in snapshot.security_groups.items():
+        for group in groups:
+            for permission in group.get(key, []):
+                port = port_record(group["GroupId"], permission)
+                for cidr in refs.cidrs(permission):
+                    yield vpc_id, cidr, port
+
+
+def value_key(value):
+    """A hashable key of a flat route or port record, used for deduplication."""
+    return tuple(value.items())
+
+
+class RegionIndex:
+    """
+    Route and security group overlap indexes for one region snapshot.
+
+    Grouped results keep the order in which `route_entries` and
+    `ingress_entries` produce the entries, so they match the batched
+    matrix stage exactly.
+
+    Args:
+      snapshot (RegionSnapshot): The snapshot to index.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.routes = CidrIndex()
+        self.ingress = CidrIndex()
+        self._routes_into = {}
+        self._ingress_from = {}
+        for seq, (vpc_id, cidr, route, target) in enumerate(route_entries(snapshot)):
+            self.routes.add(cidr, (seq, vpc_id, route, target))
+        for seq, (vpc_id, cidr, port) in enumerate(ingress_entries(snapshot)):
+            self.ingress.add(cidr, (seq, vpc_id, port, None))
+        self.routes.build()
+        self.ingress.build()
+
+    @staticmethod
+    def _group(index, cidrs, target_vpc_id=None):
+        found = {}
+        for cidr in cidrs:
+            for seq, vpc_id, value, target in index.overlapping(cidr):
+                if target is None or target == target_vpc_id:
+                    found[seq] = (vpc_id, value)
+        grouped, seen = {}, set()
+        for seq in sorted(found):
+            vpc_id, value = found[seq]
+            key = (vpc_id, value_key(value))
+            if key not in seen:
+                seen.add(key)
+                grouped.setdefault(vpc_id, []).append(value)
+        return grouped
+
+    def routes_into(self, target_vpc_id):
+        """Returns `{vpc_id: [route]}` for routes whose destination overlaps the target VPC."""
+        if target_vpc_id not in self._routes_into:
+            target = self.snapshot.vpcs[target_vpc_id]
+            self._routes_into[target_vpc_id] = self._group(self.routes, vpc_cidrs(target), target_vpc_id)
+        return self._routes_into[target_vpc_id]
+
+    def ingress_from(self, source_vpc_id):
+        """Returns `{vpc_id: [port]}` for ingress rules whose source overlaps the source VPC."""
+        if source_vpc_id not in self._ingress_from:
+            source = self.snapshot.vpcs[source_vpc_id]
+            self._ingress_from[source_vpc_id] = self._group(self.ingress, vpc_cidrs(source))
+        return self._ingress_from[source_vpc_id]
@@ -0,0 +1,522 @@
+"""
+Bulk collection of a region's EC2 networking state.
+
+Instead of walking lazy boto3 resource collections (which issue a fresh
+paginated Describe* call every time `vpc.route_tables.all()` or
+`vpc.security_groups.all()` is iterated), the collector performs one
+paginated call per resource type per region and indexes the results by
+VpcId in memory. The pairwise analysis then reads only from the snapshot,
+so the number of API calls scales with the number of regions rather than
+the number of VPC pairs.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+from threading import Lock
+from ._cidr import RegionIndex
+from ._filter import ScanFilter, vpc_filters
+from ._records import compact, compact_records
+from ._refs import AWS_OWNER, ReferenceResolver, referenced_prefix_lists
+from ._tgw import TransitGatewayIndex
+
+# Parallel per-route-table calls of one region's transit gateway discovery.
+TGW_ROUTE_TABLE_WORKERS = 4
+# The most routes one SearchTransitGatewayRoutes call returns.
+TGW_ROUTES_LIMIT = 1000
+
+# boto3 sessions are not thread safe; client creation is serialized.
+_CLIENT_LOCK = Lock()
+
+
+def make_client(session, region, service="ec2"):
+    with _CLIENT_LOCK:
+        return session.client(service, region_name=region)
+
+
+def _paginate(client, operation, key, **kwargs):
+    paginator = client.get_paginator(operation)
+    for page in paginator.paginate(**kwargs):
+        yield from page.get(key, [])
+
+
+def describe(client, operation, key, cache=None, account=None, region=None, **kwargs):
+    """
+    Returns every item of a Describe* call, following pagination where the
+    operation supports it, served from `cache` when fresh.
+
+    Args:
+      client: The EC2 client.
+      operation (str): The paginated operation, e.g. "describe_vpcs".
+      key (str): The result key holding the items, e.g. "Vpcs".
+      cache (DescribeCache, optional): The cache to read and fill.
+      account (str, optional): The account id, part of the cache key.
+      region (str, optional): The region, part of the cache key.
+      **kwargs: Parameters of the call.
+
+    Returns:
+      list: The items of every page.
+    """
+    def load():
+        if client.can_paginate(operation):
+            return list(_paginate(client, operation, key, **kwargs))
+        return getattr(client, operation)(**kwargs).get(key, [])
+
+    if cache is None:
+        return load()
+    return cache.fetch(account, region, operation, kwargs, load)
+
+
+def _group_by(items, key):
+    grouped = defaultdict(list)
+    for item in items:
+        grouped[item.get(key)].append(item)
+    return dict(grouped)
+
+
+class RegionSnapshot:
+    """
+    In-memory view of one region's VPCs and the resources attached to them.
+
+    Args:
+      region (str): The region name.
+      vpcs (list): `Vpcs` entries as returned by DescribeVpcs.
+      route_tables (list): `RouteTables` entries as returned by DescribeRouteTables.
+      security_groups (list): `SecurityGroups` entries as returned by DescribeSecurityGroups.
+      peerings (list): `VpcPeeringConnections` entries.
+      tgw_attachments (list): `TransitGatewayAttachments` entries of every resource type.
+      transit_gateways (list): `TransitGateways` entries.
+      tgw_route_tables (list): `TransitGatewayRouteTables` entries, each with
+        its `Routes` and `Propagations` added.
+      tgw_peerings (list): `TransitGatewayPeeringAttachments` entries.
+      prefix_lists (list): `PrefixLists` entries referenced by the security
+        groups, each with its `Entries` added.
+      account (str, optional): The account the region was collected from.
+      connections (dict, optional): Previously analyzed connections keyed by source VpcId.
+    """
+
+    def __init__(
+        self,
+        region,
+        vpcs,
+        route_tables,
+        security_groups,
+        peerings=(),
+        tgw_attachments=(),
+        transit_gateways=(),
+        tgw_route_tables=(),
+        tgw_peerings=(),
+        prefix_lists=(),
+        account=None,
+        connections=None,
+    ):
+        self.region = region
+        self.account = account
+        # Only the fields the analysis reads are kept, see `compact`.
+        self.vpcs = {vpc["VpcId"]: vpc for vpc in compact_records("vpcs", vpcs)}
+        self.route_tables = _group_by(compact_records("route_tables", route_tables), "VpcId")
+        self.security_groups = _group_by(compact_records("security_groups", security_groups), "VpcId")
+        self.peerings = {pcx["VpcPeeringConnectionId"]: pcx for pcx in compact_records("peerings", peerings)}
+        self.tgw_attachments = _group_by(compact_records("tgw_attachments", tgw_attachments), "ResourceId")
+        self.transit_gateways = {
+            tgw["TransitGatewayId"]: tgw for tgw in compact_records("transit_gateways", transit_gateways)
+        }
+        self.tgw_route_tables = {
+            table["TransitGatewayRouteTableId"]: table
+            for table in compact_records("tgw_route_tables", tgw_route_tables)
+        }
+        self.tgw_peerings = {
+            peering["TransitGatewayAttachmentId"]: peering for peering in compact_records("tgw_peerings", tgw_peerings)
+        }
+        self.prefix_lists = {
+            prefix_list["PrefixListId"]: prefix_list for prefix_list in compact_records("prefix_lists", prefix_lists)
+        }
+        self.connections = compact(dict(connections or {}))
+        self._index = None
+        self._tgw = None
+        self._refs = None
+        self._hashes = None
+        # The account snapshots a `combined` snapshot was built from.
+        self.parts = ()
+
+    def __getstate__(self):
+        # The indexes are cheap to rebuild and expensive to ship between processes.
+        state = dict(self.__dict__)
+        state["_index"] = None
+        state["_tgw"] = None
+        state["_refs"] = None
+        state["_hashes"] = None
+        return state
+
+    def __iter__(self):
+        return iter(self.vpcs.values())
+
+    def to_dict(self):
+        """Returns the snapshot as plain API-shaped lists, the inverse of `from_dict`."""
+        return {
+            "account": self.account,
+            "region": self.region,
+            "vpcs": list(self.vpcs.values()),
+            "route_tables": [table for tables in self.route_tables.values() for table in tables],
+            "security_groups": [group for groups in self.security_groups.values() for group in groups],
+            "peerings": list(self.peerings.values()),
+            "tgw_attachments": [
+                attachment for attachments in self.tgw_attachments.values() for attachment in attachments
+            ],
+            "transit_gateways": list(self.transit_gateways.values()),
+            "tgw_route_tables": list(self.tgw_route_tables.values()),
+            "tgw_peerings": list(self.tgw_peerings.values()),
+            "prefix_lists": list(self.prefix_lists.values()),
+            "hashes": self.hashes,
+            "connections": self.connections,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        snapshot = cls(
+            data["region"],
+            vpcs=data["vpcs"],
+            route_tables=data["route_tables"],
+            security_groups=data["security_groups"],
+            peerings=data["peerings"],
+            tgw_attachments=data["tgw_attachments"],
+            transit_gateways=data["transit_gateways"],
+            tgw_route_tables=data["tgw_route_tables"],
+            tgw_peerings=data["tgw_peerings"],
+            prefix_lists=data["prefix_lists"],
+            account=data["account"],
+            connections=data["connections"],
+        )
+        snapshot._hashes = data["hashes"]
+        return snapshot
+
+    @classmethod
+    def combined(cls, snapshots):
+        """
+        Returns one snapshot of a region holding the resources of several
+        accounts, so VPCs peered or attached across accounts are analyzed
+        together. Resources seen from several accounts, such as the
+        attachments of a shared transit gateway, are kept once.
+        """
+        attachments = {}
+        for part in snapshots:
+            for items in part.tgw_attachments.values():
+                for attachment in items:
+                    attachments.setdefault(attachment["TransitGatewayAttachmentId"], attachment)
+        snapshot = cls(
+            snapshots[0].region,
+            vpcs=[vpc for part in snapshots for vpc in part.vpcs.values()],
+            route_tables=[table for part in snapshots for tables in part.route_tables.values() for table in tables],
+            security_groups=[
+                group for part in snapshots for groups in part.security_groups.values() for group in groups
+            ],
+            peerings=[pcx for part in snapshots for pcx in part.peerings.values()],
+            tgw_attachments=list(attachments.values()),
+            transit_gateways=[tgw for part in snapshots for tgw in part.transit_gateways.values()],
+            tgw_route_tables=[table for part in snapshots for table in part.tgw_route_tables.values()],
+            tgw_peerings=[peering for part in snapshots for peering in part.tgw_peerings.values()],
+            prefix_lists=[prefix_list for part in snapshots for prefix_list in part.prefix_lists.values()],
+            connections={vpc_id: items for part in snapshots for vpc_id, items in part.connections.items()},
+        )
+        snapshot.parts = tuple(snapshots)
+        return snapshot
+
+    def share_connections(self):
+        """Hands the connections of a `combined` snapshot back to the account snapshots it was built from."""
+        for part in self.parts:
+            part.connections = {vpc_id: self.connections[vpc_id] for vpc_id in part.vpcs if vpc_id in self.connections}
+
+    def subset(self, vpc_ids):
+        """Returns a snapshot restricted to the given VPCs."""
+        vpc_ids = set(vpc_ids)
+        data = self.to_dict()
+        for key in ("vpcs", "route_tables", "security_groups"):
+            data[key] = [item for item in data[key] if item.get("VpcId") in vpc_ids]
+        data["tgw_attachments"] = [
+            item
+            for item in data["tgw_attachments"]
+            if item.get("ResourceType", "vpc") != "vpc" or item.get("ResourceId") in vpc_ids
+        ]
+        data["connections"] = {
+            vpc_id: [connection for connection in connections if connection["target"] in vpc_ids]
+            for vpc_id, connections in self.connections.items()
+            if vpc_id in vpc_ids
+        }
+        return RegionSnapshot.from_dict(data)
+
+    @property
+    def hashes(self):
+        """
+        Content hashes keyed by VpcId, covering the VPC, its route tables, its
+        security groups and the prefix lists they reference. Used to detect
+        which VPCs changed between scans.
+        """
+        if self._hashes is None:
+            self._hashes = {}
+            for vpc_id, vpc in self.vpcs.items():
+                groups = self.security_groups_of(vpc_id)
+                content = [vpc, self.route_tables_of(vpc_id), groups]
+                prefix_lists = [
+                    self.prefix_lists[list_id]
+                    for list_id in referenced_prefix_lists(groups)
+                    if list_id in self.prefix_lists
+                ]
+                if prefix_lists:
+                    # Only appended when present, so hashes of VPCs without references stay as they were.
+                    content.append(prefix_lists)
+                content = json.dumps(content, sort_keys=True, default=str)
+                self._hashes[vpc_id] = hashlib.sha1(content.encode()).hexdigest()  # nosec B324
+        return self._hashes
+
+    def __len__(self):
+        return len(self.vpcs)
+
+    @property
+    def index(self):
+        """The route and security group CIDR index, built on first use."""
+        if self._index is None:
+            self._index = RegionIndex(self)
+        return self._index
+
+    @property
+    def refs(self):
+        """The security group and prefix list reference resolver, built on first use."""
+        if self._refs is None:
+            self._refs = ReferenceResolver(self)
+        return self._refs
+
+    @property
+    def tgw(self):
+        """The transit gateway route resolver, built on first use."""
+        if self._tgw is None:
+            self._tgw = TransitGatewayIndex(self)
+        return self._tgw
+
+    def route_tables_of(self, vpc_id):
+        return self.route_tables.get(vpc_id, [])
+
+    def security_groups_of(self, vpc_id):
+        return self.security_groups.get(vpc_id, [])
+
+    def tgw_attachments_of(self, vpc_id):
+        return self.tgw_attachments.get(vpc_id, [])
+
+
+def combine_accounts(snapshots):
+    """
+    Returns the units of analysis of some snapshots, in region order: one
+    snapshot per region, the `combined` snapshot where several accounts
+    were collected in the region.
+    """
+    regions = {}
+    for snapshot in snapshots:
+        regions.setdefault(snapshot.region, []).append(snapshot)
+    return [
+        parts[0] if len(parts) == 1 else RegionSnapshot.combined(parts) for _, parts in sorted(regions.items())
+    ]
+
+
+def account_id(session):
+    """Returns the id of the account the session's credentials belong to."""
+    return make_client(session, None, "sts").get_caller_identity()["Account"]
+
+
+def list_regions(session, cache=None, account=None):
+    """Returns the names of every region enabled for the session's account."""
+    client = make_client(session, None)
+
+    def load():
+        return client.describe_regions()["Regions"]
+
+    regions = load() if cache is None else cache.fetch(account, None, "describe_regions", {}, load)
+    return [region["RegionName"] for region in regions]
+
+
+def describe_for_vpcs(client, operation, key, name, vpc_ids, scope):
+    """
+    Returns the items of a Describe* call belonging to some VPCs, filtering
+    `name` by their ids in as few calls as EC2 allows.
+    """
+    items = []
+    for filters in vpc_filters(name, vpc_ids):
+        items += describe(client, operation, key, Filters=filters, **scope)
+    return items
+
+
+def search_transit_gateway_routes(client, table_id, cache=None, account=None, region=None):
+    """
+    Returns the active and blackhole routes of a transit gateway route table.
+
+    SearchTransitGatewayRoutes is not paginated: it returns at most
+    `TGW_ROUTES_LIMIT` routes and sets `AdditionalRoutesAvailable` when the
+    table holds more. Both are returned, so a truncated table is never
+    mistaken for a complete one.
+
+    Returns:
+      dict: `{"Routes": [...], "AdditionalRoutesAvailable": bool}`.
+    """
+    params = {
+        "TransitGatewayRouteTableId": table_id,
+        "Filters": [{"Name": "state", "Values": ["active", "blackhole"]}],
+        "MaxResults": TGW_ROUTES_LIMIT,
+    }
+
+    def load():
+        response = client.search_transit_gateway_routes(**params)
+        return {
+            "Routes": response.get("Routes", []),
+            "AdditionalRoutesAvailable": bool(response.get("AdditionalRoutesAvailable")),
+        }
+
+    if cache is None:
+        return load()
+    return cache.fetch(account, region, "search_transit_gateway_routes", params, load)
+
+
+def collect_transit_gateways(client, scope, vpc_ids=None):
+    """
+    Fetches the transit gateways of a region with their attachments, route
+    tables and peering attachments. Routes and propagations are per route
+    table; those calls run concurrently.
+
+    Args:
+      client: The EC2 client.
+      scope (dict): `cache`, `account` and `region` of the `describe` calls.
+      vpc_ids (list, optional): Only describe the VPC attachments of these VPCs.
+
+    Returns:
+      dict: `transit_gateways`, `tgw_attachments`, `tgw_route_tables` and
+      `tgw_peerings` keyword arguments for `RegionSnapshot`.
+    """
+    transit_gateways = describe(client, "describe_transit_gateways", "TransitGateways", **scope)
+    if not transit_gateways:
+        return {"transit_gateways": [], "tgw_attachments": [], "tgw_route_tables": [], "tgw_peerings": []}
+    if vpc_ids is None:
+        attachments = describe(client, "describe_transit_gateway_attachments", "TransitGatewayAttachments", **scope)
+    else:
+        attachments = describe_for_vpcs(
+            client, "describe_transit_gateway_attachments", "TransitGatewayAttachments", "resource-id", vpc_ids, scope
+        )
+    peerings = describe(
+        client, "describe_transit_gateway_peering_attachments", "TransitGatewayPeeringAttachments", **scope
+    )
+    route_tables = describe(client, "describe_transit_gateway_route_tables", "TransitGatewayRouteTables", **scope)
+
+    def complete(table):
+        table_id = table["TransitGatewayRouteTableId"]
+        routes = search_transit_gateway_routes(client, table_id, **scope)
+        propagations = describe(
+            client,
+            "get_transit_gateway_route_table_propagations",
+            "TransitGatewayRouteTablePropagations",
+            TransitGatewayRouteTableId=table_id,
+            **scope,
+        )
+        return dict(
+            table,
+            Routes=routes["Routes"],
+            RoutesTruncated=routes["AdditionalRoutesAvailable"],
+            Propagations=propagations,
+        )
+
+    with ThreadPoolExecutor(max_workers=TGW_ROUTE_TABLE_WORKERS) as pool:
+        route_tables = list(pool.map(complete, route_tables))
+    return {
+        "transit_gateways": transit_gateways,
+        "tgw_attachments": attachments,
+        "tgw_route_tables": route_tables,
+        "tgw_peerings": peerings,
+    }
+
+
+def collect_prefix_lists(client, scope, security_groups):
+    """
+    Fetches the managed prefix lists referenced by some security groups, with
+    one bulk describe and one entries call per customer-managed list.
+    AWS-managed lists hold public service ranges and are kept without entries.
+
+    Args:
+      client: The EC2 client.
+      scope (dict): `cache`, `account` and `region` of the `describe` calls.
+      security_groups (list): `SecurityGroups` entries.
+
+    Returns:
+      list: `PrefixLists` entries, each with its `Entries` added.
+    """
+    prefix_list_ids = referenced_prefix_lists(security_groups)
+    prefix_lists = []
+    for filters in vpc_filters("prefix-list-id", prefix_list_ids):
+        for prefix_list in describe(client, "describe_managed_prefix_lists", "PrefixLists", Filters=filters, **scope):
+            entries = []
+            if prefix_list.get("OwnerId") != AWS_OWNER:
+                entries = describe(
+                    client,
+                    "get_managed_prefix_list_entries",
+                    "Entries",
+                    PrefixListId=prefix_list["PrefixListId"],
+                    **scope,
+                )
+            prefix_lists.append(dict(prefix_list, Entries=entries))
+    return prefix_lists
+
+
+def collect_region(session, region, account=None, cache=None, scan_filter=None):
+    """
+    Fetches every VPC, route table, security group and peering connection of
+    a region with one paginated call each, plus the prefix lists the groups
+    reference (see `collect_prefix_lists`) and its transit gateway routing
+    (see `collect_transit_gateways`).
+
+    Args:
+      session (boto3.session.Session): The session to create the EC2 client from.
+      region (str): The region to collect.
+      account (str, optional): The account id to tag the snapshot with.
+      cache (DescribeCache, optional): Serve fresh results from this cache.
+      scan_filter (ScanFilter, optional): Only collect the VPCs it covers,
+        filtering on the API side.
+
+    Returns:
+      RegionSnapshot: The collected resources indexed by VpcId.
+    """
+    client = make_client(session, region)
+    scope = {"cache": cache, "account": account, "region": region}
+    scan_filter = scan_filter or ScanFilter()
+    if not scan_filter.narrows:
+        security_groups = describe(client, "describe_security_groups", "SecurityGroups", **scope)
+        return RegionSnapshot(
+            region,
+            vpcs=describe(client, "describe_vpcs", "Vpcs", **scope),
+            route_tables=describe(client, "describe_route_tables", "RouteTables", **scope),
+            security_groups=security_groups,
+            peerings=describe(client, "describe_vpc_peering_connections", "VpcPeeringConnections", **scope),
+            prefix_lists=collect_prefix_lists(client, scope, security_groups),
+            account=account,
+            **collect_transit_gateways(client, scope),
+        )
+    vpcs = [
+        vpc
+        for params in scan_filter.vpc_queries()
+        for vpc in describe(client, "describe_vpcs", "Vpcs", **params, **scope)
+        if scan_filter.matches(vpc)
+    ]
+    if not vpcs:
+        return RegionSnapshot(region, [], [], [], account=account)
+    vpc_ids = sorted(vpc["VpcId"] for vpc in vpcs)
+    peerings = {}
+    # Filters of different names are ANDed, so each side is asked separately.
+    for name in ("requester-vpc-info.vpc-id", "accepter-vpc-info.vpc-id"):
+        for peering in describe_for_vpcs(
+            client, "describe_vpc_peering_connections", "VpcPeeringConnections", name, vpc_ids, scope
+        ):
+            peerings[peering["VpcPeeringConnectionId"]] = peering
+    security_groups = describe_for_vpcs(client, "describe_security_groups", "SecurityGroups", "vpc-id", vpc_ids, scope)
+    return RegionSnapshot(
+        region,
+        vpcs=vpcs,
+        route_tables=describe_for_vpcs(client, "describe_route_tables", "RouteTables", "vpc-id", vpc_ids, scope),
+        security_groups=security_groups,
+        peerings=list(peerings.values()),
+        prefix_lists=collect_prefix_lists(client, scope, security_groups),
+        account=account,
+        **collect_transit_gateways(client, scope, vpc_ids),
+    )
@@ -1,8 +1,7 @@
-from pyvis.network import Network
-from boto3.session import Session
-import ipaddr
 import random
 from eazyvizy._eazyvizy import EazyVizy
+from eazyvizy._graph import Graph
+from eazyvizy.utils.deps import has_numpy
 from eazyvizy.error import (
     InterruptedError,
     InvalidEazyVizyError,
@@ -11,96 +10,181 @@ from eazyvizy.error import (
     UNKNOWN_ERROR,
     UNKNOWN_ERROR_MSG,
 )
-import asyncio
+from ._accounts import collect_accounts
+from ._cidr import vpc_cidrs
+from ._collector import RegionSnapshot, account_id, collect_region, combine_accounts, list_regions
+from ._filter import ScanFilter
+from ._incremental import diff_topology, index_snapshots, reuse_connections
+from ._matrix import ReachabilityMatrix
+from ._ports import PortSet
+from ._scheduler import DEFAULT_CONCURRENCY, RegionScheduler
+from ._snapshot import read_snapshot, write_snapshot
+from ._throttle import RateLimiter
 
 
-def background(f):
-    def wrapped(*args, **kwargs):
-        return asyncio.get_event_loop().run_in_executor(None, f, *args, **kwargs)
+class EazyVizyAWS(EazyVizy):
+    def __init__(self, session=None, concurrency=DEFAULT_CONCURRENCY, cache=None, scan_filter=None, limiter=None):
+        super().__init__()
+        self.concurrency = concurrency
+        self.cache = cache
+        # Regions and VPCs to cover, pushed down into the API calls.
+        self.scan_filter = scan_filter or ScanFilter()
+        self.limiter = limiter or RateLimiter()
+        self.account = None
+        self.snapshots = []
+        self.previous = {}
+        self._session = session
+        if session is not None:
+            self._instrument(session)
 
-    return wrapped
+    @property
+    def session(self):
+        # Created on first use, so snapshot-only runs never import boto3.
+        if self._session is None:
+            try:
+                from boto3.session import Session  # pylint: disable=import-outside-toplevel
 
+                self._session = self._instrument(Session())
+            except BaseException as exc:
+                raise InvalidEazyVizyError(
+                    "Could not initiate AWS connection.") from exc
+        return self._session
 
-class EazyVizyAWS(EazyVizy):
-    def __init__(self, session=None):
-        super().__init__()
-        try:
-            self.session = session or Session()
-        except BaseException as exc:
-            raise InvalidEazyVizyError(
-                "Could not initiate AWS connection.") from exc
+    def _instrument(self, session):
+        self.metrics.instrument(session)
+        return self.limiter.instrument(session, metrics=self.metrics)
 
     def fetch_vpcs(self, region):
-        return list(self.session.resource("ec2", region_name=region).vpcs.all())
-
-    def has_route_with_cidr(self, vpc, target_cidr):
-        routeList = []
-        for t in vpc.route_tables.all():
-            for r in t.routes:
-                # print(
-                #     r.destination_cidr_block,
-                #     r.transit_gateway_id,
-                #     r.vpc_peering_connection_id,
-                # )
-                type = "Direct"
-                if r.transit_gateway_id:
-                    type = "TGW"
-                if r.vpc_peering_connection_id:
-                    type = "Peering"
-                if r.destination_cidr_block != "local" and ipaddr.IPNetwork(
-                    target_cidr
-                ).overlaps(ipaddr.IPNetwork(r.destination_cidr_block)):
-                    routeList.append(
-                        {
-                            "id": t.id,
-                            "type": type,
-                            "assoc_id": r.transit_gateway_id
-                            or r.vpc_peering_connection_id
-                            or "",
-                        }
-                    )
-        return routeList
-
-    def has_security_group_rule_with_cidr(self, vpc, target_vpc):
-        portList = []
-        for sg in vpc.security_groups.all():
-            for r in sg.ip_permissions:
-                for ip_range in r.get("IpRanges", []):
-                    if ip_range["CidrIp"] != "0.0.0.0/0":
-                        if ipaddr.IPNetwork(ip_range["CidrIp"]).overlaps(
-                            ipaddr.IPNetwork(target_vpc.cidr_block)
-                        ):
-                            if r.get("FromPort"):
-                                portList.append(
-                                    {"id": sg.id, "port": str(
-                                        r.get("FromPort"))}
-                                )
-        return portList
+        with self.metrics.stage("fetch", region):
+            return collect_region(self.session, region, self.account, cache=self.cache, scan_filter=self.scan_filter)
+
+    def has_route_with_cidr(self, snapshot, vpc, target_vpc):
+        return snapshot.index.routes_into(target_vpc["VpcId"]).get(vpc["VpcId"], [])
+
+    def has_security_group_rule_with_cidr(self, snapshot, vpc, target_vpc):
+        return snapshot.index.ingress_from(target_vpc["VpcId"]).get(vpc["VpcId"], [])
 
     def initialize(self):
-        loop = asyncio.get_event_loop()
-        for region in self.session.client("ec2").describe_regions()["Regions"]:
-            looper = asyncio.gather(
-                self.test_vpcs_in_region(
-                    self.fetch_vpcs(region["RegionName"]), region["RegionName"]
-                )
-            )
-        loop.run_until_complete(looper)
-
-    def add_vpc(self, vpc, region, level,central=False):
-        vpc_metadata = {"shape": "circularImage",
-                        "vpcId": vpc.id, "region": region}
-        node_label = vpc.id
-        if vpc.tags:
-            for tag in vpc.tags:
-                if tag.get("Key") == "Name":
-                    node_label = tag["Value"]
-                    break
+        with self.metrics.stage("fetch"):
+            if self.cache is not None:
+                # Cache entries are per account, so the account must be known up front.
+                self.account = account_id(self.session)
+            # Named regions need no describe_regions call.
+            regions = self.scan_filter.regions or list_regions(self.session, cache=self.cache, account=self.account)
+        scheduler = RegionScheduler(self.concurrency)
+        results = scheduler.run(regions, self.fetch_vpcs, self._analyze)
+        self.snapshots = [results[region][0] for region in sorted(results)]
+        self.merge_partials({(snapshot.account or "", region): graph for region, (snapshot, graph) in results.items()})
+        self._report_errors(scheduler.errors, failed_all=bool(regions) and len(scheduler.errors) == len(regions))
+
+    def initialize_accounts(self, targets, processes=None):
+        """
+        Scans several accounts in parallel worker processes and merges them into one graph.
+
+        Args:
+          targets (list): IAM role ARNs to assume or profile names to use.
+          processes (int, optional): Number of worker processes.
+        """
+        snapshots, errors = collect_accounts(
+            targets,
+            processes=processes,
+            concurrency=self.concurrency,
+            cache=self.cache,
+            metrics=self.metrics,
+            scan_filter=self.scan_filter,
+            limiter=self.limiter,
+        )
+        # Accounts sharing a region are analyzed together, so cross-account peerings and attachments connect.
+        partials = {}
+        for snapshot in combine_accounts(snapshots):
+            _, partials[(snapshot.account or "", snapshot.region)] = self._analyze(snapshot, snapshot.region)
+            snapshot.share_connections()
+        self.snapshots = snapshots
+        self.merge_partials(partials)
+        self._report_errors(errors, failed_all=not snapshots and bool(errors))
+
+    def initialize_from_snapshot(self, path, regions=None, vpc_ids=None):
+        """
+        Builds the graph from a snapshot file without any API calls.
+
+        Args:
+          path (str): The snapshot file written by `save_snapshot`.
+          regions (list, optional): Only render these regions.
+          vpc_ids (list, optional): Only render these VPCs.
+
+        Without `regions` and `vpc_ids`, the scan filter applies.
+        """
+        self.load_snapshot(path, regions=regions, vpc_ids=vpc_ids)
+        self.merge_partials(
+            {
+                (snapshot.account or "", snapshot.region): self.draw_region(snapshot, snapshot.region)
+                for snapshot in combine_accounts(self.snapshots)
+            }
+        )
+
+    def load_snapshot(self, path, regions=None, vpc_ids=None):
+        """Loads and analyzes a snapshot file without drawing it."""
+        scan_filter = ScanFilter(regions=regions, vpc_ids=vpc_ids) if regions or vpc_ids else self.scan_filter
+        self.snapshots = read_snapshot(path, scan_filter=scan_filter)
+        for snapshot in combine_accounts(self.snapshots):
+            self.analyze(snapshot)
+            snapshot.share_connections()
+        return self.snapshots
+
+    def save_snapshot(self, path):
+        write_snapshot(path, self.snapshots)
+
+    def load_previous(self, path):
+        """
+        Loads an earlier snapshot so the next scan only re-analyzes VPCs that changed.
+
+        Args:
+          path (str): The snapshot file of the previous scan.
+        """
+        self.previous = index_snapshots(read_snapshot(path))
+
+    def diff(self):
+        """Returns the connections added, removed and changed since the previous snapshot."""
+        return diff_topology(self.previous.values(), self.snapshots)
+
+    def _previous_of(self, snapshot, region):
+        previous = []
+        for part in snapshot.parts or [snapshot]:
+            # Snapshots taken without the cache do not record their account.
+            found = self.previous.get((part.account, region)) or self.previous.get((None, region))
+            if found is not None and found not in previous:
+                previous.append(found)
+        if not previous:
+            return None
+        return previous[0] if len(previous) == 1 else RegionSnapshot.combined(previous)
+
+    def _analyze(self, snapshot, region):
+        """Analyzes and draws one region, returning the snapshot and its partial graph."""
+        previous = self._previous_of(snapshot, region)
+        if previous is None:
+            return snapshot, self.test_vpcs_in_region(snapshot, region)
+        with self.metrics.stage("analyze", region):
+            reuse_connections(previous, snapshot, self)
+        return snapshot, self.draw_region(snapshot, region)
+
+    def _report_errors(self, errors, failed_all):
+        for name, error in sorted(errors.items()):
+            self.logger.error(f"Failed to scan {name}: {error}")
+        if failed_all:
+            raise InvalidEazyVizyError("Could not scan any region.")
+
+    def add_vpc(self, vpc, region, graph=None):
+        vpc_metadata = {"shape": "circularImage", "kind": "vpc",
+                        "vpcId": vpc["VpcId"], "region": region, "account": vpc.get("OwnerId")}
+        node_label = vpc["VpcId"]
+        if vpc.get("Tags"):
+            vpc_metadata["tags"] = {tag["Key"]: tag.get("Value") for tag in vpc["Tags"] if "Key" in tag}
+            node_label = vpc_metadata["tags"].get("Name") or node_label
         self.add_node(
-            id=vpc.id+str(level),
+            graph=graph,
+            id=vpc["VpcId"],
             label=node_label,
-            level=level,
-            group=vpc.id if central else None,
+            group=vpc["VpcId"],
             image="https://static-00.iconduck.com/assets.00/networkingcontentdelivery-amazonvpc-internetgateway-icon-491x512-g9bp4hsr.png",
             **vpc_metadata,
             size=25,
@@ -113,51 +197,58 @@ class EazyVizyAWS(EazyVizy):
             scaling={"min": 25, "max": 25}
         )
 
-    def add_route_table(self, rtable, vpc, region, level):
-        vpc_metadata = {"shape": "circularImage",
-                        "vpcId": vpc.id, "region": region}
+    def add_route_table(self, rtable, vpc, region, graph=None):
+        vpc_metadata = {"shape": "circularImage", "kind": "route_table",
+                        "vpcId": vpc["VpcId"], "region": region, "account": vpc.get("OwnerId")}
         self.add_node(
-            id=rtable["id"]+str(level),
+            graph=graph,
+            id=rtable["id"],
             label=rtable["id"],
-            level=level,
             image="https://symbols.getvecta.com/stencil_20/8_customer-gateway.5f8e151d08.jpg",
             **vpc_metadata,
             size=15,
             scaling={"min": 15, "max": 15}
         )
 
-    def add_tgw(self, tgw, region, level):
-        vpc_metadata = {"shape": "circularImage", "region": region}
+    def add_tgw(self, tgw, region, graph=None, title=None, account=None):
+        vpc_metadata = {"shape": "circularImage", "kind": "transit_gateway", "region": region, "account": account}
+        if title:
+            vpc_metadata["title"] = title
         self.add_node(
-            id=tgw+str(level),
+            graph=graph,
+            id=tgw,
             label=tgw,
-            level=level,
             image="https://global-uploads.webflow.com/5f05d5858fab461d0d08eaeb/635a593ae410e66d0c8b8b00_transit_gateway_light.svg",
             **vpc_metadata,
             size=15,
             scaling={"min": 15, "max": 15}
         )
 
-    def add_peering(self, add_peering, region, level):
-        vpc_metadata = {"shape": "circularImage", "region": region}
+    def add_peering(self, add_peering, region, graph=None, vpc=None):
+        vpc_metadata = {"shape": "circularImage", "kind": "peering", "region": region}
+        if vpc is not None:
+            # The VPC whose route found the connection, so it is laid out and clustered next to it.
+            vpc_metadata.update(vpcId=vpc["VpcId"], account=vpc.get("OwnerId"))
         self.add_node(
-            id=add_peering+str(level),
+            graph=graph,
+            id=add_peering,
             label=add_peering,
-            level=level,
             image="https://symbols.getvecta.com/stencil_9/28_vpc-peering.735192d824.svg",
             **vpc_metadata,
             size=20,
             scaling={"min": 15, "max": 15}
         )
 
-    def add_aws_edge(self, source, target, color, dashed, ports, level):
+    def add_aws_edge(self, source, target, color, dashed, ports, graph=None, kind=None):
         if ports:
+            port_summary = str(PortSet.from_records(ports))
             self.add_edge(
+                graph=graph,
                 **{
-                    "source": source+str(level),
-                    "to": target+str(level),
-                    "level": level,
-                    "title": str(ports),
+                    "source": source,
+                    "to": target,
+                    "title": port_summary,
+                    "ports": port_summary,
                     "arrows": {
                         "to": {"enabled": True, "scaleFactor": 1, "type": "arrow"},
                         "middle": {
@@ -173,99 +264,177 @@ class EazyVizyAWS(EazyVizy):
                     "dashed": dashed,
                     "color": color,
                     "width": 2,
+                    "kind": kind,
                 }
             )
         else:
             self.add_edge(
+                graph=graph,
                 **{
-                    "source": source+str(level),
-                    "to": target+str(level),
-                    "level": level,
+                    "source": source,
+                    "to": target,
                     "dashed": dashed,
                     "color": color,
+                    "kind": kind,
                 }
             )
 
-    @background
-    def test_vpcs_in_region(self, vpcs, region):
+    def connect(self, snapshot, vpc, other_vpc):
+        """
+        Returns the connection from `vpc` to `other_vpc`, or None if there is none.
+
+        A connection lists the route tables of `vpc` routing into `other_vpc`
+        and the security group ports of `vpc` open to `other_vpc`.
+        """
+        ports = self.has_security_group_rule_with_cidr(snapshot, vpc, other_vpc)
+        routes = self.has_route_with_cidr(snapshot, vpc, other_vpc)
+        if not routes and not ports:
+            return None
+        return {"source": vpc["VpcId"], "target": other_vpc["VpcId"], "routes": routes, "ports": ports}
+
+    def connections_of(self, snapshot, vpc, targets=None):
+        connections = []
+        for other_vpc in snapshot:
+            if vpc["VpcId"] != other_vpc["VpcId"] and (targets is None or other_vpc["VpcId"] in targets):
+                connection = self.connect(snapshot, vpc, other_vpc)
+                if connection:
+                    connections.append(connection)
+        return connections
+
+    def test_vpcs_in_region(self, snapshot, region):
+        self.analyze(snapshot)
+        return self.draw_region(snapshot, region)
+
+    def analyze(self, snapshot):
+        """Fills in the connections of every VPC of a snapshot that has none yet."""
+        with self.metrics.stage("analyze", snapshot.region):
+            missing = [vpc for vpc in snapshot if vpc["VpcId"] not in snapshot.connections]
+            if missing and has_numpy():
+                computed = ReachabilityMatrix(snapshot).connections()
+                for vpc in missing:
+                    snapshot.connections[vpc["VpcId"]] = computed[vpc["VpcId"]]
+            else:
+                for vpc in missing:
+                    snapshot.connections[vpc["VpcId"]] = self.connections_of(snapshot, vpc)
+
+    def draw_region(self, snapshot, region):
+        """
+        Draws a region into its own partial graph and returns it.
+
+        Regions are drawn concurrently, so nothing here touches `self.graph`;
+        `merge_partials` combines the partial graphs once all are done.
+        """
+        graph = Graph()
+        with self.metrics.stage("build", region):
+            self._draw_region(snapshot, region, graph)
+        return graph
+
+    def merge_partials(self, partials):
+        """
+        Replaces `self.graph` with the union of partial graphs.
+
+        Partials are merged in (account, region) order, so nodes shared by
+        several regions, such as inter-region peerings and transit gateways,
+        always keep the attributes of the same region and the output does
+        not depend on which region finished first.
+
+        Args:
+          partials (dict): Graphs returned by `draw_region`, keyed by `(account, region)`.
+        """
+        with self.metrics.stage("merge"):
+            self.graph = Graph.merged(partials[key] for key in sorted(partials))
+        return self.graph
+
+    def _draw_region(self, snapshot, region, graph):
         def r(): return random.randint(0, 255)
-        level = 0
-        for vpc in vpcs:
+        for vpc in snapshot:
+            self.add_vpc(vpc, region, graph)
+        for vpc in snapshot:
             # color = "#%02X%02X%02X" % (r(), r(), r())
             color = None
-            self.add_vpc(vpc, region, level, central=True)
-            for other_vpc in vpcs:
-                if vpc.id != other_vpc.id:
-                    self.add_vpc(other_vpc, region, level)
-                    ports = self.has_security_group_rule_with_cidr(
-                        vpc, other_vpc)
-                    has_route = self.has_route_with_cidr(
-                        vpc, other_vpc.cidr_block)
-                    if has_route:
-                        for rtable in has_route:
-                            self.add_route_table(rtable, vpc, region, level)
-                            if rtable["type"] == "TGW":
-                                self.add_tgw(
-                                    rtable["assoc_id"], region, level=level)
-                                self.add_aws_edge(
-                                    rtable["id"],
-                                    rtable["assoc_id"],
-                                    color,
-                                    dashed=False,
-                                    ports=ports,
-                                    level=level,
-                                )
-                                self.add_aws_edge(
-                                    rtable["assoc_id"],
-                                    other_vpc.id,
-                                    color,
-                                    dashed=False,
-                                    ports=ports,
-                                    level=level,
-                                )
-                            elif rtable["type"] == "Peering":
-                                self.add_peering(
-                                    rtable["assoc_id"], region, level)
-                                self.add_aws_edge(
-                                    vpc.id,
-                                    rtable["id"],
-                                    color,
-                                    dashed=False,
-                                    ports=ports,
-                                    level=level,
-                                )
-                                self.add_aws_edge(
-                                    rtable["id"],
-                                    other_vpc.id,
-                                    color,
-                                    dashed=False,
-                                    ports=ports,
-                                    level=level,
-                                )
-                            else:
-                                self.add_aws_edge(
-                                    vpc.id,
-                                    rtable["id"],
-                                    color,
-                                    dashed=False,
-                                    ports=ports,
-                                    level=level,
-                                )
-                                self.add_aws_edge(
-                                    rtable["id"],
-                                    other_vpc.id,
-                                    color,
-                                    dashed=False,
-                                    ports=ports,
-                                    level=level,
-                                )
-                    elif ports:
-                        self.add_aws_edge(
-                            vpc.id,
-                            other_vpc.id,
-                            color,
-                            dashed=True,
-                            ports=ports,
-                            level=level,
-                        )
-            level += 1
+            for connection in snapshot.connections.get(vpc["VpcId"], []):
+                other_vpc_id = connection["target"]
+                ports = connection["ports"]
+                if connection["routes"]:
+                    for rtable in connection["routes"]:
+                        self.add_route_table(rtable, vpc, region, graph)
+                        if rtable["type"] == "TGW":
+                            tgw_id = rtable["assoc_id"]
+                            self.add_tgw(
+                                tgw_id,
+                                region,
+                                graph,
+                                title=self._tgw_title(snapshot, tgw_id),
+                                account=snapshot.transit_gateways.get(tgw_id, {}).get("OwnerId"),
+                            )
+                            self.add_aws_edge(
+                                rtable["id"],
+                                tgw_id,
+                                color,
+                                dashed=False,
+                                ports=ports,
+                                graph=graph,
+                                kind="transit_gateway",
+                            )
+                            # Dashed when the gateway's route tables do not forward to the target.
+                            forwarded = self._tgw_forwards(snapshot, tgw_id, vpc["VpcId"], other_vpc_id)
+                            self.add_aws_edge(
+                                tgw_id,
+                                other_vpc_id,
+                                color,
+                                dashed=not forwarded,
+                                ports=ports,
+                                graph=graph,
+                                kind="transit_gateway",
+                            )
+                        elif rtable["type"] == "Peering":
+                            pcx_id = rtable["assoc_id"]
+                            self.add_peering(pcx_id, region, graph, vpc=vpc)
+                            self.add_aws_edge(
+                                rtable["id"],
+                                pcx_id,
+                                color,
+                                dashed=False,
+                                ports=ports,
+                                graph=graph,
+                                kind="peering",
+                            )
+                            self.add_aws_edge(
+                                pcx_id,
+                                other_vpc_id,
+                                color,
+                                dashed=False,
+                                ports=ports,
+                                graph=graph,
+                                kind="peering",
+                            )
+                elif ports:
+                    self.add_aws_edge(
+                        vpc["VpcId"], other_vpc_id, color, dashed=True, ports=ports, graph=graph, kind="security_group"
+                    )
+        for tgw_id, peers in snapshot.tgw.peerings.items():
+            if tgw_id not in graph:
+                continue
+            for peer in peers:
+                # Both regions see the peering; one edge direction and the
+                # peer's own region drawing its node keep the merge stable.
+                source, target = sorted([tgw_id, peer["transit_gateway"]])
+                self.add_aws_edge(source, target, None, dashed=False, ports=[], graph=graph, kind="tgw_peering")
+
+    @staticmethod
+    def _tgw_title(snapshot, tgw_id):
+        tables = snapshot.tgw.route_tables_of(tgw_id)
+        if not tables:
+            return None
+        tags = snapshot.transit_gateways.get(tgw_id, {}).get("Tags") or []
+        name = next((tag["Value"] for tag in tags if tag.get("Key") == "Name"), tgw_id)
+        incomplete = "" if snapshot.tgw.known(tgw_id) else ", routes incomplete"
+        return f"{name}: {len(tables)} route table{'s' if len(tables) != 1 else ''}{incomplete}"
+
+    @staticmethod
+    def _tgw_forwards(snapshot, tgw_id, source_vpc_id, target_vpc_id):
+        if not snapshot.tgw.known(tgw_id):
+            return True
+        target = snapshot.vpcs.get(target_vpc_id)
+        hop = snapshot.tgw.resolve(tgw_id, source_vpc_id, target_vpc_id, vpc_cidrs(target) if target else [])
+        return hop is not None and hop["state"] == "active"
@@ -0,0 +1,99 @@
+"""
+Scan scoping.
+
+A `ScanFilter` narrows a scan to some regions and VPCs. It is pushed down
+into the EC2 calls, so a scan of ten VPCs pays for ten VPCs: `describe_vpcs`
+gets `vpc-id` and tag `Filters`, and the route tables, security groups,
+peering connections and transit gateway attachments are then described
+with `vpc-id` style filters for the VPCs found. Only the transit gateways
+and their route tables are still described in full, since routing through
+a gateway depends on all of its routes.
+
+EC2 filters cannot negate, so excluded VPCs are dropped from the
+`describe_vpcs` result before anything else is described for them. The
+same filter applies to snapshot files, without API calls.
+"""
+from collections import defaultdict
+
+# EC2 accepts at most 200 values per filter.
+FILTER_VALUES_LIMIT = 200
+
+
+def parse_tag(text):
+    """Parses `KEY=VALUE`, or `KEY` for any value, into `(key, value)`."""
+    key, _, value = text.partition("=")
+    if not key:
+        raise ValueError(f"Invalid tag {text!r}, expected KEY=VALUE or KEY.")
+    return key, value or None
+
+
+def _has_tag(vpc, key, value):
+    return any(tag.get("Key") == key and (value is None or tag.get("Value") == value) for tag in vpc.get("Tags") or [])
+
+
+class ScanFilter:
+    """
+    The regions and VPCs a scan covers.
+
+    Args:
+      regions (list, optional): Only scan these regions.
+      vpc_ids (list, optional): Only scan these VPCs.
+      tags (list, optional): `(key, value)` pairs a VPC must carry, `value`
+        None for any value. Values of the same key are alternatives,
+        different keys must all match, as in EC2 tag filters.
+      exclude (list, optional): VPC ids or `(key, value)` tags of VPCs to leave out.
+    """
+
+    def __init__(self, regions=None, vpc_ids=None, tags=None, exclude=None):
+        self.regions = sorted(set(regions)) if regions else None
+        self.vpc_ids = sorted(set(vpc_ids)) if vpc_ids else None
+        self.tags = defaultdict(set)
+        for key, value in tags or []:
+            self.tags[key].add(value)
+        self.exclude_ids = {item for item in exclude or [] if isinstance(item, str)}
+        self.exclude_tags = [item for item in exclude or [] if not isinstance(item, str)]
+
+    @property
+    def narrows(self):
+        """Whether only some of a region's VPCs are covered."""
+        return bool(self.vpc_ids or self.tags or self.exclude_ids or self.exclude_tags)
+
+    def covers_region(self, region):
+        return self.regions is None or region in self.regions
+
+    def matches(self, vpc):
+        """Returns whether a VPC is covered."""
+        if self.vpc_ids is not None and vpc["VpcId"] not in self.vpc_ids:
+            return False
+        for key, values in self.tags.items():
+            if None not in values and not any(_has_tag(vpc, key, value) for value in values):
+                return False
+            if None in values and not _has_tag(vpc, key, None):
+                return False
+        if vpc["VpcId"] in self.exclude_ids:
+            return False
+        return not any(_has_tag(vpc, key, value) for key, value in self.exclude_tags)
+
+    def vpc_queries(self):
+        """
+        Yields the `describe_vpcs` parameters selecting the covered VPCs,
+        exclusions aside. VPC ids go into a `vpc-id` filter rather than
+        `VpcIds`, which fails in every region not holding all of them.
+        """
+        tag_filters = []
+        for key, values in sorted(self.tags.items()):
+            if None in values:
+                tag_filters.append({"Name": "tag-key", "Values": [key]})
+            else:
+                tag_filters.append({"Name": f"tag:{key}", "Values": sorted(values)})
+        if not self.vpc_ids:
+            yield {"Filters": tag_filters} if tag_filters else {}
+            return
+        for filters in vpc_filters("vpc-id", self.vpc_ids):
+            yield {"Filters": filters + tag_filters}
+
+
+def vpc_filters(name, vpc_ids):
+    """Yields `Filters` parameters matching `name` against `vpc_ids`, in chunks EC2 accepts."""
+    for start in range(0, len(vpc_ids), FILTER_VALUES_LIMIT):
+        yield [{"Name": name, "Values": vpc_ids[start : start + FILTER_VALUES_LIMIT]}]
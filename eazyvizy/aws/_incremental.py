@@ -0,0 +1,116 @@
+"""
+Incremental rescans and topology diffs.
+
+A rescan still collects each region with the bulk Describe* calls, which
+are the cheapest change signal EC2 offers, but pairwise analysis is only
+redone where content hashes show a change. A VPC whose own route tables or
+security groups changed gets all of its connections recomputed; every other
+VPC only recomputes its connections towards VPCs that were added or whose
+CIDR blocks changed. Regions whose hashes are all unchanged reuse the
+previous connections untouched.
+"""
+from ._cidr import vpc_cidrs
+
+
+def _key(snapshot):
+    return snapshot.account, snapshot.region
+
+
+def index_snapshots(snapshots):
+    return {_key(snapshot): snapshot for snapshot in snapshots}
+
+
+def touched_vpcs(previous, current):
+    """
+    Compares two snapshots of the same region.
+
+    Args:
+      previous (RegionSnapshot): The earlier snapshot.
+      current (RegionSnapshot): The fresh snapshot.
+
+    Returns:
+      tuple: `(changed, retargeted)` where `changed` holds VPCs whose content
+      changed or which are new, and `retargeted` holds VPCs whose CIDR blocks
+      changed or which are new, so connections towards them must be redone.
+    """
+    changed, retargeted = set(), set()
+    for vpc_id, digest in current.hashes.items():
+        if previous.hashes.get(vpc_id) == digest and vpc_id in previous.connections:
+            continue
+        changed.add(vpc_id)
+        if vpc_id not in previous.vpcs or vpc_cidrs(previous.vpcs[vpc_id]) != vpc_cidrs(current.vpcs[vpc_id]):
+            retargeted.add(vpc_id)
+    return changed, retargeted
+
+
+def reuse_connections(previous, current, analyzer):
+    """
+    Fills `current.connections`, reusing `previous` where nothing changed.
+
+    Args:
+      previous (RegionSnapshot, optional): The earlier snapshot of the region.
+      current (RegionSnapshot): The fresh snapshot.
+      analyzer (EazyVizyAWS): Provides `connections_of` for recomputation.
+
+    Returns:
+      set: The VpcIds whose connections were recomputed.
+    """
+    if previous is None:
+        for vpc in current:
+            current.connections[vpc["VpcId"]] = analyzer.connections_of(current, vpc)
+        return set(current.vpcs)
+    changed, retargeted = touched_vpcs(previous, current)
+    for vpc in current:
+        vpc_id = vpc["VpcId"]
+        if vpc_id in changed:
+            current.connections[vpc_id] = analyzer.connections_of(current, vpc)
+            continue
+        kept = [
+            connection
+            for connection in previous.connections[vpc_id]
+            if connection["target"] in current.vpcs and connection["target"] not in retargeted
+        ]
+        if retargeted:
+            kept += analyzer.connections_of(current, vpc, targets=retargeted)
+        current.connections[vpc_id] = kept
+    return changed | (set(current.vpcs) if retargeted else set())
+
+
+def _connections_by_pair(snapshots):
+    pairs = {}
+    for snapshot in snapshots:
+        for connections in snapshot.connections.values():
+            for connection in connections:
+                pairs[(snapshot.account, snapshot.region, connection["source"], connection["target"])] = connection
+    return pairs
+
+
+def diff_topology(previous_snapshots, current_snapshots):
+    """
+    Computes added, removed and changed connections between two scans.
+
+    Returns:
+      dict: `{"added": [...], "removed": [...], "changed": [...]}`. Changed
+      entries hold the `before` and `after` routes and ports of a VPC pair.
+    """
+    before = _connections_by_pair(previous_snapshots)
+    after = _connections_by_pair(current_snapshots)
+    diff = {"added": [], "removed": [], "changed": []}
+    for pair in sorted(set(before) | set(after), key=lambda pair: tuple(str(part) for part in pair)):
+        account, region = pair[0], pair[1]
+        if pair not in before:
+            diff["added"].append(dict(after[pair], account=account, region=region))
+        elif pair not in after:
+            diff["removed"].append(dict(before[pair], account=account, region=region))
+        elif before[pair]["routes"] != after[pair]["routes"] or before[pair]["ports"] != after[pair]["ports"]:
+            diff["changed"].append(
+                {
+                    "account": account,
+                    "region": region,
+                    "source": pair[2],
+                    "target": pair[3],
+                    "before": {"routes": before[pair]["routes"], "ports": before[pair]["ports"]},
+                    "after": {"routes": after[pair]["routes"], "ports": after[pair]["ports"]},
+                }
+            )
+    return diff
@@ -0,0 +1,138 @@
+"""
+Batched NumPy reachability stage.
+
+Every VPC CIDR block, route destination and security group ingress range
+of a region is encoded into integer arrays. Addresses are split into two
+64-bit halves so IPv4 and IPv6 share the same comparison. One broadcast
+overlap test per array pair then yields which routes and rules point into
+which VPCs, which is reduced to N x N route and port matrices. Connections
+are generated from those matrices and are identical to the per-pair
+results of `EazyVizyAWS.connections_of`.
+
+NumPy is an optional dependency; `test_vpcs_in_region` falls back to the
+per-pair index lookups without it.
+"""
+from ._cidr import ingress_entries, parse_cidr, route_entries, value_key, vpc_cidrs
+
+# Rows of the overlap test processed at once, bounding temporary memory.
+CHUNK = 4096
+_LOW = (1 << 64) - 1
+
+
+def _encode(np, cidrs):
+    parsed = [parse_cidr(cidr) for cidr in cidrs]
+    version = np.array([entry[0] for entry in parsed], dtype=np.uint8)
+    start_hi = np.array([entry[2] >> 64 for entry in parsed], dtype=np.uint64)
+    start_lo = np.array([entry[2] & _LOW for entry in parsed], dtype=np.uint64)
+    end_hi = np.array([entry[3] >> 64 for entry in parsed], dtype=np.uint64)
+    end_lo = np.array([entry[3] & _LOW for entry in parsed], dtype=np.uint64)
+    return version, start_hi, start_lo, end_hi, end_lo
+
+
+def _less_equal(a_hi, a_lo, b_hi, b_lo):
+    return (a_hi < b_hi) | ((a_hi == b_hi) & (a_lo <= b_lo))
+
+
+def _overlaps(np, rows, columns):
+    """Returns the `(row, column)` index pairs of overlapping blocks."""
+    found_rows, found_columns = [], []
+    # Without IPv6 blocks the high halves are all zero and can be skipped.
+    low_only = not (rows[3].any() or columns[3].any())
+    for start in range(0, len(rows[0]), CHUNK):
+        a = [array[start : start + CHUNK, None] for array in rows]
+        b = [array[None, :] for array in columns]
+        if low_only:
+            hit = (a[0] == b[0]) & (a[2] <= b[4]) & (b[2] <= a[4])
+        else:
+            hit = (
+                (a[0] == b[0])
+                & _less_equal(a[1], a[2], b[3], b[4])
+                & _less_equal(b[1], b[2], a[3], a[4])
+            )
+        row, column = np.nonzero(hit)
+        found_rows.append(row + start)
+        found_columns.append(column)
+    if not found_rows:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(found_rows), np.concatenate(found_columns)
+
+
+class ReachabilityMatrix:
+    """
+    Route and port matrices of one region snapshot.
+
+    Attributes:
+      vpc_ids (list): VpcIds in snapshot order, the row and column labels.
+      routed (numpy.ndarray): `routed[i, j]` is True if VPC i routes into VPC j.
+      ported (numpy.ndarray): `ported[i, j]` is True if VPC i has ingress ports open to VPC j.
+
+    Args:
+      snapshot (RegionSnapshot): The snapshot to evaluate.
+    """
+
+    def __init__(self, snapshot):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        self.vpc_ids = list(snapshot.vpcs)
+        position = {vpc_id: i for i, vpc_id in enumerate(self.vpc_ids)}
+        count = len(self.vpc_ids)
+
+        block_owner, block_cidrs = [], []
+        for i, vpc in enumerate(snapshot):
+            for cidr in vpc_cidrs(vpc):
+                block_owner.append(i)
+                block_cidrs.append(cidr)
+        blocks = _encode(np, block_cidrs)
+        block_owner = np.array(block_owner, dtype=np.intp)
+
+        self.routed = np.zeros((count, count), dtype=bool)
+        self.ported = np.zeros((count, count), dtype=bool)
+        ingress = ((vpc_id, cidr, port, None) for vpc_id, cidr, port in ingress_entries(snapshot))
+        self._routes = self._evaluate(np, route_entries(snapshot), position, blocks, block_owner, self.routed)
+        self._ports = self._evaluate(np, ingress, position, blocks, block_owner, self.ported)
+
+    @staticmethod
+    def _evaluate(np, entries, position, blocks, block_owner, matrix):
+        entries = [entry for entry in entries if entry[0] in position]
+        if not entries or not len(block_owner):
+            return {}
+        owner = np.array([position[entry[0]] for entry in entries], dtype=np.intp)
+        # Entries bound to a target VPC, such as peering routes, only lead into that one;
+        # -1 marks unbound entries and len(position) a target outside the snapshot.
+        bound = np.array(
+            [-1 if entry[3] is None else position.get(entry[3], len(position)) for entry in entries], dtype=np.intp
+        )
+        rows, columns = _overlaps(np, _encode(np, [entry[1] for entry in entries]), blocks)
+        sources, targets = owner[rows], block_owner[columns]
+        keep = (sources != targets) & ((bound[rows] == -1) | (bound[rows] == targets))
+        rows, sources, targets = rows[keep], sources[keep], targets[keep]
+        matrix[sources, targets] = True
+        # Entries are visited in their original order so values come out as in the per-pair path.
+        values, seen = {}, set()
+        for row, source, target in sorted(set(zip(rows.tolist(), sources.tolist(), targets.tolist()))):
+            value = entries[row][2]
+            key = (source, target, value_key(value))
+            if key not in seen:
+                seen.add(key)
+                values.setdefault((source, target), []).append(value)
+        return values
+
+    def connections(self):
+        """
+        Returns `{vpc_id: [connection]}` for every VPC, in the same shape and
+        order as `EazyVizyAWS.connections_of`.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        connections = {vpc_id: [] for vpc_id in self.vpc_ids}
+        for source, target in zip(*np.nonzero(self.routed | self.ported)):
+            source, target = int(source), int(target)
+            connections[self.vpc_ids[source]].append(
+                {
+                    "source": self.vpc_ids[source],
+                    "target": self.vpc_ids[target],
+                    "routes": self._routes.get((source, target), []),
+                    "ports": self._ports.get((source, target), []),
+                }
+            )
+        return connections
@@ -0,0 +1,140 @@
+"""
+Compiled security group port ranges.
+
+`PortSet` keeps, per protocol, a sorted list of disjoint and non-adjacent
+`[from, to]` port ranges. Rules are normalized once (protocol numbers to
+names, `-1` to all traffic, both `FromPort` and `ToPort` honored), merged
+on construction, and then union, intersection and membership are linear
+merges or bisects over the range arrays instead of scans over rule lists.
+"""
+from bisect import bisect_right
+
+ALL = "all"
+MAX_PORT = 65535
+PROTOCOL_NAMES = {"-1": ALL, "6": "tcp", "17": "udp", "1": "icmp", "58": "icmpv6"}
+PORTED_PROTOCOLS = ("tcp", "udp")
+
+
+def normalize_protocol(protocol):
+    protocol = str(protocol).lower()
+    return PROTOCOL_NAMES.get(protocol, protocol)
+
+
+def port_record(group_id, permission):
+    """
+    Returns the connection port record of a security group permission.
+
+    Args:
+      group_id (str): The security group the permission belongs to.
+      permission (dict): An `IpPermissions` or `IpPermissionsEgress` entry.
+
+    Returns:
+      dict: `{"id", "protocol", "from", "to"}`. Protocols without ports
+      (all traffic, ICMP, ...) cover the whole range.
+    """
+    protocol = normalize_protocol(permission.get("IpProtocol", "-1"))
+    if protocol in PORTED_PROTOCOLS and permission.get("FromPort") not in (None, -1):
+        low, high = permission["FromPort"], permission.get("ToPort", permission["FromPort"])
+    else:
+        low, high = 0, MAX_PORT
+    return {"id": group_id, "protocol": protocol, "from": low, "to": high}
+
+
+def _merge(ranges):
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return merged
+
+
+def _intersect(left, right):
+    result, i, j = [], 0, 0
+    while i < len(left) and j < len(right):
+        low, high = max(left[i][0], right[j][0]), min(left[i][1], right[j][1])
+        if low <= high:
+            result.append([low, high])
+        if left[i][1] < right[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+class PortSet:
+    """
+    Merged port ranges per protocol.
+
+    Args:
+      ranges (dict, optional): `{protocol: [[from, to], ...]}`, merged on construction.
+    """
+
+    __slots__ = ("ranges", "_starts")
+
+    def __init__(self, ranges=None):
+        self.ranges = {protocol: _merge(spans) for protocol, spans in (ranges or {}).items() if spans}
+        self._starts = None
+
+    @classmethod
+    def from_records(cls, records):
+        ranges = {}
+        for record in records:
+            ranges.setdefault(record["protocol"], []).append((record["from"], record["to"]))
+        return cls(ranges)
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def __eq__(self, other):
+        return isinstance(other, PortSet) and self.ranges == other.ranges
+
+    def __or__(self, other):
+        ranges = {protocol: list(spans) for protocol, spans in self.ranges.items()}
+        for protocol, spans in other.ranges.items():
+            ranges.setdefault(protocol, []).extend(spans)
+        return PortSet(ranges)
+
+    def _open(self, protocol):
+        # All-traffic ranges are open for every protocol as well.
+        if protocol == ALL:
+            return self.ranges.get(ALL, [])
+        return _merge(self.ranges.get(protocol, []) + self.ranges.get(ALL, []))
+
+    def __and__(self, other):
+        ranges = {}
+        for protocol in set(self.ranges) | set(other.ranges):
+            left, right = self._open(protocol), other._open(protocol)
+            if left and right:
+                ranges[protocol] = _intersect(left, right)
+        return PortSet(ranges)
+
+    def contains(self, port, protocol="tcp"):
+        """Returns whether `port` is open for `protocol`, counting all-traffic rules."""
+        if self._starts is None:
+            self._starts = {name: [span[0] for span in spans] for name, spans in self.ranges.items()}
+        for name in (normalize_protocol(protocol), ALL):
+            spans = self.ranges.get(name)
+            if spans:
+                i = bisect_right(self._starts[name], port) - 1
+                if i >= 0 and spans[i][1] >= port:
+                    return True
+        return False
+
+    def __str__(self):
+        if [[0, MAX_PORT]] == self.ranges.get(ALL):
+            return "all traffic"
+        parts = []
+        for protocol in sorted(self.ranges):
+            spans = self.ranges[protocol]
+            if spans == [[0, MAX_PORT]]:
+                parts.append(protocol if protocol != ALL else "all traffic")
+            else:
+                parts.append(
+                    f"{protocol} " + ", ".join(str(low) if low == high else f"{low}-{high}" for low, high in spans)
+                )
+        return "; ".join(parts)
+
+    def __repr__(self):
+        return f"PortSet({self.ranges!r})"
@@ -0,0 +1,127 @@
+"""
+Reachability queries over analyzed snapshots.
+
+`ReachabilityIndex` flattens the connections of every loaded region into
+dicts keyed by (source VpcId, target VpcId). Each entry holds the routes
+of the source into the target and the compiled `PortSet` the target's
+security groups open to the source. Egress rules are compiled per VPC as
+well. A query is then a few dict lookups and range bisects, fast enough to
+run thousands of policy checks against one loaded snapshot.
+"""
+from ._cidr import egress_entries, parse_cidr, vpc_cidrs
+from ._collector import combine_accounts
+from ._ports import PortSet
+
+
+def _overlaps(left, right):
+    left, right = parse_cidr(left), parse_cidr(right)
+    return left[0] == right[0] and left[2] <= right[3] and right[2] <= left[3]
+
+
+class ReachabilityIndex:
+    """
+    Answers "can VPC A reach VPC B on port P, and how".
+
+    Args:
+      snapshots (list): Analyzed `RegionSnapshot` objects.
+    """
+
+    def __init__(self, snapshots):
+        self._names = {}
+        self._cidrs = {}
+        self._routes = {}
+        self._ports = {}
+        self._egress = {}
+        # Transit gateways shared between accounts resolve against all of their attachments.
+        for snapshot in combine_accounts(snapshots):
+            for vpc_id, vpc in snapshot.vpcs.items():
+                self._cidrs[vpc_id] = vpc_cidrs(vpc)
+                self._names.setdefault(vpc_id, set()).add(vpc_id)
+                for tag in vpc.get("Tags") or []:
+                    if tag.get("Key") == "Name":
+                        self._names.setdefault(tag["Value"], set()).add(vpc_id)
+            for connections in snapshot.connections.values():
+                for connection in connections:
+                    pair = (connection["source"], connection["target"])
+                    paths = self._paths(snapshot, connection)
+                    if paths:
+                        self._routes[pair] = paths
+                    if connection["ports"]:
+                        # Ports of the source's groups admit traffic coming from the target.
+                        self._ports[(pair[1], pair[0])] = PortSet.from_records(connection["ports"])
+            egress = {}
+            for vpc_id, cidr, record in egress_entries(snapshot):
+                egress.setdefault(vpc_id, {}).setdefault(cidr, []).append(record)
+            for vpc_id, by_cidr in egress.items():
+                self._egress[vpc_id] = [(cidr, PortSet.from_records(records)) for cidr, records in by_cidr.items()]
+
+    @staticmethod
+    def _paths(snapshot, connection):
+        paths = []
+        for route in connection["routes"]:
+            path = {"type": route["type"], "route_table": route["id"], "via": route["assoc_id"]}
+            if route["type"] == "TGW" and snapshot.tgw.known(route["assoc_id"]):
+                target = snapshot.vpcs.get(connection["target"])
+                hop = snapshot.tgw.resolve(
+                    route["assoc_id"], connection["source"], connection["target"], vpc_cidrs(target) if target else []
+                )
+                if hop is None or hop["state"] != "active":
+                    continue
+                path["tgw_route_table"] = hop["route_table"]
+            paths.append(path)
+        return paths
+
+    def resolve(self, name):
+        """
+        Resolves a VpcId or Name tag to a VpcId.
+
+        Raises:
+          KeyError: If the name is unknown or ambiguous.
+        """
+        vpc_ids = self._names.get(name, set())
+        if len(vpc_ids) != 1:
+            raise KeyError(f"{'Ambiguous' if vpc_ids else 'Unknown'} VPC {name!r}")
+        return next(iter(vpc_ids))
+
+    def egress(self, source, target):
+        """Returns the `PortSet` the source's egress rules allow towards the target."""
+        allowed = PortSet()
+        for cidr, ports in self._egress.get(source, []):
+            if any(_overlaps(cidr, target_cidr) for target_cidr in self._cidrs.get(target, [])):
+                allowed = allowed | ports
+        return allowed
+
+    def query(self, source, target, port=None, protocol="tcp"):
+        """
+        Checks whether `source` can reach `target`.
+
+        Args:
+          source (str): VpcId or Name tag of the source VPC.
+          target (str): VpcId or Name tag of the target VPC.
+          port (int, optional): Also require this port to be open on both sides.
+          protocol (str): The protocol of `port`.
+
+        Returns:
+          dict: `reachable`, the `paths` (route type, route table,
+          peering/TGW id and, for TGW paths, the TGW route table), the
+          `ports` open on the target for the source, the `egress` ports
+          the source allows towards the target and the `open` ports both
+          sides allow.
+        """
+        source, target = self.resolve(source), self.resolve(target)
+        paths = self._routes.get((source, target), [])
+        ports = self._ports.get((source, target), PortSet())
+        egress = self.egress(source, target)
+        allowed = ports & egress
+        reachable = bool(paths) and (port is None or allowed.contains(port, protocol))
+        return {
+            "source": source,
+            "target": target,
+            "port": port,
+            "protocol": protocol,
+            "reachable": reachable,
+            "paths": paths,
+            "ports": str(ports),
+            "egress": str(egress),
+            "open": str(allowed),
+        }
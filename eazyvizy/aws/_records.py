@@ -0,0 +1,124 @@
+"""
+Compact resource records.
+
+Describe* responses carry many fields the analysis never reads: association
+ids, descriptions, owner ids and tags of every route table, creation
+times. A `RegionSnapshot` keeps its records for the whole run, so on large
+estates those fields dominate its memory and the objects the garbage
+collector has to walk. `compact` reduces a record to the fields listed in
+`FIELDS`, recursively, and interns its strings, so the ids and CIDR blocks
+repeated across VPCs, route tables, security groups, connections and graph
+nodes are stored once. Nested lists become tuples, which, like dicts of
+scalars, the garbage collector stops tracking.
+
+Records stay API-shaped dicts, so snapshot files and every reader keep
+working unchanged; `FIELDS` is the shape readers may rely on, and a field
+read by new analysis code has to be added there.
+"""
+from sys import intern
+
+_TAGS = {"Key": None, "Value": None}
+_PERMISSION = {
+    "IpProtocol": None,
+    "FromPort": None,
+    "ToPort": None,
+    "IpRanges": {"CidrIp": None},
+    "Ipv6Ranges": {"CidrIpv6": None},
+    "PrefixListIds": {"PrefixListId": None},
+    "UserIdGroupPairs": {"GroupId": None, "UserId": None, "VpcId": None, "VpcPeeringConnectionId": None},
+}
+_VPC_INFO = {"VpcId": None, "OwnerId": None, "Region": None, "CidrBlock": None}
+_TGW_INFO = {"TransitGatewayId": None, "OwnerId": None, "Region": None}
+_TGW_TARGET = {"TransitGatewayAttachmentId": None, "ResourceId": None, "ResourceType": None}
+
+# The fields kept per `RegionSnapshot` argument; None marks a scalar.
+FIELDS = {
+    "vpcs": {
+        "VpcId": None,
+        "OwnerId": None,
+        "State": None,
+        "CidrBlock": None,
+        "CidrBlockAssociationSet": {"CidrBlock": None, "CidrBlockState": {"State": None}},
+        "Ipv6CidrBlockAssociationSet": {"Ipv6CidrBlock": None, "Ipv6CidrBlockState": {"State": None}},
+        "Tags": _TAGS,
+    },
+    "route_tables": {
+        "RouteTableId": None,
+        "VpcId": None,
+        "Routes": {
+            "DestinationCidrBlock": None,
+            "DestinationIpv6CidrBlock": None,
+            "GatewayId": None,
+            "TransitGatewayId": None,
+            "VpcPeeringConnectionId": None,
+            "State": None,
+        },
+    },
+    "security_groups": {
+        "GroupId": None,
+        "GroupName": None,
+        "VpcId": None,
+        "IpPermissions": _PERMISSION,
+        "IpPermissionsEgress": _PERMISSION,
+    },
+    "peerings": {
+        "VpcPeeringConnectionId": None,
+        "RequesterVpcInfo": _VPC_INFO,
+        "AccepterVpcInfo": _VPC_INFO,
+        "Status": {"Code": None},
+    },
+    "tgw_attachments": {
+        "TransitGatewayAttachmentId": None,
+        "TransitGatewayId": None,
+        "ResourceType": None,
+        "ResourceId": None,
+        "ResourceOwnerId": None,
+        "State": None,
+        "Association": {"TransitGatewayRouteTableId": None, "State": None},
+    },
+    "transit_gateways": {"TransitGatewayId": None, "OwnerId": None, "State": None, "Tags": _TAGS},
+    "tgw_route_tables": {
+        "TransitGatewayRouteTableId": None,
+        "TransitGatewayId": None,
+        "State": None,
+        "Routes": {"DestinationCidrBlock": None, "Type": None, "State": None, "TransitGatewayAttachments": _TGW_TARGET},
+        "RoutesTruncated": None,
+        "Propagations": dict(_TGW_TARGET, State=None),
+    },
+    "tgw_peerings": {
+        "TransitGatewayAttachmentId": None,
+        "State": None,
+        "RequesterTgwInfo": _TGW_INFO,
+        "AccepterTgwInfo": _TGW_INFO,
+    },
+    "prefix_lists": {"PrefixListId": None, "PrefixListName": None, "OwnerId": None, "Entries": {"Cidr": None}},
+}
+
+
+def compact(value, fields=None):
+    """
+    Returns a copy of an API value holding only `fields`, with interned
+    strings and, where `fields` is given, lists turned into tuples.
+
+    Args:
+      value: A record, a list of records or a scalar.
+      fields (dict, optional): The fields to keep, each mapped to the fields
+        of its own value or None. Without it, dicts keep all their fields.
+    """
+    if isinstance(value, str):
+        return intern(value)
+    if isinstance(value, list):
+        items = [compact(item, fields) for item in value]
+        # Tuples of scalars and scalar-only dicts are left alone by the garbage collector.
+        return items if fields is None else tuple(items)
+    if isinstance(value, dict):
+        if fields is None:
+            return {intern(key): compact(item) for key, item in value.items()}
+        return {key: compact(value[key], nested) for key, nested in fields.items() if key in value}
+    return value
+
+
+def compact_records(kind, records):
+    """Returns `compact` of every record of a `RegionSnapshot` argument, e.g. "vpcs"."""
+    fields = FIELDS[kind]
+    return [compact(record, fields) for record in records]
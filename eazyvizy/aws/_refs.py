@@ -0,0 +1,83 @@
+"""
+Security group reference and managed prefix list resolution.
+
+Besides CIDR ranges (`IpRanges`, `Ipv6Ranges`), a permission can name its
+peers by security group (`UserIdGroupPairs`) or by managed prefix list
+(`PrefixListIds`). `ReferenceResolver` turns both into CIDR blocks from
+data already in the snapshot, so resolution costs no API call per rule:
+
+- a group reference stands for the CIDR blocks of the VPC holding the
+  group, found among the snapshot's groups or named by the pair itself
+  when the group sits behind a peering connection;
+- a prefix list stands for its entries, which the collector fetches once
+  per referenced list and region (see `collect_prefix_lists`).
+
+References are not transitive in EC2: a referenced group admits the
+addresses of its members, not the peers of its own rules. Resolution is
+therefore a single lookup per reference, memoized for the lifetime of the
+snapshot, and mutual or self references need no special handling.
+References that cannot be resolved, to groups outside the scan or to
+AWS-managed prefix lists of service addresses, contribute no blocks.
+"""
+from ._cidr import vpc_cidrs
+
+PERMISSION_KEYS = ("IpPermissions", "IpPermissionsEgress")
+# Owner of the AWS-managed prefix lists, which hold public service ranges.
+AWS_OWNER = "AWS"
+
+
+def referenced_prefix_lists(security_groups):
+    """Returns the sorted ids of the prefix lists referenced by some security groups."""
+    return sorted(
+        {
+            reference["PrefixListId"]
+            for group in security_groups
+            for key in PERMISSION_KEYS
+            for permission in group.get(key, [])
+            for reference in permission.get("PrefixListIds", [])
+        }
+    )
+
+
+class ReferenceResolver:
+    """
+    Resolves the peers of a snapshot's security group permissions to CIDR blocks.
+
+    Args:
+      snapshot (RegionSnapshot): The snapshot whose groups, VPCs and prefix
+        lists the references are resolved against.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._group_vpcs = {
+            group["GroupId"]: vpc_id for vpc_id, groups in snapshot.security_groups.items() for group in groups
+        }
+        self._groups = {}
+        self._prefix_lists = {}
+
+    def group_cidrs(self, pair):
+        """Returns the CIDR blocks of the VPC holding the group a `UserIdGroupPairs` entry names."""
+        group_id = pair.get("GroupId")
+        if group_id not in self._groups:
+            vpc = self.snapshot.vpcs.get(self._group_vpcs.get(group_id) or pair.get("VpcId"))
+            self._groups[group_id] = tuple(vpc_cidrs(vpc)) if vpc else ()
+        return self._groups[group_id]
+
+    def prefix_list_cidrs(self, prefix_list_id):
+        """Returns the CIDR blocks of a managed prefix list."""
+        if prefix_list_id not in self._prefix_lists:
+            prefix_list = self.snapshot.prefix_lists.get(prefix_list_id) or {}
+            self._prefix_lists[prefix_list_id] = tuple(entry["Cidr"] for entry in prefix_list.get("Entries", []))
+        return self._prefix_lists[prefix_list_id]
+
+    def cidrs(self, permission):
+        """Yields every CIDR block a permission admits, ranges first, then prefix lists and groups."""
+        for ip_range in permission.get("IpRanges", []):
+            yield ip_range["CidrIp"]
+        for ip_range in permission.get("Ipv6Ranges", []):
+            yield ip_range["CidrIpv6"]
+        for reference in permission.get("PrefixListIds", []):
+            yield from self.prefix_list_cidrs(reference["PrefixListId"])
+        for pair in permission.get("UserIdGroupPairs", []):
+            yield from self.group_cidrs(pair)
@@ -0,0 +1,62 @@
+"""
+Concurrent multi-region discovery.
+
+Every region gets its own asyncio task. Fetching is bounded by a semaphore
+so at most `concurrency` regions talk to the API at once, while analysis of
+already fetched regions overlaps with fetching of the others. Both stages
+run in a bounded thread pool. A failure in one region is recorded and does
+not cancel the remaining regions.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 8
+
+
+class RegionScheduler:
+    """
+    Runs `fetch` and `analyze` for many regions concurrently.
+
+    Args:
+      concurrency (int): Maximum number of regions fetched at the same time.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self.results = {}
+        self.errors = {}
+
+    async def _run_region(self, loop, executor, semaphore, region, fetch, analyze):
+        try:
+            async with semaphore:
+                snapshot = await loop.run_in_executor(executor, fetch, region)
+            self.results[region] = await loop.run_in_executor(executor, analyze, snapshot, region)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.errors[region] = exc
+
+    async def _run(self, regions, fetch, analyze):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # One extra worker lets analysis proceed while every fetch slot is busy.
+        with ThreadPoolExecutor(max_workers=self.concurrency + 1) as executor:
+            await asyncio.gather(
+                *(self._run_region(loop, executor, semaphore, region, fetch, analyze) for region in regions)
+            )
+
+    def run(self, regions, fetch, analyze):
+        """
+        Fetches and analyzes every region, waiting for all of them.
+
+        Args:
+          regions (list): Region names to scan.
+          fetch (callable): `fetch(region)` returning the region snapshot.
+          analyze (callable): `analyze(snapshot, region)` consuming the snapshot.
+
+        Returns:
+          dict: Results of `analyze` keyed by region. Failed regions are
+          left out and recorded in `errors` instead.
+        """
+        self.results = {}
+        self.errors = {}
+        asyncio.run(self._run(regions, fetch, analyze))
+        return self.results
@@ -0,0 +1,103 @@
+"""
+Versioned on-disk topology snapshots.
+
+A snapshot file is line-delimited JSON:
+
+- line 1: a header `{"format": "eazyvizy-snapshot", "version": N, "created": ...}`
+- one line per collected account/region holding its VPCs, route tables,
+  security groups, peering connections, transit gateways with their
+  attachments, route tables and peering attachments, the managed prefix
+  lists referenced by security groups, per-VPC content hashes and the
+  analyzed connections
+- last line: an index `{"index": [{"account", "region", "offset", "length"}]}`
+
+Readers memory-map the file, read the trailing index and only decode the
+region lines they were asked for, so rendering a filtered view of a large
+estate neither makes API calls nor parses the whole file.
+"""
+from datetime import datetime, timezone
+import json
+import mmap
+from eazyvizy.error import InvalidEazyVizyError
+from ._collector import RegionSnapshot
+from ._filter import ScanFilter
+
+SNAPSHOT_FORMAT = "eazyvizy-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def _dumps(data):
+    # Peering and attachment records carry datetimes, which are kept as ISO strings.
+    return json.dumps(data, separators=(",", ":"), default=str).encode()
+
+
+def write_snapshot(path, snapshots):
+    """
+    Writes region snapshots to a snapshot file.
+
+    Args:
+      path (str): The file to write.
+      snapshots (list): `RegionSnapshot` objects to store.
+    """
+    index = []
+    with open(path, "wb") as file:
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created": datetime.now(timezone.utc).isoformat(),
+        }
+        file.write(_dumps(header) + b"\n")
+        for snapshot in snapshots:
+            line = _dumps(snapshot.to_dict())
+            index.append(
+                {
+                    "account": snapshot.account,
+                    "region": snapshot.region,
+                    "offset": file.tell(),
+                    "length": len(line),
+                }
+            )
+            file.write(line + b"\n")
+        file.write(_dumps({"index": index}) + b"\n")
+
+
+def read_snapshot(path, regions=None, vpc_ids=None, scan_filter=None):
+    """
+    Reads region snapshots from a snapshot file.
+
+    Args:
+      path (str): The file to read.
+      regions (list, optional): Only load these regions.
+      vpc_ids (list, optional): Only keep these VPCs.
+      scan_filter (ScanFilter, optional): Only keep the regions and VPCs it
+        covers, instead of `regions` and `vpc_ids`.
+
+    Returns:
+      list: The loaded `RegionSnapshot` objects.
+
+    Raises:
+      InvalidEazyVizyError: If the file is missing or not a supported snapshot.
+    """
+    scan_filter = scan_filter or ScanFilter(regions=regions, vpc_ids=vpc_ids)
+    try:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header = json.loads(data[: data.find(b"\n")])
+            if header.get("format") != SNAPSHOT_FORMAT:
+                raise InvalidEazyVizyError(f"{path} is not an eazyvizy snapshot.")
+            if header.get("version") != SNAPSHOT_VERSION:
+                raise InvalidEazyVizyError(
+                    f"Unsupported snapshot version {header.get('version')} in {path}, expected {SNAPSHOT_VERSION}."
+                )
+            index = json.loads(data[data.rfind(b"\n", 0, len(data) - 1) + 1 :])["index"]
+            snapshots = []
+            for entry in index:
+                if not scan_filter.covers_region(entry["region"]):
+                    continue
+                region = json.loads(data[entry["offset"] : entry["offset"] + entry["length"]])
+                snapshot = RegionSnapshot.from_dict(region)
+                if scan_filter.narrows:
+                    snapshot = snapshot.subset([vpc["VpcId"] for vpc in snapshot if scan_filter.matches(vpc)])
+                snapshots.append(snapshot)
+            return snapshots
+    except (OSError, ValueError, KeyError) as exc:
+        raise InvalidEazyVizyError(f"Could not read snapshot {path}: {exc}") from exc
@@ -0,0 +1,129 @@
+"""
+Transit gateway route resolution.
+
+A VPC route pointing at a transit gateway only delivers traffic if the
+route table associated with the VPC's attachment has a route for the
+destination. `TransitGatewayIndex` answers that from the transit gateways,
+attachments, route tables (with their routes and propagations) and peering
+attachments collected in bulk for a region, by longest-prefix match over
+each route table, without further API calls.
+
+Route tables holding more routes than SearchTransitGatewayRoutes returns
+are marked `RoutesTruncated` by the collector. Their transit gateways are
+not `known`: with routes missing, no route for a destination proves
+nothing, so paths through them are assumed to be forwarded.
+"""
+from ._cidr import ACTIVE, BLACKHOLE, parse_cidr
+
+
+def _contains(outer, inner):
+    outer, inner = parse_cidr(outer), parse_cidr(inner)
+    return outer[0] == inner[0] and outer[2] <= inner[2] and inner[3] <= outer[3]
+
+
+class TransitGatewayIndex:
+    """
+    In-memory view of a region's transit gateway routing.
+
+    Args:
+      snapshot (RegionSnapshot): The snapshot holding the transit gateway resources.
+    """
+
+    def __init__(self, snapshot):
+        self.transit_gateways = snapshot.transit_gateways
+        self._attachments = {}
+        self._associations = {}
+        for attachments in snapshot.tgw_attachments.values():
+            for attachment in attachments:
+                if attachment.get("ResourceType") == "vpc":
+                    self._attachments[(attachment["TransitGatewayId"], attachment["ResourceId"])] = attachment
+                association = attachment.get("Association") or {}
+                if association.get("TransitGatewayRouteTableId"):
+                    self._associations[attachment["TransitGatewayAttachmentId"]] = association[
+                        "TransitGatewayRouteTableId"
+                    ]
+        self._routes = {}
+        self._route_tables_of = {}
+        self._truncated = set()
+        for table_id, table in snapshot.tgw_route_tables.items():
+            self._route_tables_of.setdefault(table["TransitGatewayId"], []).append(table_id)
+            if table.get("RoutesTruncated"):
+                self._truncated.add(table["TransitGatewayId"])
+            routes = [route for route in table.get("Routes", []) if route.get("DestinationCidrBlock")]
+            # Longest prefix first, so the first containing route is the match.
+            routes.sort(key=lambda route: -parse_cidr(route["DestinationCidrBlock"])[1])
+            self._routes[table_id] = routes
+        self.peerings = {}
+        for peering in snapshot.tgw_peerings.values():
+            if peering.get("State") not in (None, "available"):
+                continue
+            requester, accepter = peering.get("RequesterTgwInfo", {}), peering.get("AccepterTgwInfo", {})
+            for local, remote in ((requester, accepter), (accepter, requester)):
+                if local.get("Region", snapshot.region) == snapshot.region and local.get("TransitGatewayId"):
+                    self.peerings.setdefault(local["TransitGatewayId"], []).append(
+                        {
+                            "attachment": peering["TransitGatewayAttachmentId"],
+                            "transit_gateway": remote.get("TransitGatewayId"),
+                            "region": remote.get("Region"),
+                        }
+                    )
+        self._resolved = {}
+
+    def known(self, tgw_id):
+        """Returns whether every route of the transit gateway's route tables was collected."""
+        return tgw_id in self._route_tables_of and tgw_id not in self._truncated
+
+    def route_tables_of(self, tgw_id):
+        return self._route_tables_of.get(tgw_id, [])
+
+    def resolve(self, tgw_id, source_vpc_id, target_vpc_id, target_cidrs):
+        """
+        Follows traffic from a VPC through a transit gateway to another VPC.
+
+        Args:
+          tgw_id (str): The transit gateway the source VPC routes to.
+          source_vpc_id (str): The source VPC.
+          target_vpc_id (str): The destination VPC.
+          target_cidrs (list): CIDR blocks of the destination VPC.
+
+        Returns:
+          dict: `{"route_table", "state", "attachment", "peer"}` for the
+          matching transit gateway route, where `peer` is set when traffic
+          leaves through a peering attachment. None if the source VPC is not
+          attached or no route matches.
+        """
+        key = (tgw_id, source_vpc_id, target_vpc_id)
+        if key not in self._resolved:
+            self._resolved[key] = self._resolve(tgw_id, source_vpc_id, target_vpc_id, target_cidrs)
+        return self._resolved[key]
+
+    def _resolve(self, tgw_id, source_vpc_id, target_vpc_id, target_cidrs):
+        attachment = self._attachments.get((tgw_id, source_vpc_id))
+        if attachment is None:
+            return None
+        table_id = self._associations.get(attachment["TransitGatewayAttachmentId"])
+        if table_id is None:
+            return None
+        peers = {peer["attachment"]: peer for peer in self.peerings.get(tgw_id, [])}
+        for cidr in target_cidrs:
+            for route in self._routes.get(table_id, []):
+                if not _contains(route["DestinationCidrBlock"], cidr):
+                    continue
+                targets = route.get("TransitGatewayAttachments") or []
+                result = {
+                    "route_table": table_id,
+                    "state": route.get("State", ACTIVE),
+                    "attachment": None,
+                    "peer": None,
+                }
+                for target in targets:
+                    if target.get("ResourceId") == target_vpc_id:
+                        result["attachment"] = target.get("TransitGatewayAttachmentId")
+                    elif target.get("TransitGatewayAttachmentId") in peers:
+                        result["attachment"] = target["TransitGatewayAttachmentId"]
+                        result["peer"] = peers[target["TransitGatewayAttachmentId"]]
+                if result["state"] == BLACKHOLE or result["attachment"]:
+                    return result
+                # The longest match points elsewhere, so this block is not reachable through the gateway.
+                break
+        return None
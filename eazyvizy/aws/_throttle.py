@@ -0,0 +1,193 @@
+"""
+Client-side rate limiting of AWS API calls.
+
+EC2 throttles each account per region and per family of actions with a
+token bucket (non-mutating Describe* calls share one bucket). `RateLimiter`
+mirrors that on the client: every call takes a token from the bucket of
+its account, region and family before it is sent, so concurrent region
+scans and the per-route-table transit gateway calls cannot outrun the
+account's budget. Buckets adapt AIMD style: a throttling response halves
+the bucket's rate and empties it, every successful call raises the rate
+slightly, back up to the configured maximum. A scan therefore settles at
+the highest rate AWS sustains instead of failing on `RequestLimitExceeded`.
+
+Throttled attempts are retried by botocore, with the retry mode and
+attempt count of the limiter. Tokens are taken once per call; retries are
+paced by botocore's own backoff.
+"""
+from threading import Lock
+import time
+from eazyvizy.utils.metrics import THROTTLING_CODES
+
+# EC2's documented refill rate and bucket size for non-mutating actions.
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 100
+MIN_RATE = 0.5
+BACKOFF_FACTOR = 0.5
+# Throttles arriving this soon after a backoff were sent before it and do not back off again.
+BACKOFF_COOLDOWN = 1.0
+# Rate regained per successful call, divided by the current rate, so a
+# bucket recovers by about one call per second every second.
+RECOVERY = 1.0
+RETRY_MODES = ("legacy", "standard", "adaptive")
+DEFAULT_RETRY_MODE = "standard"
+DEFAULT_MAX_ATTEMPTS = 8
+READ_PREFIXES = ("Describe", "Get", "List", "Search")
+
+
+def family(service, operation):
+    """Returns the throttling family of an API action, e.g. "ec2:read"."""
+    return f"{service}:{'read' if operation.startswith(READ_PREFIXES) else 'write'}"
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket whose refill rate adapts to throttling.
+
+    Args:
+      rate (float): Maximum tokens added per second.
+      burst (int): Bucket size.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.backoffs = 0
+        self._updated = time.monotonic()
+        self._backed_off = float("-inf")
+        self._lock = Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Takes a token if there is one. Returns 0, or the seconds until the next token."""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Takes a token, waiting for one if the bucket is empty. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self):
+        """Backs off after a throttling response."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+            if self._updated - self._backed_off < BACKOFF_COOLDOWN:
+                return
+            self._backed_off = self._updated
+            self.rate = max(MIN_RATE, self.rate * BACKOFF_FACTOR)
+            self.backoffs += 1
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + RECOVERY / self.rate)
+
+
+class RateLimiter:
+    """
+    Paces the API calls of boto3 sessions with one `TokenBucket` per
+    account, region and action family, and sets their retry policy.
+
+    Args:
+      rate (float): Maximum calls per second of each bucket.
+      burst (int): Calls a bucket allows at once.
+      retry_mode (str): botocore retry mode, one of `RETRY_MODES`.
+      max_attempts (int): Attempts per call, first attempt included.
+    """
+
+    def __init__(
+        self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, retry_mode=DEFAULT_RETRY_MODE, max_attempts=DEFAULT_MAX_ATTEMPTS
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("The rate limit must be positive and allow at least one call at once.")
+        if retry_mode not in RETRY_MODES:
+            raise ValueError(f"Unknown retry mode {retry_mode!r}, expected one of {', '.join(RETRY_MODES)}.")
+        self.rate = rate
+        self.burst = burst
+        self.retry_mode = retry_mode
+        self.max_attempts = max_attempts
+        self.buckets = {}
+        self._lock = Lock()
+
+    def __getstate__(self):
+        # Workers get the settings; buckets are per process, like the accounts they scan.
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "retry_mode": self.retry_mode,
+            "max_attempts": self.max_attempts,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def bucket(self, account, region, name):
+        key = (account, region, name)
+        with self._lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.rate, self.burst)
+            return self.buckets[key]
+
+    def instrument(self, session, account=None, metrics=None):
+        """
+        Paces every API call made by clients of a boto3 session created from
+        now on and applies the retry policy to them.
+
+        Args:
+          session (boto3.session.Session): The session to instrument.
+          account (str, optional): The account the session belongs to.
+          metrics (Metrics, optional): Receives the time spent waiting for tokens.
+        """
+        from botocore.config import Config  # pylint: disable=import-outside-toplevel
+
+        config = Config(retries={"mode": self.retry_mode, "max_attempts": self.max_attempts})
+        core = session._session  # pylint: disable=protected-access
+        default = core.get_default_client_config()
+        core.set_default_client_config(default.merge(config) if default else config)
+
+        def bucket_of(model, context):
+            region = context.get("client_region") or "global"
+            name = family(model.service_model.endpoint_prefix, model.name)
+            return region, name, self.bucket(account, region, name)
+
+        def before_call(model, context, **kwargs):
+            region, name, bucket = bucket_of(model, context)
+            waited = bucket.acquire()
+            if metrics is not None and waited:
+                metrics.waited(region, name, waited)
+
+        def needs_retry(operation, request_dict=None, response=None, **kwargs):
+            if response is not None and response[1].get("Error", {}).get("Code") in THROTTLING_CODES:
+                bucket_of(operation, (request_dict or {}).get("context", {}))[2].throttled()
+
+        def after_call(model, context, parsed=None, **kwargs):
+            if not (parsed or {}).get("Error"):
+                bucket_of(model, context)[2].succeeded()
+
+        # First, so calls are paced even when another handler answers them, like a stub.
+        session.events.register_first("before-call.*.*", before_call)
+        session.events.register("needs-retry.*.*", needs_retry)
+        session.events.register("after-call.*.*", after_call)
+        return session
+
+    def rates(self):
+        """Returns `{(account, region, family): (rate, backoffs)}` of every bucket used."""
+        with self._lock:
+            return {key: (bucket.rate, bucket.backoffs) for key, bucket in self.buckets.items()}
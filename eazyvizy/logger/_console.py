@@ -1,6 +1,3 @@
-import json
-import yaml
-import re
 from shutil import get_terminal_size
 from threading import Event, Thread
 # from .._request import RequestState
@@ -1,7 +1,18 @@
-from argparse import ArgumentParser
-import json
-import yaml
-import os
+from argparse import SUPPRESS, Action, ArgumentParser
+
+
+class _CommaSeparated(Action):
+    """
+    Collects the comma-separated values of a repeatable option into one list.
+
+    A single value per occurrence keeps the option from swallowing the
+    subcommand and its arguments that may follow it.
+    """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        items = list(getattr(namespace, self.dest) or [])
+        items.extend(item for item in values.split(",") if item)
+        setattr(namespace, self.dest, items)
 
 
 def get_argparser():
@@ -28,6 +39,174 @@ def get_argparser():
     # )
     # parser.add_argument("--no-colors", dest="colors", action="store_false", help="Disable colors in console output.")
     parser.add_argument("--version", action="store_true", help="Print version information.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of regions scanned at the same time (default: 8).",
+    )
+    parser.add_argument(
+        "--accounts",
+        action=_CommaSeparated,
+        metavar="ROLE_ARN_OR_PROFILE[,ROLE_ARN_OR_PROFILE...]",
+        help=(
+            "Scan several accounts, given as IAM role ARNs to assume or profile names, and merge them. "
+            "Can be given several times."
+        ),
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        help="Number of worker processes for --accounts (default: one per CPU).",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        metavar="SECONDS",
+        help="Only reuse cached AWS responses younger than this, instead of the per-call defaults.",
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=20.0,
+        metavar="CALLS_PER_SECOND",
+        help=(
+            "Most API calls per second per account, region and action family. The rate backs off when AWS "
+            "throttles and recovers up to this maximum (default: 20)."
+        ),
+    )
+    parser.add_argument(
+        "--burst", type=int, default=100, help="API calls allowed at once before --max-rate applies (default: 100)."
+    )
+    parser.add_argument(
+        "--retry-mode",
+        choices=["legacy", "standard", "adaptive"],
+        default="standard",
+        help="botocore retry mode for failed and throttled calls (default: standard).",
+    )
+    parser.add_argument(
+        "--max-attempts", type=int, default=8, help="Attempts per API call, retries included (default: 8)."
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the AWS response cache.")
+    parser.add_argument(
+        "-o", "--output", default="example.html", help="The HTML file to render (default: example.html)."
+    )
+    parser.add_argument("--no-html", action="store_true", help="Do not render the HTML page, e.g. with --export.")
+    parser.add_argument(
+        "--export",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help=(
+            "Also write the graph with all its metadata to PATH, as JSONL (.jsonl), GraphML (.graphml) or "
+            "DOT (.dot, .gv) depending on the extension. Can be given several times."
+        ),
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["auto", "static", "physics"],
+        default="auto",
+        help=(
+            "How nodes are positioned: 'static' precomputes the layout (requires numpy), 'physics' lets the "
+            "browser simulate it, 'auto' uses 'static' when numpy is installed (default: auto)."
+        ),
+    )
+    parser.add_argument(
+        "--split-data",
+        action="store_true",
+        help="Write nodes and edges to chunk files next to the HTML page, loaded after the page opens.",
+    )
+    parser.add_argument(
+        "--cluster-by",
+        metavar="{region,account,tgw,tag:KEY}",
+        help=(
+            "Collapse the page into one node per region, account, transit gateway hub or value of VPC tag KEY, "
+            "with aggregated edges between them. Double-click a cluster to expand it."
+        ),
+    )
+    parser.add_argument("--save-snapshot", metavar="PATH", help="Write the discovered topology to a snapshot file.")
+    parser.add_argument(
+        "--snapshot",
+        metavar="PATH",
+        help="Render from a snapshot file instead of scanning AWS. No API calls are made.",
+    )
+    parser.add_argument(
+        "--incremental",
+        metavar="PATH",
+        help="Start from a previous snapshot file and only re-analyze VPCs that changed since.",
+    )
+    parser.add_argument("--diff", metavar="PATH", help="Write the topology diff of an --incremental scan as JSON.")
+    parser.add_argument(
+        "--regions",
+        action=_CommaSeparated,
+        metavar="REGION[,REGION...]",
+        help="Only scan or render these regions. Can be given several times.",
+    )
+    parser.add_argument(
+        "--vpc-ids",
+        action=_CommaSeparated,
+        metavar="VPC_ID[,VPC_ID...]",
+        help="Only scan or render these VPCs. Can be given several times.",
+    )
+    parser.add_argument(
+        "--tag",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help=(
+            "Only scan or render VPCs with this tag, or with tag KEY set to any value. Can be given several "
+            "times: values of the same key are alternatives, different keys must all match."
+        ),
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="VPC_ID_OR_TAG",
+        help="Leave out this VPC, given as a VPC id or a KEY=VALUE tag. Can be given several times.",
+    )
+    parser.add_argument(
+        "--metrics-json", metavar="PATH", help="Write per-stage timings and per-region API call counts as JSON."
+    )
+    parser.add_argument(
+        "--metrics-prom", metavar="PATH", help="Write the same metrics as a Prometheus textfile."
+    )
+    parser.add_argument("--profile", metavar="PATH", help="Profile the run with cProfile and dump the stats to PATH.")
+
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    query = subparsers.add_parser(
+        "query",
+        help="Check whether one VPC can reach another, using a snapshot file.",
+        description="Check whether one VPC can reach another, using a snapshot file. No API calls are made.",
+    )
+    query.add_argument("snapshot", help="The snapshot file to query.")
+    query.add_argument("source", nargs="?", help="VpcId or Name tag of the source VPC.")
+    query.add_argument("target", nargs="?", help="VpcId or Name tag of the target VPC.")
+    query.add_argument("-p", "--port", type=int, help="Also require this port to be open on both VPCs.")
+    query.add_argument("--protocol", default="tcp", help="The protocol of --port (default: tcp).")
+    query.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Run one query per line of FILE ('-' for stdin), written as 'SOURCE TARGET [PORT]'.",
+    )
+    query.add_argument("--json", action="store_true", help="Print one JSON result per query.")
+    serve = subparsers.add_parser(
+        "serve",
+        help="Serve the graph from a local web server that loads it piece by piece.",
+        description=(
+            "Serve the graph from a local web server. The page starts from a region and transit gateway "
+            "summary and loads node neighborhoods and VPC ego-graphs on demand."
+        ),
+    )
+    # SUPPRESS keeps a top-level --snapshot when no positional is given.
+    serve.add_argument(
+        "snapshot", nargs="?", default=SUPPRESS, help="Serve this snapshot file instead of scanning AWS."
+    )
+    serve.add_argument("--host", default="127.0.0.1", help="The address to listen on (default: 127.0.0.1).")
+    serve.add_argument("--port", type=int, default=8000, help="The port to listen on (default: 8000).")
+    serve.add_argument(
+        "--limit", type=int, default=500, help="Maximum number of nodes returned per request (default: 500)."
+    )
 
     return parser
 
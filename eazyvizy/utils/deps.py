@@ -0,0 +1,13 @@
+"""Checks for optional dependencies."""
+from functools import lru_cache
+from importlib.util import find_spec
+
+
+@lru_cache(maxsize=None)
+def has_module(name):
+    """Returns whether an optional module can be imported, without importing it."""
+    return find_spec(name) is not None
+
+
+def has_numpy():
+    return has_module("numpy")
@@ -0,0 +1,268 @@
+"""
+Run instrumentation.
+
+`Metrics` records the wall time of every pipeline stage (fetch, analyze,
+build, merge, cluster, layout, render, export), in total and per region, and
+accounts every AWS API call per region and operation: count, latency,
+retries and throttled responses, plus the time calls waited for the
+client-side rate limiter. API calls are observed through botocore's
+`before-call`, `after-call` and `needs-retry` events, so instrumenting a
+session needs no changes to the code issuing the calls. The result can be
+written as a JSON report or as a Prometheus textfile for node_exporter's
+textfile collector.
+
+`profiled` runs a block under cProfile, including the threads it starts,
+and dumps the merged pstats file.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+
+THROTTLING_CODES = frozenset(
+    ["Throttling", "ThrottlingException", "ThrottledException", "RequestLimitExceeded", "TooManyRequestsException"]
+)
+_START = "eazyvizy_call_started"
+
+
+def _call_record():
+    return {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "retries": 0, "throttled": 0, "errors": 0}
+
+
+def _wait_record():
+    return {"waits": 0, "seconds": 0.0}
+
+
+class Metrics:
+    """Per-stage timings and per-region API call accounting of one run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = defaultdict(float)
+        self.region_stages = defaultdict(lambda: defaultdict(float))
+        self.calls = defaultdict(lambda: defaultdict(_call_record))
+        # Time calls spent waiting for the client-side rate limiter, per region and action family.
+        self.waits = defaultdict(lambda: defaultdict(_wait_record))
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to and returned from account worker processes.
+        return {
+            "started": self.started,
+            "stages": dict(self.stages),
+            "region_stages": {region: dict(stages) for region, stages in self.region_stages.items()},
+            "calls": {region: {op: dict(record) for op, record in ops.items()} for region, ops in self.calls.items()},
+            "waits": {
+                region: {name: dict(record) for name, record in names.items()} for region, names in self.waits.items()
+            },
+        }
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.started = state["started"]
+        self.merge(state)
+
+    def merge(self, other):
+        """Adds the timings and calls of another `Metrics` (or its state) to this one."""
+        state = other if isinstance(other, dict) else other.__getstate__()
+        with self._lock:
+            for name, seconds in state["stages"].items():
+                self.stages[name] += seconds
+            for region, stages in state["region_stages"].items():
+                for name, seconds in stages.items():
+                    self.region_stages[region][name] += seconds
+            for region, operations in state["calls"].items():
+                for operation, record in operations.items():
+                    mine = self.calls[region][operation]
+                    for key, value in record.items():
+                        mine[key] = max(mine[key], value) if key == "max_seconds" else mine[key] + value
+            for region, names in state.get("waits", {}).items():
+                for name, record in names.items():
+                    for key, value in record.items():
+                        self.waits[region][name][key] += value
+
+    @contextmanager
+    def stage(self, name, region=None):
+        """Adds the wall time of the block to stage `name`, and to the region's share of it."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] += elapsed
+                if region is not None:
+                    self.region_stages[region][name] += elapsed
+
+    def waited(self, region, name, seconds):
+        """Records a call of action family `name` held back by the rate limiter for `seconds`."""
+        with self._lock:
+            record = self.waits[region][name]
+            record["waits"] += 1
+            record["seconds"] += seconds
+
+    def instrument(self, session):
+        """Accounts every API call made by clients of a boto3 session created from now on."""
+        session.events.register("before-call.*.*", self._before_call)
+        session.events.register("after-call.*.*", self._after_call)
+        session.events.register("after-call-error.*.*", self._after_call_error)
+        session.events.register("needs-retry.*.*", self._needs_retry)
+        return session
+
+    @staticmethod
+    def _before_call(context, **kwargs):
+        context[_START] = time.perf_counter()
+
+    def _after_call(self, model, context, parsed=None, **kwargs):
+        metadata = (parsed or {}).get("ResponseMetadata", {})
+        code = (parsed or {}).get("Error", {}).get("Code")
+        self._record(model.name, context, metadata.get("RetryAttempts", 0), code)
+
+    def _after_call_error(self, model, context, exception=None, **kwargs):
+        self._record(model.name, context, 0, type(exception).__name__)
+
+    def _needs_retry(self, operation, request_dict=None, response=None, **kwargs):
+        # Emitted for every attempt, so throttled attempts are counted whether they were retried or not.
+        if response is None or response[1].get("Error", {}).get("Code") not in THROTTLING_CODES:
+            return
+        region = (request_dict or {}).get("context", {}).get("client_region") or "global"
+        with self._lock:
+            self.calls[region][operation.name]["throttled"] += 1
+
+    def _record(self, operation, context, retries, error_code):
+        elapsed = time.perf_counter() - context.get(_START, time.perf_counter())
+        region = context.get("client_region") or "global"
+        with self._lock:
+            record = self.calls[region][operation]
+            record["count"] += 1
+            record["seconds"] += elapsed
+            record["max_seconds"] = max(record["max_seconds"], elapsed)
+            record["retries"] += retries
+            if error_code:
+                record["errors"] += 1
+
+    def report(self):
+        """Returns the metrics as a JSON-serializable dict."""
+        state = self.__getstate__()
+        totals = _call_record()
+        for operations in state["calls"].values():
+            for record in operations.values():
+                for key, value in record.items():
+                    totals[key] = max(totals[key], value) if key == "max_seconds" else totals[key] + value
+        return {
+            "started": state["started"],
+            "duration": time.time() - self.started,
+            "stages": state["stages"],
+            "regions": {
+                region: {
+                    "stages": state["region_stages"].get(region, {}),
+                    "calls": state["calls"].get(region, {}),
+                    "waits": state["waits"].get(region, {}),
+                }
+                for region in sorted(set(state["region_stages"]) | set(state["calls"]) | set(state["waits"]))
+            },
+            "calls": totals,
+            "waited_seconds": sum(record["seconds"] for names in state["waits"].values() for record in names.values()),
+        }
+
+    def summary(self):
+        """Returns a one-line account of the API calls, or None if none were made."""
+        report = self.report()
+        calls = report["calls"]
+        if not calls["count"]:
+            return None
+        return (
+            f"{calls['count']} API calls, {calls['retries']} retries, {calls['throttled']} throttled, "
+            f"{calls['errors']} failed, {report['waited_seconds']:.1f} s waiting for the rate limiter"
+        )
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.report(), indent=2, sort_keys=True))
+
+    def write_prometheus(self, path):
+        """Writes the metrics in the Prometheus text exposition format."""
+        report = self.report()
+        lines = [
+            "# HELP eazyvizy_run_seconds Wall time of the whole run.",
+            "# TYPE eazyvizy_run_seconds gauge",
+            f"eazyvizy_run_seconds {report['duration']:.6f}",
+            "# HELP eazyvizy_run_timestamp_seconds Start time of the run.",
+            "# TYPE eazyvizy_run_timestamp_seconds gauge",
+            f"eazyvizy_run_timestamp_seconds {report['started']:.3f}",
+            "# HELP eazyvizy_stage_seconds Wall time spent per stage, summed over regions.",
+            "# TYPE eazyvizy_stage_seconds gauge",
+        ]
+        lines += [
+            f'eazyvizy_stage_seconds{{stage="{name}"}} {seconds:.6f}'
+            for name, seconds in sorted(report["stages"].items())
+        ]
+        lines += [
+            "# HELP eazyvizy_region_stage_seconds Wall time spent per stage and region.",
+            "# TYPE eazyvizy_region_stage_seconds gauge",
+        ]
+        for region, data in report["regions"].items():
+            for name, seconds in sorted(data["stages"].items()):
+                lines.append(f'eazyvizy_region_stage_seconds{{region="{region}",stage="{name}"}} {seconds:.6f}')
+        for key, kind, description in (
+            ("count", "api_calls", "AWS API calls made."),
+            ("seconds", "api_call_seconds", "Time spent in AWS API calls, retries included."),
+            ("max_seconds", "api_call_max_seconds", "Slowest single AWS API call."),
+            ("retries", "api_retries", "Retries performed by botocore."),
+            ("throttled", "api_throttled", "Attempts answered with a throttling error."),
+            ("errors", "api_errors", "Calls that failed."),
+        ):
+            lines += [f"# HELP eazyvizy_{kind} {description}", f"# TYPE eazyvizy_{kind} gauge"]
+            for region, data in report["regions"].items():
+                for operation, record in sorted(data["calls"].items()):
+                    lines.append(f'eazyvizy_{kind}{{region="{region}",operation="{operation}"}} {record[key]:g}')
+        for key, kind, description in (
+            ("waits", "rate_limit_waits", "Calls held back by the client-side rate limiter."),
+            ("seconds", "rate_limit_wait_seconds", "Time calls spent waiting for the client-side rate limiter."),
+        ):
+            lines += [f"# HELP eazyvizy_{kind} {description}", f"# TYPE eazyvizy_{kind} gauge"]
+            for region, data in report["regions"].items():
+                for name, record in sorted(data["waits"].items()):
+                    lines.append(f'eazyvizy_{kind}{{region="{region}",family="{name}"}} {record[key]:g}')
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+
+def _write_atomic(path, text):
+    # The textfile collector may read at any time, so the file is replaced in one step.
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        file.write(text)
+    os.replace(temporary, path)
+
+
+@contextmanager
+def profiled(path):
+    """
+    Profiles the block and every thread started inside it, then dumps the
+    merged statistics to `path` (readable with `python -m pstats`).
+    """
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def start_thread_profiler(*args):
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    threading.setprofile(start_thread_profiler)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            profiler.disable()
+            if profiler.getstats():
+                stats.add(profiler)
+        stats.dump_stats(path)
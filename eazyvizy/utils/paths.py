@@ -0,0 +1,8 @@
+"""Locations of files eazyvizy keeps between runs."""
+import os
+
+
+def cache_dir(*parts):
+    """Returns a directory below `$XDG_CACHE_HOME/eazyvizy` (default `~/.cache/eazyvizy`)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "eazyvizy", *parts)
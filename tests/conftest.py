@@ -15,6 +15,15 @@ from typing import List
 import pytest
 from _pytest.nodes import Item
 
+from eazyvizy.aws import _conn
+from eazyvizy.aws._collector import RegionSnapshot
+from eazyvizy.aws._conn import EazyVizyAWS
+
+REGION = "us-east-1"
+# Catch-all ingress ranges do not count as connections, see `ingress_entries`.
+INGRESS = [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "10.0.0.0/8"}]}]
+EGRESS = [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}]
+
 
 def pytest_collection_modifyitems(items: list[Item]):
     for item in items:
@@ -28,3 +37,51 @@ def pytest_collection_modifyitems(items: list[Item]):
 def unit_test_mocks(monkeypatch: None):
     """Include Mocks here to execute all commands offline and fast."""
     pass
+
+
+@pytest.fixture(params=[True, False], ids=["matrix", "per-pair"])
+def analyzer(request, monkeypatch):
+    """An `EazyVizyAWS` analyzing with the NumPy matrix stage and, again, with the per-pair lookups."""
+    monkeypatch.setattr(_conn, "has_numpy", lambda: request.param)
+    return EazyVizyAWS()
+
+
+@pytest.fixture
+def region_snapshot():
+    """
+    Returns a builder of hand-written `RegionSnapshot`s.
+
+    Each VPC is given as `(vpc_id, cidr, *routes)` and gets one route table,
+    with its local route followed by `routes`, and one security group open
+    to 10.0.0.0/8. Other records, such as `peerings`, are passed on to
+    `RegionSnapshot` as keyword arguments.
+    """
+
+    def build(*vpcs, account=None, **records):
+        owner = {"OwnerId": account} if account else {}
+        return RegionSnapshot(
+            REGION,
+            vpcs=[{"VpcId": vpc_id, "State": "available", "CidrBlock": cidr, **owner} for vpc_id, cidr, *_ in vpcs],
+            route_tables=[
+                {
+                    "RouteTableId": f"rtb-{vpc_id}",
+                    "VpcId": vpc_id,
+                    "Routes": [{"DestinationCidrBlock": cidr, "GatewayId": "local", "State": "active"}, *routes],
+                }
+                for vpc_id, cidr, *routes in vpcs
+            ],
+            security_groups=[
+                {
+                    "GroupId": f"sg-{vpc_id}",
+                    "GroupName": "default",
+                    "VpcId": vpc_id,
+                    "IpPermissions": INGRESS,
+                    "IpPermissionsEgress": EGRESS,
+                }
+                for vpc_id, *_ in vpcs
+            ],
+            account=account,
+            **records,
+        )
+
+    return build
@@ -0,0 +1,61 @@
+"""Accounts collected in the same region are analyzed as one estate."""
+import pytest
+
+from eazyvizy.aws._collector import combine_accounts
+from eazyvizy.aws._query import ReachabilityIndex
+from eazyvizy.aws._snapshot import write_snapshot
+
+REGION = "us-east-1"
+PEERING = {
+    "VpcPeeringConnectionId": "pcx-1",
+    "RequesterVpcInfo": {"VpcId": "vpc-a", "OwnerId": "111", "Region": REGION, "CidrBlock": "10.0.0.0/16"},
+    "AccepterVpcInfo": {"VpcId": "vpc-b", "OwnerId": "222", "Region": REGION, "CidrBlock": "10.1.0.0/16"},
+    "Status": {"Code": "active"},
+}
+
+
+@pytest.fixture
+def two_accounts(region_snapshot):
+    # Both sides of a peering see the connection.
+    return [
+        region_snapshot(
+            ("vpc-a", "10.0.0.0/16", {"DestinationCidrBlock": "10.1.0.0/16", "VpcPeeringConnectionId": "pcx-1"}),
+            account="111",
+            peerings=[PEERING],
+        ),
+        region_snapshot(
+            ("vpc-b", "10.1.0.0/16", {"DestinationCidrBlock": "10.0.0.0/16", "VpcPeeringConnectionId": "pcx-1"}),
+            account="222",
+            peerings=[PEERING],
+        ),
+    ]
+
+
+def test_combine_accounts_merges_a_region(two_accounts):
+    (combined,) = combine_accounts(two_accounts)
+    assert sorted(combined.vpcs) == ["vpc-a", "vpc-b"]
+    assert list(combined.peerings) == ["pcx-1"]
+    assert [part.account for part in combined.parts] == ["111", "222"]
+
+
+def test_cross_account_peering_connects(analyzer, two_accounts, tmp_path):
+    path = tmp_path / "estate.jsonl"
+    write_snapshot(str(path), two_accounts)
+    analyzer.initialize_from_snapshot(str(path))
+
+    connections = {vpc_id: c for s in analyzer.snapshots for vpc_id, c in s.connections.items()}
+    assert [connection["target"] for connection in connections["vpc-a"]] == ["vpc-b"]
+    assert [connection["target"] for connection in connections["vpc-b"]] == ["vpc-a"]
+    # Each account's snapshot keeps only the connections of its own VPCs.
+    assert {s.account: sorted(s.connections) for s in analyzer.snapshots} == {"111": ["vpc-a"], "222": ["vpc-b"]}
+    # Peering paths run from the route table through the connection into the peer.
+    edges = {(source, target) for source, target, _ in analyzer.graph.edges()}
+    assert {("rtb-vpc-a", "pcx-1"), ("pcx-1", "vpc-b"), ("rtb-vpc-b", "pcx-1"), ("pcx-1", "vpc-a")} <= edges
+
+
+def test_cross_account_peering_query(analyzer, two_accounts, tmp_path):
+    path = tmp_path / "estate.jsonl"
+    write_snapshot(str(path), two_accounts)
+    result = ReachabilityIndex(analyzer.load_snapshot(str(path))).query("vpc-a", "vpc-b", port=443)
+    assert result["reachable"]
+    assert [path["via"] for path in result["paths"]] == ["pcx-1"]
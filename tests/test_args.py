@@ -0,0 +1,43 @@
+"""Command line parsing."""
+from eazyvizy.utils.args import get_argparser
+
+
+def parse(*argv):
+    return get_argparser().parse_args(list(argv))
+
+
+def test_scope_options_leave_subcommands_alone():
+    args = parse("--regions", "us-east-1", "query", "snap.jsonl", "vpc-a", "vpc-b")
+    assert args.command == "query"
+    assert args.regions == ["us-east-1"]
+    assert (args.snapshot, args.source, args.target) == ("snap.jsonl", "vpc-a", "vpc-b")
+
+    args = parse("--exclude", "vpc-1", "serve", "snap.jsonl")
+    assert args.command == "serve"
+    assert args.exclude == ["vpc-1"]
+    assert args.snapshot == "snap.jsonl"
+
+
+def test_scope_options_are_comma_separated_and_repeatable():
+    args = parse("--regions", "us-east-1,eu-west-1", "--regions", "ap-south-1", "--vpc-ids", "vpc-1,vpc-2")
+    assert args.regions == ["us-east-1", "eu-west-1", "ap-south-1"]
+    assert args.vpc_ids == ["vpc-1", "vpc-2"]
+
+
+def test_accounts_leave_subcommands_alone():
+    args = parse("--accounts", "prod,arn:aws:iam::111:role/scan", "--accounts", "dev", "serve", "snap.jsonl")
+    assert args.accounts == ["prod", "arn:aws:iam::111:role/scan", "dev"]
+    assert args.command == "serve"
+    assert args.snapshot == "snap.jsonl"
+
+
+def test_exclude_keeps_commas_in_tag_values():
+    args = parse("--exclude", "vpc-1", "--exclude", "team=a,b")
+    assert args.exclude == ["vpc-1", "team=a,b"]
+
+
+def test_scope_defaults():
+    args = parse()
+    assert args.command is None
+    assert args.regions is None and args.vpc_ids is None
+    assert args.exclude == [] and args.tag == []
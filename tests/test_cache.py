@@ -0,0 +1,65 @@
+"""Describe* result cache."""
+import pytest
+
+from eazyvizy.aws import _cache
+from eazyvizy.aws._cache import DescribeCache
+
+PARAMS = {"Filters": [{"Name": "vpc-id", "Values": ["vpc-1"]}]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_hit_until_ttl_expires(tmp_path, clock):
+    cache = DescribeCache(str(tmp_path / "cache.db"), ttls={"DescribeVpcs": 60})
+    cache.put("111", "us-east-1", "DescribeVpcs", PARAMS, [{"VpcId": "vpc-1"}])
+    clock[0] += 60
+    assert cache.get("111", "us-east-1", "DescribeVpcs", PARAMS) == [{"VpcId": "vpc-1"}]
+    clock[0] += 1
+    assert cache.get("111", "us-east-1", "DescribeVpcs", PARAMS) is None
+
+
+def test_max_age_overrides_ttls(tmp_path, clock):
+    cache = DescribeCache(str(tmp_path / "cache.db"), max_age=0, ttls={"DescribeVpcs": 60})
+    cache.put("111", "us-east-1", "DescribeVpcs", PARAMS, [])
+    clock[0] += 1
+    assert cache.get("111", "us-east-1", "DescribeVpcs", PARAMS) is None
+
+
+def test_keys_are_per_account_region_and_params(tmp_path, clock):
+    cache = DescribeCache(str(tmp_path / "cache.db"))
+    cache.put("111", "us-east-1", "DescribeVpcs", PARAMS, [{"VpcId": "vpc-1"}])
+    assert cache.get("222", "us-east-1", "DescribeVpcs", PARAMS) is None
+    assert cache.get("111", "us-west-2", "DescribeVpcs", PARAMS) is None
+    assert cache.get("111", "us-east-1", "DescribeVpcs", {}) is None
+
+
+def test_fetch_loads_once(tmp_path, clock):
+    cache = DescribeCache(str(tmp_path / "cache.db"))
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return ["us-east-1"]
+
+    assert cache.fetch(None, None, "DescribeRegions", {}, loader) == ["us-east-1"]
+    assert cache.fetch(None, None, "DescribeRegions", {}, loader) == ["us-east-1"]
+    assert len(calls) == 1
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path, clock):
+    cache = DescribeCache(str(tmp_path / "cache.db"), max_bytes=200)
+    value = [{"VpcId": f"vpc-{i}", "CidrBlock": f"10.{i}.0.0/16"} for i in range(4)]
+    cache.put("111", "us-east-1", "DescribeVpcs", {"n": 1}, value)
+    clock[0] += 1
+    cache.put("111", "us-east-1", "DescribeVpcs", {"n": 2}, value)
+    clock[0] += 1
+    cache.get("111", "us-east-1", "DescribeVpcs", {"n": 1})
+    clock[0] += 1
+    cache.put("111", "us-east-1", "DescribeVpcs", {"n": 3}, value)
+    assert cache.get("111", "us-east-1", "DescribeVpcs", {"n": 2}) is None
+    assert cache.get("111", "us-east-1", "DescribeVpcs", {"n": 3}) == value
@@ -0,0 +1,134 @@
+"""Graph clustering by region, account, transit gateway hub and tag."""
+from collections import Counter
+
+import pytest
+
+from eazyvizy._cluster import Clustering, check_strategy
+from eazyvizy._graph import Graph
+
+EAST = "cluster:region:us-east-1"
+WEST = "cluster:region:us-west-2"
+
+
+def vpc(graph, vpc_id, region, account, **tags):
+    graph.add_node(vpc_id, kind="vpc", vpcId=vpc_id, region=region, account=account, tags=tags or None)
+
+
+@pytest.fixture
+def graph():
+    graph = Graph()
+    vpc(graph, "vpc-a", "us-east-1", "111", team="data")
+    vpc(graph, "vpc-b", "us-east-1", "111", team="web")
+    vpc(graph, "vpc-c", "us-west-2", "222", team="data")
+    vpc(graph, "vpc-d", "us-west-2", "222")
+    vpc(graph, "vpc-e", "us-west-2", "222")
+    graph.add_node("rtb-a", kind="route_table", vpcId="vpc-a", region="us-east-1")
+    graph.add_node("rtb-c", kind="route_table", vpcId="vpc-c", region="us-west-2")
+    # Found from vpc-c, so it follows vpc-c whatever its own attributes say.
+    graph.add_node("pcx-1", kind="peering", vpcId="vpc-c", region="us-east-1")
+    graph.add_node("tgw-1", kind="transit_gateway", region="us-east-1", account="111")
+    graph.add_node("tgw-2", kind="transit_gateway", region="us-west-2")
+    for source, target, ports in [
+        ("rtb-a", "tgw-1", "tcp 443"),
+        ("tgw-1", "vpc-b", "tcp 443"),
+        ("tgw-1", "vpc-c", "tcp 443"),
+        ("rtb-c", "pcx-1", "tcp 22"),
+        ("pcx-1", "vpc-a", "tcp 22"),
+        ("vpc-b", "vpc-a", "tcp 443"),
+        ("vpc-b", "vpc-d", "tcp 443"),
+        ("vpc-d", "vpc-c", "tcp 5432"),
+        ("tgw-2", "vpc-d", None),
+    ]:
+        graph.add_edge(source, target, ports=ports)
+    return graph
+
+
+def clusters(clustering):
+    return {node_id: clustering.cluster_of[index] for index, node_id in enumerate(clustering.graph.node_ids)}
+
+
+def edges(graph):
+    return {(source, target): attrs for source, target, attrs in graph.edges()}
+
+
+def test_collapsed_aggregates_edges_between_clusters(graph):
+    collapsed = Clustering(graph, "region").collapsed()
+    assert [node_id for node_id, _ in collapsed.nodes()] == [EAST, WEST]
+    assert collapsed.node(EAST)["members"] == 4 and collapsed.node(EAST)["label"] == "us-east-1\n2 VPCs"
+    assert collapsed.node(WEST)["members"] == 6 and collapsed.node(WEST)["label"] == "us-west-2\n3 VPCs"
+    # Edges inside a cluster are dropped, the others become one edge per direction.
+    aggregated = edges(collapsed)
+    assert sorted(aggregated) == [(EAST, WEST), (WEST, EAST)]
+    assert aggregated[(EAST, WEST)]["count"] == 2
+    assert aggregated[(EAST, WEST)]["ports"] == "tcp 443"
+    assert aggregated[(EAST, WEST)]["title"] == "2 edges\ntcp 443 (2)"
+    assert aggregated[(WEST, EAST)]["count"] == 1
+    assert aggregated[(WEST, EAST)]["ports"] == "tcp 22"
+
+
+def test_expanded_clusters_keep_their_members(graph):
+    collapsed = Clustering(graph, "region").collapsed(expanded=[EAST])
+    assert sorted(node_id for node_id, _ in collapsed.nodes()) == sorted(["vpc-a", "vpc-b", "rtb-a", "tgw-1", WEST])
+    assert collapsed.node("vpc-a")["cluster"] == EAST
+    found = edges(collapsed)
+    assert sorted(found) == sorted(
+        [
+            ("rtb-a", "tgw-1"),
+            ("tgw-1", "vpc-b"),
+            ("vpc-b", "vpc-a"),
+            ("tgw-1", WEST),
+            ("vpc-b", WEST),
+            (WEST, "vpc-a"),
+        ]
+    )
+    # Edges between kept members are copied, the ones to a collapsed cluster are aggregated.
+    assert found[("vpc-b", "vpc-a")] == {"ports": "tcp 443"}
+    assert found[(WEST, "vpc-a")]["count"] == 1
+
+
+def test_cluster_keys(graph):
+    assert clusters(Clustering(graph, "account")) == {
+        **dict.fromkeys(["vpc-a", "vpc-b", "rtb-a", "tgw-1"], "cluster:account:111"),
+        **dict.fromkeys(["vpc-c", "vpc-d", "vpc-e", "rtb-c", "pcx-1"], "cluster:account:222"),
+        "tgw-2": "cluster:account:unknown",
+    }
+    assert clusters(Clustering(graph, "tag:team")) == {
+        **dict.fromkeys(["vpc-a", "rtb-a", "vpc-c", "rtb-c", "pcx-1"], "cluster:tag:team:data"),
+        "vpc-b": "cluster:tag:team:web",
+        **dict.fromkeys(["vpc-d", "vpc-e", "tgw-1", "tgw-2"], "cluster:tag:team:untagged"),
+    }
+    # Every VPC routed through a transit gateway joins the gateway's cluster.
+    assert clusters(Clustering(graph, "tgw")) == {
+        **dict.fromkeys(["tgw-1", "vpc-a", "rtb-a", "vpc-b", "vpc-c", "rtb-c", "pcx-1"], "cluster:tgw:tgw-1"),
+        **dict.fromkeys(["tgw-2", "vpc-d"], "cluster:tgw:tgw-2"),
+        "vpc-e": "cluster:tgw:us-west-2/no-tgw",
+    }
+
+
+@pytest.mark.parametrize("by", ["region", "account", "tgw", "tag:team"])
+def test_expansions_cover_every_edge_once_per_cluster_endpoint(graph, by):
+    clustering = Clustering(graph, by)
+    expansions = list(clustering.expansions())
+    assert [cluster_id for cluster_id, _, _ in expansions] == list(clustering.members)
+
+    seen = Counter()
+    for cluster_id, nodes, links in expansions:
+        assert (nodes, links) == clustering.expansion(cluster_id)
+        seen.update((cluster_id, source, target) for source, target, *_ in links)
+    expected = Counter(
+        (cluster_id, source, target)
+        for source, target, _ in graph.edges()
+        for cluster_id in {clusters(clustering)[source], clusters(clustering)[target]}
+    )
+    assert seen == expected
+
+
+@pytest.mark.parametrize("by", ["region", "account", "tgw", "tag:Name"])
+def test_check_strategy_accepts(by):
+    assert check_strategy(by) == by
+
+
+@pytest.mark.parametrize("by", ["vpc", "tag:", "Region", ""])
+def test_check_strategy_rejects(by):
+    with pytest.raises(ValueError, match="Unknown clustering"):
+        check_strategy(by)
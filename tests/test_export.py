@@ -0,0 +1,123 @@
+"""Streaming JSONL, GraphML and DOT exports."""
+import json
+from xml.dom import minidom
+
+import pytest
+
+from benchmarks.ec2_stub import StubEC2
+from benchmarks.topology import synthetic_topology
+
+from eazyvizy._export import export_format, export_graph
+from eazyvizy._graph import Graph
+from eazyvizy.aws._conn import EazyVizyAWS
+
+
+@pytest.fixture
+def graph():
+    graph = Graph()
+    graph.add_node(
+        'vpc-"a"', kind="vpc", label="line one\nline two", region="us-east-1", tags={"team": "R&D <core>"}, shape="box"
+    )
+    graph.add_node("vpc-b", kind="vpc", x=1.5, y=-2.0, members=3, image="https://example.com/vpc.png")
+    graph.add_edge('vpc-"a"', "vpc-b", ports="tcp 443", dashed=True, color="#ff0000")
+    graph.add_edge("vpc-b", 'vpc-"a"', ports=None, dashed=False)
+    return graph
+
+
+@pytest.fixture(scope="module")
+def scanned_graph():
+    analyzer = EazyVizyAWS(StubEC2(synthetic_topology(12, 2)).session(), concurrency=2)
+    analyzer.initialize()
+    return analyzer.graph
+
+
+def read_graphml(path):
+    """Parses a GraphML file back into `(nodes, edges)` with typed attribute values."""
+    document = minidom.parse(str(path))
+    convert = {"string": str, "long": int, "double": float, "boolean": lambda text: text == "true"}
+    keys = {
+        key.getAttribute("id"): (key.getAttribute("attr.name"), convert[key.getAttribute("attr.type")])
+        for key in document.getElementsByTagName("key")
+    }
+
+    def data(element):
+        values = {}
+        for item in element.getElementsByTagName("data"):
+            name, kind = keys[item.getAttribute("key")]
+            values[name] = kind(item.firstChild.data if item.firstChild else "")
+        return values
+
+    nodes = {node.getAttribute("id"): data(node) for node in document.getElementsByTagName("node")}
+    edges = [
+        (edge.getAttribute("source"), edge.getAttribute("target"), data(edge))
+        for edge in document.getElementsByTagName("edge")
+    ]
+    return nodes, edges
+
+
+def test_graphml_round_trip(graph, tmp_path):
+    path = tmp_path / "graph.graphml"
+    export_graph(str(path), graph)
+    nodes, edges = read_graphml(path)
+    # Presentation settings are left out, structured values are kept as JSON.
+    assert nodes == {
+        'vpc-"a"': {
+            "kind": "vpc",
+            "label": "line one\nline two",
+            "region": "us-east-1",
+            "tags": '{"team":"R&D <core>"}',
+        },
+        "vpc-b": {"kind": "vpc", "x": 1.5, "y": -2.0, "members": 3},
+    }
+    assert edges == [
+        ('vpc-"a"', "vpc-b", {"ports": "tcp 443", "dashed": True}),
+        ("vpc-b", 'vpc-"a"', {"dashed": False}),
+    ]
+
+
+def test_graphml_of_a_scan_parses(scanned_graph, tmp_path):
+    path = tmp_path / "scan.graphml"
+    export_graph(str(path), scanned_graph)
+    nodes, edges = read_graphml(path)
+    assert list(nodes) == [node_id for node_id, _ in scanned_graph.nodes()]
+    assert [(source, target) for source, target, _ in edges] == [
+        (source, target) for source, target, _ in scanned_graph.edges()
+    ]
+
+
+def test_dot_escapes_quotes_and_newlines(graph, tmp_path):
+    path = tmp_path / "graph.dot"
+    export_graph(str(path), graph)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    # One statement per line: newlines inside values are escaped.
+    assert lines[0] == "digraph eazyvizy {" and lines[-1] == "}"
+    assert len(lines) == 2 + graph.node_count + graph.edge_count
+    assert lines[1] == (
+        '  "vpc-\\"a\\"" ["kind"="vpc", "label"="line one\\nline two", "region"="us-east-1", '
+        '"tags"="{\\"team\\":\\"R&D <core>\\"}"];'
+    )
+    assert lines[3] == '  "vpc-\\"a\\"" -> "vpc-b" ["ports"="tcp 443", "dashed"="True"];'
+
+
+@pytest.mark.parametrize("format", ["jsonl", "graphml", "dot"])
+def test_formats_by_extension(format, graph, tmp_path):
+    path = tmp_path / f"graph.{format}"
+    export_graph(str(path), graph)
+    assert export_format(str(path)) == format
+    assert path.stat().st_size
+
+
+def test_jsonl_counts_match_the_graph(scanned_graph, tmp_path):
+    path = tmp_path / "scan.jsonl"
+    export_graph(str(path), scanned_graph)
+    header, *records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert header == {"type": "graph", "nodes": scanned_graph.node_count, "edges": scanned_graph.edge_count}
+    assert [record["id"] for record in records if record["type"] == "node"] == list(scanned_graph.node_ids)
+    assert sum(record["type"] == "edge" for record in records) == scanned_graph.edge_count
+    assert len(records) == scanned_graph.node_count + scanned_graph.edge_count
+
+
+def test_unknown_formats_are_rejected(graph, tmp_path):
+    with pytest.raises(ValueError, match="Unknown export format"):
+        export_graph(str(tmp_path / "graph.csv"), graph)
+    assert export_format(str(tmp_path / "graph.csv"), "dot") == "dot"
@@ -0,0 +1,54 @@
+"""Server-side layout and its cache."""
+import os
+
+import pytest
+
+from eazyvizy import _layout
+from eazyvizy._graph import Graph
+
+np = pytest.importorskip("numpy")
+
+
+def chain(count, prefix="n"):
+    graph = Graph()
+    for i in range(count):
+        graph.add_node(f"{prefix}{i}", region="us-east-1", vpcId=f"vpc-{i // 4}")
+    for i in range(1, count):
+        graph.add_edge(f"{prefix}{i}", f"{prefix}{i - 1}")
+    return graph
+
+
+def test_force_simulation_refines_small_graphs():
+    graph = chain(40)
+    seeds = _layout._seed_positions(np, graph)
+    positions = _layout.compute_layout(graph)
+    assert positions.shape == (40, 2)
+    assert not np.allclose(positions, seeds)
+
+
+def test_large_graphs_keep_their_seeds(monkeypatch):
+    monkeypatch.setattr(_layout, "FORCE_LIMIT", 30)
+    graph = chain(40)
+    assert np.array_equal(_layout.compute_layout(graph), _layout._seed_positions(np, graph))
+
+
+def test_layout_is_cached(tmp_path, monkeypatch):
+    _layout.apply_layout(chain(10), cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    monkeypatch.setattr(_layout, "compute_layout", lambda *args: pytest.fail("not served from the cache"))
+    graph = chain(10)
+    _layout.apply_layout(graph, cache_dir=str(tmp_path))
+    assert "x" in graph.node("n0") and "y" in graph.node("n0")
+
+
+def test_cache_keeps_the_most_recently_used_layouts(tmp_path, monkeypatch):
+    monkeypatch.setattr(_layout, "CACHE_ENTRIES", 3)
+    graphs = [chain(5, prefix=f"g{i}-") for i in range(4)]
+    keys = [_layout.graph_key(graph) for graph in graphs]
+    for i, graph in enumerate(graphs[:3]):
+        _layout.apply_layout(graph, cache_dir=str(tmp_path))
+        os.utime(tmp_path / f"{keys[i]}.json", (i, i))
+    # Reading the oldest entry makes it the most recently used one.
+    _layout.apply_layout(chain(5, prefix="g0-"), cache_dir=str(tmp_path))
+    _layout.apply_layout(graphs[3], cache_dir=str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == sorted(f"{key}.json" for key in (keys[0], keys[2], keys[3]))
@@ -0,0 +1,112 @@
+"""Run metrics, their merging across processes and their Prometheus output."""
+import pickle
+import re
+
+from benchmarks.ec2_stub import StubEC2
+from benchmarks.topology import synthetic_topology
+
+from eazyvizy.utils.metrics import Metrics
+
+SAMPLE = re.compile(r'^(eazyvizy_[a-z_]+)(\{[a-z]+="[^"]*"(,[a-z]+="[^"]*")*\})? -?[0-9.e+]+$')
+
+
+def worker_state(count, max_seconds):
+    return {
+        "started": 1000.0,
+        "stages": {"fetch": 1.5},
+        "region_stages": {"us-east-1": {"fetch": 1.5}},
+        "calls": {
+            "us-east-1": {
+                "DescribeVpcs": {
+                    "count": count,
+                    "seconds": 0.5,
+                    "max_seconds": max_seconds,
+                    "retries": 1,
+                    "throttled": 2,
+                    "errors": 0,
+                }
+            }
+        },
+        "waits": {"us-east-1": {"describe": {"waits": 3, "seconds": 0.25}}},
+    }
+
+
+def test_merge_adds_up_workers():
+    metrics = Metrics()
+    metrics.merge(worker_state(4, 0.2))
+    other = Metrics()
+    other.merge(worker_state(6, 0.1))
+    metrics.merge(other)
+
+    assert metrics.stages == {"fetch": 3.0}
+    assert metrics.region_stages["us-east-1"] == {"fetch": 3.0}
+    # Counts and durations add up, the slowest call is the slowest of both.
+    assert metrics.calls["us-east-1"]["DescribeVpcs"] == {
+        "count": 10,
+        "seconds": 1.0,
+        "max_seconds": 0.2,
+        "retries": 2,
+        "throttled": 4,
+        "errors": 0,
+    }
+    assert metrics.waits["us-east-1"]["describe"] == {"waits": 6, "seconds": 0.5}
+
+
+def test_pickling_keeps_every_record():
+    metrics = Metrics()
+    metrics.merge(worker_state(4, 0.2))
+    with metrics.stage("analyze", "us-west-2"):
+        pass
+    metrics.waited("us-west-2", "describe", 0.125)
+
+    restored = pickle.loads(pickle.dumps(metrics))
+    assert restored.__getstate__() == metrics.__getstate__()
+    # The restored records still default new regions and operations.
+    restored.calls["eu-west-1"]["DescribeRouteTables"]["count"] += 1
+    with restored.stage("render"):
+        pass
+    assert restored.calls["eu-west-1"]["DescribeRouteTables"]["count"] == 1
+    assert "render" in restored.stages
+
+
+def test_instrumented_calls_are_counted():
+    metrics = Metrics()
+    stub = StubEC2(synthetic_topology(4, 1))
+    client = metrics.instrument(stub.session()).client("ec2", region_name="us-east-1")
+    client.describe_vpcs()
+    client.describe_vpcs()
+    record = metrics.calls["us-east-1"]["DescribeVpcs"]
+    assert (record["count"], record["retries"], record["errors"]) == (2, 0, 0)
+    assert metrics.summary().startswith("2 API calls, 0 retries, 0 throttled, 0 failed")
+
+
+def test_prometheus_text_format(tmp_path):
+    metrics = Metrics()
+    metrics.merge(worker_state(4, 0.2))
+    path = tmp_path / "eazyvizy.prom"
+    metrics.write_prometheus(str(path))
+    lines = path.read_text().splitlines()
+
+    families, samples = [], {}
+    for line in lines:
+        if line.startswith("# HELP "):
+            families.append(line.split()[2])
+        elif line.startswith("# TYPE "):
+            # Every family is introduced by its help and type, once.
+            assert line.split()[2:] == [families[-1], "gauge"]
+        else:
+            match = SAMPLE.match(line)
+            assert match, line
+            # Samples follow the header of their own family.
+            assert match.group(1) == families[-1]
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    assert len(families) == len(set(families))
+
+    assert samples['eazyvizy_api_calls{region="us-east-1",operation="DescribeVpcs"}'] == 4
+    assert samples['eazyvizy_api_throttled{region="us-east-1",operation="DescribeVpcs"}'] == 2
+    assert samples['eazyvizy_stage_seconds{stage="fetch"}'] == 1.5
+    assert samples['eazyvizy_region_stage_seconds{region="us-east-1",stage="fetch"}'] == 1.5
+    assert samples['eazyvizy_rate_limit_waits{region="us-east-1",family="describe"}'] == 3
+    assert samples["eazyvizy_run_timestamp_seconds"] == round(metrics.started, 3)
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,218 @@
+"""Scans of a synthetic estate served by the in-process EC2 stub."""
+import pytest
+
+from benchmarks.ec2_stub import StubEC2
+from benchmarks.topology import synthetic_topology
+
+from eazyvizy._main import _scan_filter
+from eazyvizy._writer import write_html
+from eazyvizy.aws import _conn
+from eazyvizy.aws._conn import EazyVizyAWS
+from eazyvizy.aws._incremental import diff_topology
+from eazyvizy.aws._matrix import ReachabilityMatrix
+from eazyvizy.aws._query import ReachabilityIndex
+from eazyvizy.aws._snapshot import read_snapshot, write_snapshot
+from eazyvizy.utils.args import get_argparser
+
+VPCS = 48
+REGIONS = 2
+
+
+def scan(monkeypatch=None, numpy=True):
+    if monkeypatch is not None:
+        monkeypatch.setattr(_conn, "has_numpy", lambda: numpy)
+    stub = StubEC2(synthetic_topology(VPCS, REGIONS))
+    analyzer = EazyVizyAWS(stub.session(), concurrency=REGIONS)
+    analyzer.initialize()
+    return analyzer, stub
+
+
+def pairs(snapshots):
+    return {
+        (connection["source"], connection["target"]): connection
+        for snapshot in snapshots
+        for connections in snapshot.connections.values()
+        for connection in connections
+    }
+
+
+@pytest.fixture(scope="module")
+def scanned():
+    return scan()[0]
+
+
+def test_scan_covers_every_region(scanned):
+    assert [snapshot.region for snapshot in scanned.snapshots] == ["us-east-1", "us-west-2"]
+    assert sum(len(snapshot.vpcs) for snapshot in scanned.snapshots) == VPCS
+    assert pairs(scanned.snapshots)
+    assert scanned.graph.node_count and scanned.graph.edge_count
+
+
+def test_matrix_matches_per_pair(scanned):
+    for snapshot in scanned.snapshots:
+        computed = ReachabilityMatrix(snapshot).connections()
+        for vpc in snapshot:
+            assert computed[vpc["VpcId"]] == scanned.connections_of(snapshot, vpc)
+
+
+def test_per_pair_scan_matches_matrix_scan(scanned, monkeypatch):
+    analyzer, _ = scan(monkeypatch, numpy=False)
+    assert pairs(analyzer.snapshots) == pairs(scanned.snapshots)
+    assert analyzer.graph.edge_count == scanned.graph.edge_count
+
+
+def test_output_does_not_depend_on_concurrency(tmp_path):
+    pages = []
+    for concurrency in (1, 4):
+        # With some latency, regions finish in a different order at each concurrency.
+        stub = StubEC2(synthetic_topology(VPCS, 4), latency=0.001)
+        analyzer = EazyVizyAWS(stub.session(), concurrency=concurrency)
+        analyzer.initialize()
+        path = tmp_path / f"concurrency-{concurrency}.html"
+        write_html(str(path), analyzer.graph, analyzer.options)
+        pages.append(path.read_bytes())
+    assert pages[0] == pages[1]
+
+
+def test_snapshot_round_trip(scanned, tmp_path):
+    path = str(tmp_path / "scan.jsonl")
+    scanned.save_snapshot(path)
+    loaded = read_snapshot(path)
+    assert [(snapshot.account, snapshot.region) for snapshot in loaded] == [
+        (snapshot.account, snapshot.region) for snapshot in scanned.snapshots
+    ]
+    for before, after in zip(scanned.snapshots, loaded):
+        assert after.vpcs == before.vpcs
+        assert after.route_tables == before.route_tables
+        assert after.connections == before.connections
+
+    replayed = EazyVizyAWS()
+    replayed.initialize_from_snapshot(path)
+    assert replayed.graph.node_count == scanned.graph.node_count
+    assert replayed.graph.edge_count == scanned.graph.edge_count
+
+
+def test_snapshot_region_filter(scanned, tmp_path):
+    path = str(tmp_path / "scan.jsonl")
+    write_snapshot(path, scanned.snapshots)
+    assert [snapshot.region for snapshot in read_snapshot(path, regions=["us-east-1"])] == ["us-east-1"]
+
+
+def test_incremental_rescan_is_a_no_op(scanned, tmp_path, monkeypatch):
+    path = str(tmp_path / "previous.jsonl")
+    scanned.save_snapshot(path)
+    stub = StubEC2(synthetic_topology(VPCS, REGIONS))
+    rescan = EazyVizyAWS(stub.session(), concurrency=REGIONS)
+    rescan.load_previous(path)
+    # Unchanged VPCs must reuse the stored connections instead of being analyzed again.
+    monkeypatch.setattr(ReachabilityMatrix, "connections", lambda self: pytest.fail("re-analyzed"))
+    rescan.initialize()
+    assert rescan.diff() == {"added": [], "removed": [], "changed": []}
+    assert pairs(rescan.snapshots) == pairs(scanned.snapshots)
+
+
+def changed_topology():
+    """The synthetic estate with one database rule moved to another port and one VPC renumbered."""
+    topology = synthetic_topology(VPCS, REGIONS)
+    region = topology["us-east-1"]
+    (group,) = [group for group in region["describe_security_groups"] if group["GroupId"] == "sg-000000082"]
+    group["IpPermissions"][0].update(FromPort=5433, ToPort=5433)
+    (vpc,) = [vpc for vpc in region["describe_vpcs"] if vpc["VpcId"] == "vpc-00000006"]
+    vpc["CidrBlock"] = vpc["CidrBlockAssociationSet"][0]["CidrBlock"] = "172.16.0.0/22"
+    return topology
+
+
+def test_incremental_rescan_follows_changes(scanned, tmp_path):
+    path = str(tmp_path / "previous.jsonl")
+    scanned.save_snapshot(path)
+    rescan = EazyVizyAWS(StubEC2(changed_topology()).session(), concurrency=REGIONS)
+    rescan.load_previous(path)
+    rescan.initialize()
+    diff = rescan.diff()
+
+    # Routes and rules naming the old block of vpc-6 no longer lead into it.
+    assert diff["removed"] and {entry["target"] for entry in diff["removed"]} == {"vpc-00000006"}
+    assert all(entry["source"] == "vpc-00000008" or entry["target"] == "vpc-00000006" for entry in diff["changed"])
+    (moved,) = [
+        entry for entry in diff["changed"] if (entry["source"], entry["target"]) == ("vpc-00000008", "vpc-00000000")
+    ]
+    assert [(port["from"], port["to"]) for port in moved["before"]["ports"]] == [(5432, 5432)]
+    assert [(port["from"], port["to"]) for port in moved["after"]["ports"]] == [(5433, 5433)]
+    assert diff["added"] == []
+
+    full = EazyVizyAWS(StubEC2(changed_topology()).session(), concurrency=REGIONS)
+    full.initialize()
+    assert pairs(rescan.snapshots) == pairs(full.snapshots)
+    assert diff == diff_topology(scanned.snapshots, full.snapshots)
+
+
+@pytest.mark.parametrize(
+    "argv, vpc_filter",
+    [
+        (["--vpc-ids", "vpc-00000004,vpc-00000005,vpc-00000006,vpc-00000008"], "vpc-id"),
+        (["--tag", "team=data"], "tag:team"),
+        # EC2 filters cannot negate, so exclusions are dropped from the full VPC list.
+        (["--exclude", "vpc-00000006", "--exclude", "team=data"], None),
+    ],
+    ids=["vpc-ids", "tag", "exclude"],
+)
+def test_filtered_scan_matches_full_scan(scanned, argv, vpc_filter):
+    scan_filter = _scan_filter(get_argparser().parse_args(argv))
+    stub = StubEC2(synthetic_topology(VPCS, REGIONS))
+    filtered = EazyVizyAWS(stub.session(), concurrency=REGIONS, scan_filter=scan_filter)
+    filtered.initialize()
+
+    covered = {vpc["VpcId"] for snapshot in scanned.snapshots for vpc in snapshot if scan_filter.matches(vpc)}
+    assert 0 < len(covered) < VPCS
+    assert {vpc_id for snapshot in filtered.snapshots for vpc_id in snapshot.vpcs} == covered
+    assert pairs(filtered.snapshots) == {
+        pair: connection for pair, connection in pairs(scanned.snapshots).items() if set(pair) <= covered
+    }
+    vpc_requests = [params for _, operation, params in stub.requests if operation == "DescribeVpcs"]
+    assert vpc_requests and all(
+        [entry["Name"] for entry in params.get("Filters", [])] == ([vpc_filter] if vpc_filter else [])
+        for params in vpc_requests
+    )
+    # Everything described per VPC is filtered on the API side.
+    per_vpc = {"DescribeRouteTables", "DescribeSecurityGroups", "DescribeVpcPeeringConnections"}
+    requests = [params for _, operation, params in stub.requests if operation in per_vpc]
+    assert requests and all(params.get("Filters") for params in requests)
+
+
+def test_query_follows_the_analysis(scanned):
+    index = ReachabilityIndex(scanned.snapshots)
+    connected = pairs(scanned.snapshots)
+    source, target = next(pair for pair, connection in connected.items() if connection["routes"])
+    result = index.query(source, target)
+    assert result["reachable"]
+    assert {path["route_table"] for path in result["paths"]} <= {
+        route["id"] for route in connected[(source, target)]["routes"]
+    }
+
+    vpc_ids = [vpc_id for snapshot in scanned.snapshots for vpc_id in snapshot.vpcs]
+    unrouted = next(
+        (a, b)
+        for a in vpc_ids
+        for b in vpc_ids
+        if a != b and not (connected.get((a, b)) or {}).get("routes")
+    )
+    assert not index.query(*unrouted)["reachable"]
+
+
+def test_query_checks_ports(scanned):
+    index = ReachabilityIndex(scanned.snapshots)
+    assert index.query("vpc-00000004", "vpc-00000008", port=5432)["reachable"]
+    assert not index.query("vpc-00000004", "vpc-00000008", port=443)["reachable"]
+    assert not index.query("vpc-00000004", "vpc-00000008", port=5432, protocol="udp")["reachable"]
+    assert index.query("vpc-00000004", "vpc-00000008")["open"] == "tcp 5432"
+    result = index.query("vpc-00000004", "vpc-00000006", port=8080)
+    assert result["reachable"]
+    assert sorted(path["type"] for path in result["paths"]) == ["Peering", "TGW"]
+
+
+def test_query_resolves_names(scanned):
+    index = ReachabilityIndex(scanned.snapshots)
+    vpc_id = next(iter(scanned.snapshots[0].vpcs))
+    assert index.resolve(vpc_id) == vpc_id
+    with pytest.raises(KeyError):
+        index.resolve("vpc-missing")
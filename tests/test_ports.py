@@ -0,0 +1,53 @@
+"""Compiled security group port ranges."""
+import pytest
+
+from eazyvizy.aws._ports import PortSet, port_record
+
+
+def test_ranges_are_merged():
+    ports = PortSet({"tcp": [[80, 80], [81, 90], [443, 443], [85, 100]]})
+    assert ports.ranges == {"tcp": [[80, 100], [443, 443]]}
+    assert str(ports) == "tcp 80-100, 443"
+
+
+def test_all_traffic_counts_for_every_protocol():
+    ports = PortSet({"all": [[0, 65535]]})
+    assert ports.contains(22) and ports.contains(53, "udp") and ports.contains(0, "icmp")
+    assert str(ports) == "all traffic"
+
+
+@pytest.mark.parametrize(
+    "left, right, expected",
+    [
+        ({"tcp": [[80, 80]], "all": [[0, 65535]]}, {"tcp": [[443, 443]]}, {"tcp": [[443, 443]]}),
+        ({"tcp": [[0, 1024]]}, {"tcp": [[443, 8080]]}, {"tcp": [[443, 1024]]}),
+        ({"tcp": [[80, 80]]}, {"all": [[0, 65535]]}, {"tcp": [[80, 80]]}),
+        ({"all": [[0, 65535]]}, {"all": [[0, 65535]], "udp": [[53, 53]]}, {"all": [[0, 65535]], "udp": [[0, 65535]]}),
+        ({"tcp": [[80, 80]]}, {"udp": [[80, 80]]}, {}),
+        ({"tcp": [[80, 80]]}, {}, {}),
+    ],
+)
+def test_intersection(left, right, expected):
+    assert (PortSet(left) & PortSet(right)).ranges == expected
+    assert (PortSet(right) & PortSet(left)).ranges == expected
+
+
+def test_intersection_agrees_with_membership():
+    left = PortSet({"tcp": [[20, 30], [400, 500]], "udp": [[53, 53]], "all": [[0, 25]]})
+    right = PortSet({"tcp": [[25, 450]], "all": [[50, 60]]})
+    both = left & right
+    for protocol in ("tcp", "udp", "icmp"):
+        for port in range(0, 600):
+            assert both.contains(port, protocol) == (left.contains(port, protocol) and right.contains(port, protocol))
+
+
+def test_port_record_normalizes_rules():
+    assert port_record("sg-1", {"IpProtocol": "6", "FromPort": 443, "ToPort": 443}) == {
+        "id": "sg-1",
+        "protocol": "tcp",
+        "from": 443,
+        "to": 443,
+    }
+    assert port_record("sg-1", {"IpProtocol": "-1"})["protocol"] == "all"
+    # ICMP type and code are not ports.
+    assert port_record("sg-1", {"IpProtocol": "icmp", "FromPort": 8, "ToPort": -1})["from"] == 0
@@ -0,0 +1,122 @@
+"""Reachability queries and the `query` command."""
+import sys
+
+import pytest
+
+from eazyvizy._main import main
+from eazyvizy.aws._query import ReachabilityIndex
+from eazyvizy.aws._snapshot import write_snapshot
+from eazyvizy.error import INVALID_EAZYVIZY
+
+
+@pytest.mark.parametrize(
+    "gateway",
+    [
+        {"GatewayId": "igw-1"},
+        {"GatewayId": "vgw-1"},
+        {"GatewayId": "vpce-1"},
+        {"NatGatewayId": "nat-1"},
+        {"NetworkInterfaceId": "eni-1"},
+    ],
+)
+def test_gateway_routes_do_not_connect_vpcs(analyzer, region_snapshot, gateway):
+    snapshot = region_snapshot(
+        ("vpc-a", "10.0.0.0/16", dict(gateway, DestinationCidrBlock="0.0.0.0/0")),
+        ("vpc-b", "10.1.0.0/16"),
+    )
+    analyzer.analyze(snapshot)
+    assert [connection["routes"] for connection in snapshot.connections["vpc-a"]] == [[]]
+    result = ReachabilityIndex([snapshot]).query("vpc-a", "vpc-b", port=443)
+    assert not result["reachable"]
+    assert result["paths"] == []
+
+
+def test_transit_gateway_default_route_connects_vpcs(analyzer, region_snapshot):
+    snapshot = region_snapshot(
+        ("vpc-a", "10.0.0.0/16", {"DestinationCidrBlock": "0.0.0.0/0", "TransitGatewayId": "tgw-1"}),
+        ("vpc-b", "10.1.0.0/16"),
+    )
+    analyzer.analyze(snapshot)
+    (connection,) = snapshot.connections["vpc-a"]
+    assert connection["routes"] == [{"id": "rtb-vpc-a", "type": "TGW", "assoc_id": "tgw-1"}]
+
+
+def test_blackhole_routes_do_not_connect_vpcs(analyzer, region_snapshot):
+    route = {"DestinationCidrBlock": "10.1.0.0/16", "TransitGatewayId": "tgw-1", "State": "blackhole"}
+    snapshot = region_snapshot(("vpc-a", "10.0.0.0/16", route), ("vpc-b", "10.1.0.0/16"))
+    analyzer.analyze(snapshot)
+    assert [connection["routes"] for connection in snapshot.connections["vpc-a"]] == [[]]
+    assert not ReachabilityIndex([snapshot]).query("vpc-a", "vpc-b")["reachable"]
+
+
+def peering(requester, accepter, code="active"):
+    return {
+        "VpcPeeringConnectionId": "pcx-1",
+        "RequesterVpcInfo": {"VpcId": requester},
+        "AccepterVpcInfo": {"VpcId": accepter},
+        "Status": {"Code": code},
+    }
+
+
+@pytest.mark.parametrize(
+    "code, state", [("deleted", "blackhole"), ("deleted", "active"), ("pending-acceptance", None), ("rejected", None)]
+)
+def test_inactive_peerings_do_not_connect_vpcs(analyzer, region_snapshot, code, state):
+    route = {"DestinationCidrBlock": "10.1.0.0/16", "VpcPeeringConnectionId": "pcx-1", "State": state}
+    snapshot = region_snapshot(
+        ("vpc-a", "10.0.0.0/16", route), ("vpc-b", "10.1.0.0/16"), peerings=[peering("vpc-a", "vpc-b", code)]
+    )
+    analyzer.analyze(snapshot)
+    assert [connection["routes"] for connection in snapshot.connections["vpc-a"]] == [[]]
+    assert not ReachabilityIndex([snapshot]).query("vpc-a", "vpc-b")["reachable"]
+
+
+def test_peering_routes_only_lead_to_the_peer(analyzer, region_snapshot):
+    route = {"DestinationCidrBlock": "10.1.0.0/16", "VpcPeeringConnectionId": "pcx-1"}
+    snapshot = region_snapshot(
+        ("vpc-a", "10.0.0.0/16", route),
+        ("vpc-b", "10.1.0.0/16"),
+        # Overlaps the peer but is not joined by the peering connection.
+        ("vpc-c", "10.1.0.0/16"),
+        peerings=[peering("vpc-b", "vpc-a")],
+    )
+    analyzer.analyze(snapshot)
+    routes = {connection["target"]: connection["routes"] for connection in snapshot.connections["vpc-a"]}
+    assert routes == {"vpc-b": [{"id": "rtb-vpc-a", "type": "Peering", "assoc_id": "pcx-1"}], "vpc-c": []}
+    index = ReachabilityIndex([snapshot])
+    assert index.query("vpc-a", "vpc-b")["reachable"]
+    assert not index.query("vpc-a", "vpc-c")["reachable"]
+
+
+@pytest.fixture
+def snapshot_file(tmp_path, region_snapshot):
+    path = str(tmp_path / "estate.jsonl")
+    write_snapshot(
+        path,
+        [
+            region_snapshot(
+                ("vpc-a", "10.0.0.0/16", {"DestinationCidrBlock": "10.1.0.0/16", "VpcPeeringConnectionId": "pcx-1"}),
+                ("vpc-b", "10.1.0.0/16", {"DestinationCidrBlock": "10.0.0.0/16", "VpcPeeringConnectionId": "pcx-1"}),
+                peerings=[peering("vpc-a", "vpc-b")],
+            )
+        ],
+    )
+    return path
+
+
+def run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["eazyvizy", *argv])
+    return main()
+
+
+def test_query_command(snapshot_file, monkeypatch, capsys):
+    assert run(monkeypatch, "query", snapshot_file, "vpc-a", "vpc-b", "-p", "443") == 0
+    assert "reachable via Peering pcx-1" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("line", ["vpc-a vpc-b https", "vpc-a vpc-b 443 extra", "vpc-a"])
+def test_malformed_batch_line(snapshot_file, tmp_path, monkeypatch, capsys, line):
+    batch = tmp_path / "queries.txt"
+    batch.write_text(f"# source target port\nvpc-a vpc-b 443\n{line}\n")
+    assert run(monkeypatch, "query", snapshot_file, "--batch", str(batch)) == INVALID_EAZYVIZY
+    assert "Invalid query line" in capsys.readouterr().out
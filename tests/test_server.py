@@ -0,0 +1,137 @@
+"""Responses of the local graph server, built without a socket."""
+import gzip
+import json
+from http import HTTPStatus
+
+import pytest
+
+from eazyvizy._graph import Graph
+from eazyvizy._server import COMPRESS_MIN_BYTES, GraphServer
+
+
+@pytest.fixture
+def server():
+    graph = Graph()
+    regions = {"vpc-a": "us-east-1", "vpc-b": "us-east-1", "vpc-c": "us-east-1", "vpc-d": "us-west-2"}
+    for vpc_id, region in regions.items():
+        graph.add_node(vpc_id, kind="vpc", vpcId=vpc_id, region=region)
+    for vpc_id in ["vpc-a", "vpc-b", "vpc-d"]:
+        graph.add_node(f"rtb-{vpc_id[-1]}", kind="route_table", vpcId=vpc_id, region=regions[vpc_id])
+    graph.add_node("pcx-1", kind="peering", vpcId="vpc-b", region="us-east-1")
+    graph.add_node("tgw-1", kind="transit_gateway", region="us-east-1")
+    graph.add_node("tgw-2", kind="transit_gateway", region="us-west-2")
+    for source, target in [
+        ("rtb-a", "tgw-1"),
+        ("tgw-1", "vpc-c"),
+        ("tgw-1", "tgw-2"),
+        ("tgw-2", "vpc-d"),
+        ("rtb-d", "tgw-2"),
+        ("rtb-b", "pcx-1"),
+        ("pcx-1", "vpc-a"),
+    ]:
+        graph.add_edge(source, target, ports="tcp 443")
+    return GraphServer(graph)
+
+
+def get(server, path, query=""):
+    response = server.response(path, query)
+    return response.status, json.loads(response.body)
+
+
+def node_ids(data):
+    return [node["id"] for node in data["nodes"]]
+
+
+def edge_ids(data):
+    return sorted(edge["id"] for edge in data["edges"])
+
+
+def test_summary(server):
+    status, data = get(server, "/api/summary")
+    assert status == HTTPStatus.OK
+    assert node_ids(data) == ["region:us-east-1", "region:us-west-2", "tgw-1", "tgw-2"]
+    east = data["nodes"][0]
+    assert east["label"] == "us-east-1\n3 VPCs"
+    assert east["title"] == "1 peering, 2 route_table, 1 transit_gateway, 3 vpc"
+    assert east["expand"] == "api/region?name=us-east-1"
+    # Edges inside a region are dropped, the others are counted per pair of groups.
+    assert {edge["id"]: edge["label"] for edge in data["edges"]} == {
+        "summary:region:us-east-1>tgw-1": "2",
+        "summary:region:us-west-2>tgw-2": "2",
+        "summary:tgw-1>tgw-2": "1",
+    }
+
+
+def test_region(server):
+    status, data = get(server, "/api/region", "name=us-east-1")
+    assert status == HTTPStatus.OK
+    assert node_ids(data) == ["vpc-a", "vpc-b", "vpc-c", "tgw-1"]
+    assert edge_ids(data) == ["tgw-1>vpc-c"]
+    assert not data["truncated"]
+    assert data["nodes"][0]["expand"] == "api/ego?id=vpc-a"
+    assert data["nodes"][3]["expand"] == "api/neighborhood?id=tgw-1"
+
+
+def test_ego_follows_paths_to_the_next_vpc(server):
+    _, data = get(server, "/api/ego", "id=vpc-a")
+    # Out through its route table and the gateways, in through the peering of vpc-b.
+    assert node_ids(data) == ["vpc-a", "rtb-a", "tgw-1", "vpc-c", "tgw-2", "vpc-d", "pcx-1", "rtb-b", "vpc-b"]
+    assert edge_ids(data) == [
+        "pcx-1>vpc-a",
+        "rtb-a>tgw-1",
+        "rtb-b>pcx-1",
+        "tgw-1>tgw-2",
+        "tgw-1>vpc-c",
+        "tgw-2>vpc-d",
+    ]
+
+
+def test_neighborhood_depth(server):
+    _, data = get(server, "/api/neighborhood", "id=tgw-1")
+    assert node_ids(data) == ["tgw-1", "vpc-c", "tgw-2", "rtb-a"]
+    _, data = get(server, "/api/neighborhood", "id=tgw-1&depth=2")
+    assert node_ids(data) == ["tgw-1", "vpc-c", "tgw-2", "rtb-a", "vpc-d", "rtb-d"]
+    assert len(data["edges"]) == 5
+
+
+@pytest.mark.parametrize(
+    "path, query, expected",
+    [
+        ("/api/region", "name=us-east-1&limit=2", ["vpc-a", "vpc-b"]),
+        ("/api/ego", "id=vpc-a&limit=3", ["vpc-a", "rtb-a", "tgw-1"]),
+        ("/api/neighborhood", "id=tgw-1&depth=2&limit=2", ["tgw-1", "vpc-c"]),
+        ("/api/search", "q=vpc&limit=0", ["vpc-a"]),
+    ],
+)
+def test_limit_truncates(server, path, query, expected):
+    _, data = get(server, path, query)
+    assert node_ids(data) == expected
+    assert data["truncated"]
+
+
+@pytest.mark.parametrize(
+    "path, query, status, error",
+    [
+        ("/api/nothing", "", HTTPStatus.NOT_FOUND, "Unknown path '/api/nothing'."),
+        ("/api/region", "name=eu-west-1", HTTPStatus.NOT_FOUND, "Unknown region 'eu-west-1'."),
+        ("/api/ego", "id=vpc-z", HTTPStatus.NOT_FOUND, "Unknown node 'vpc-z'."),
+        ("/api/region", "", HTTPStatus.BAD_REQUEST, "Missing parameter 'name'."),
+        ("/api/neighborhood", "id=tgw-1&depth=two", HTTPStatus.BAD_REQUEST, "Parameter 'depth' must be an integer."),
+    ],
+)
+def test_errors(server, path, query, status, error):
+    assert get(server, path, query) == (status, {"error": error})
+
+
+def test_etag_ignores_parameter_order(server):
+    first = server.response("/api/neighborhood", "id=tgw-1&depth=2")
+    assert server.response("/api/neighborhood/", "depth=2&id=tgw-1").etag == first.etag
+    assert server.response("/api/neighborhood", "id=tgw-1&depth=1").etag != first.etag
+
+
+def test_only_large_bodies_are_gzipped(server):
+    small = server.response("/api/search", "q=pcx")
+    assert len(small.body) < COMPRESS_MIN_BYTES and small.gzipped is None
+    page = server.response("/")
+    assert page.content_type.startswith("text/html")
+    assert gzip.decompress(page.gzipped) == page.body
@@ -0,0 +1,35 @@
+"""Commands that need no scan must not pay for the modules scans import."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("boto3", "botocore", "numpy", "ipaddr", "yaml", "asyncio", "sqlite3", "eazyvizy.aws")
+
+PROBE = """
+import sys
+sys.argv = ["eazyvizy"] + sys.argv[1:]
+from eazyvizy._main import main
+try:
+    main()
+except SystemExit:
+    pass
+print("\\n".join(sys.modules), file=sys.stderr)
+"""
+
+
+def loaded_modules(arguments):
+    """Returns the modules a fresh interpreter has imported after running the CLI."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, *arguments], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return set(result.stderr.split())
+
+
+@pytest.mark.parametrize("arguments", [["--version"], ["--help"]], ids=["version", "help"])
+def test_no_heavy_imports(arguments):
+    modules = loaded_modules(arguments)
+    assert "eazyvizy._main" in modules
+    assert sorted(name for name in HEAVY_MODULES if name in modules) == []
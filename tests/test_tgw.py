@@ -0,0 +1,102 @@
+"""Transit gateway route collection and resolution."""
+import pytest
+
+from benchmarks.ec2_stub import StubEC2
+from benchmarks.topology import synthetic_topology
+
+from eazyvizy.aws import _collector
+from eazyvizy.aws._collector import search_transit_gateway_routes
+from eazyvizy.aws._conn import EazyVizyAWS
+from eazyvizy.aws._query import ReachabilityIndex
+
+
+class Client:
+    def __init__(self, routes, more):
+        self.response = {"Routes": routes, "AdditionalRoutesAvailable": more}
+        self.calls = []
+
+    def search_transit_gateway_routes(self, **params):
+        self.calls.append(params)
+        return self.response
+
+
+@pytest.fixture
+def snapshot(region_snapshot):
+    def build(truncated):
+        table = {
+            "TransitGatewayRouteTableId": "tgw-rtb-1",
+            "TransitGatewayId": "tgw-1",
+            # Only the route to vpc-b came back; vpc-c's route may be among the missing ones.
+            "Routes": [
+                {
+                    "DestinationCidrBlock": "10.1.0.0/16",
+                    "State": "active",
+                    "TransitGatewayAttachments": [{"ResourceId": "vpc-b", "TransitGatewayAttachmentId": "att-b"}],
+                }
+            ],
+            "RoutesTruncated": truncated,
+        }
+        attachments = [
+            {
+                "TransitGatewayAttachmentId": f"att-{name}",
+                "TransitGatewayId": "tgw-1",
+                "ResourceType": "vpc",
+                "ResourceId": f"vpc-{name}",
+                "Association": {"TransitGatewayRouteTableId": "tgw-rtb-1"},
+            }
+            for name in "abc"
+        ]
+        return region_snapshot(
+            ("vpc-a", "10.0.0.0/16", {"DestinationCidrBlock": "10.0.0.0/8", "TransitGatewayId": "tgw-1"}),
+            ("vpc-b", "10.1.0.0/16"),
+            ("vpc-c", "10.2.0.0/16"),
+            tgw_attachments=attachments,
+            transit_gateways=[{"TransitGatewayId": "tgw-1"}],
+            tgw_route_tables=[table],
+        )
+
+    return build
+
+
+def test_search_reports_truncation():
+    client = Client([{"DestinationCidrBlock": "10.1.0.0/16"}], True)
+    routes = search_transit_gateway_routes(client, "tgw-rtb-1")
+    assert routes == {"Routes": [{"DestinationCidrBlock": "10.1.0.0/16"}], "AdditionalRoutesAvailable": True}
+    assert client.calls[0]["MaxResults"] == _collector.TGW_ROUTES_LIMIT
+
+
+def test_complete_tables_resolve_routes(snapshot):
+    complete = snapshot(truncated=False)
+    EazyVizyAWS().analyze(complete)
+    assert complete.tgw.known("tgw-1")
+    index = ReachabilityIndex([complete])
+    assert index.query("vpc-a", "vpc-b")["paths"][0]["tgw_route_table"] == "tgw-rtb-1"
+    # No route for vpc-c in a complete table: the gateway drops the traffic.
+    assert not index.query("vpc-a", "vpc-c")["reachable"]
+
+
+def test_truncated_tables_are_not_known(snapshot):
+    truncated = snapshot(truncated=True)
+    EazyVizyAWS().analyze(truncated)
+    assert not truncated.tgw.known("tgw-1")
+    assert ReachabilityIndex([truncated]).query("vpc-a", "vpc-c")["reachable"]
+
+
+def test_truncated_scan_keeps_tgw_paths(monkeypatch):
+    topology = synthetic_topology(48, 2)
+    full = EazyVizyAWS(StubEC2(topology).session(), concurrency=2)
+    full.initialize()
+    monkeypatch.setattr(_collector, "TGW_ROUTES_LIMIT", 5)
+    truncated = EazyVizyAWS(StubEC2(topology).session(), concurrency=2)
+    truncated.initialize()
+
+    for snapshot in truncated.snapshots:
+        assert all(table["RoutesTruncated"] for table in snapshot.tgw_route_tables.values())
+        assert not any(snapshot.tgw.known(tgw_id) for tgw_id in snapshot.transit_gateways)
+    # Without every route nothing is dropped, so every path of the full scan is still found.
+    full_index, truncated_index = ReachabilityIndex(full.snapshots), ReachabilityIndex(truncated.snapshots)
+    vpc_ids = [vpc_id for snapshot in full.snapshots for vpc_id in snapshot.vpcs]
+    for source in vpc_ids:
+        for target in vpc_ids:
+            if source != target and full_index.query(source, target)["reachable"]:
+                assert truncated_index.query(source, target)["reachable"]
@@ -0,0 +1,99 @@
+"""Client-side rate limiting and the retry policy of instrumented sessions."""
+import pytest
+from botocore.config import Config
+
+from benchmarks.ec2_stub import StubEC2
+from benchmarks.topology import synthetic_topology
+
+from eazyvizy.aws import _throttle
+from eazyvizy.aws._throttle import BACKOFF_COOLDOWN, MIN_RATE, RateLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(_throttle.time, "monotonic", clock)
+    monkeypatch.setattr(_throttle.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=4, burst=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == 0.25
+    clock.now += 0.25
+    assert bucket.try_acquire() == 0.0
+    # Waiting for a token sleeps until the refill.
+    assert bucket.acquire() == 0.25
+    assert clock.now == 100.5
+
+
+def test_throttling_backs_off_once_per_cooldown(clock):
+    bucket = TokenBucket(rate=20, burst=5)
+    bucket.throttled()
+    assert (bucket.rate, bucket.backoffs, bucket.tokens) == (10, 1, 0.0)
+    # Throttles of calls sent before the backoff do not back off again.
+    clock.now += BACKOFF_COOLDOWN / 2
+    bucket.throttled()
+    assert (bucket.rate, bucket.backoffs) == (10, 1)
+    clock.now += BACKOFF_COOLDOWN
+    bucket.throttled()
+    assert (bucket.rate, bucket.backoffs) == (5, 2)
+    for _ in range(10):
+        clock.now += BACKOFF_COOLDOWN
+        bucket.throttled()
+    assert bucket.rate == MIN_RATE
+
+
+def test_successes_recover_up_to_the_maximum(clock):
+    bucket = TokenBucket(rate=20, burst=5)
+    bucket.throttled()
+    rates = []
+    for _ in range(200):
+        bucket.succeeded()
+        rates.append(bucket.rate)
+    assert rates == sorted(rates)
+    assert rates[0] > 10 and rates[-1] == 20
+
+
+def test_limiter_keeps_one_bucket_per_account_region_and_family(clock):
+    limiter = RateLimiter(rate=5, burst=2)
+    stub = StubEC2(synthetic_topology(4, 1))
+    session = limiter.instrument(stub.session(), account="111")
+    client = session.client("ec2", region_name="us-east-1")
+    for _ in range(4):
+        client.describe_vpcs()
+    # Two calls fit the burst, the other two waited for tokens.
+    assert clock.now == pytest.approx(100.0 + 2 / 5)
+    assert limiter.rates() == {("111", "us-east-1", "ec2:read"): (5, 0)}
+
+
+def test_instrument_merges_the_retry_policy():
+    session = StubEC2(synthetic_topology(4, 1)).session()
+    core = session._session  # pylint: disable=protected-access
+    core.set_default_client_config(Config(connect_timeout=7, retries={"mode": "legacy"}))
+    RateLimiter(retry_mode="adaptive", max_attempts=3).instrument(session)
+
+    config = core.get_default_client_config()
+    assert config.connect_timeout == 7
+    assert config.retries == {"mode": "adaptive", "max_attempts": 3}
+    client = session.client("ec2", region_name="us-east-1")
+    assert client.meta.config.retries["mode"] == "adaptive"
+    assert client.meta.config.connect_timeout == 7
+
+
+@pytest.mark.parametrize("options", [{"rate": 0}, {"burst": 0}, {"retry_mode": "eager"}])
+def test_limiter_rejects_invalid_settings(options):
+    with pytest.raises(ValueError):
+        RateLimiter(**options)